@@ -0,0 +1,134 @@
+"""helpers shared by the benchmark scripts: synthetic records and timing"""
+
+import argparse
+from contextlib import contextmanager
+from pathlib import Path
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, Iterator
+
+
+# run from a checkout without installing bibliophant
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bibliophant.bulk import bulk_add_records  # noqa: E402
+from bibliophant.session import session_scope, start_engine, stop_engine  # noqa: E402
+
+_LETTERS = str.maketrans("0123456789", "abcdefghij")
+
+# a few words for titles and abstracts, so that searches hit
+# some records with common words and few records with rare ones
+WORDS = (
+    "fluid dynamics port Hamiltonian systems energy based modelling control "
+    "passivity discretization structure preserving numerical methods "
+    "thermodynamics irreversible processes stability analysis networks "
+    "geometric integration mechanics boundary conditions optimization"
+).split()
+
+
+def record_key(i: int) -> str:
+    """the key of the i-th synthetic record (digits as letters, eg. 2020Kbc)"""
+    return "2020K" + str(i).translate(_LETTERS)
+
+
+def record_dict(i: int) -> Dict:
+    """the i-th synthetic record (a dict as used by record_from_dict):
+    4 in 5 are articles in one of 50 journals, every third of them with
+    an arXiv eprint; the others are books. There are about 500 authors
+    and 81 tags.
+    """
+    words = [WORDS[(i * 7 + j * 13) % len(WORDS)] for j in range(6)]
+    if i % 5 == 0:
+        return {
+            "type": "book",
+            "key": record_key(i),
+            "title": f"Book on {' '.join(words[:3])}, volume {i}",
+            "year": 1990 + i % 30,
+            "authors": [{"last": "Smith"}],
+            "publisher": {"name": "Springer", "address": "Berlin"},
+            "urls": [{"url": f"https://example.org/books/{i}"}],
+        }
+    record = {
+        "type": "article",
+        "key": record_key(i),
+        "title": f"On {' '.join(words)}, part {i}",
+        "year": 2020,
+        "month": 1 + i % 12,
+        "authors": [
+            {"last": f"Auth{record_key(i % 500)}", "first": "John"},
+            {"last": "Smith"},
+        ],
+        "tags": [{"name": "read-me"}, {"name": f"topic-{record_key(i % 100)[5:]}"}],
+        "journal": {"name": f"Journal {record_key(i % 50)}"},
+        "volume": "3",
+        "doi": f"10.1000/x{i}",
+        "abstract": "We study " + " ".join(words) + f" (case {i}).",
+    }
+    if i % 3 == 0:
+        record["eprint"] = {
+            "eprint": "1234.5678",
+            "archive_prefix": "arXiv",
+            "primary_class": "math.CO",
+        }
+    return record
+
+
+def make_parser(description: str, records: int) -> argparse.ArgumentParser:
+    """the parser of the command line arguments common to the benchmarks"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--records",
+        type=int,
+        default=records,
+        help=f"number of synthetic records (default {records})",
+    )
+    parser.add_argument(
+        "--profile",
+        default=None,
+        help="SQLite profile passed to start_engine (default, safe or performance)",
+    )
+    parser.add_argument(
+        "--keep",
+        action="store_true",
+        help="keep the temporary collection instead of removing it",
+    )
+    return parser
+
+
+def new_collection(profile=None) -> Path:
+    """the root folder of a new, empty collection in a temporary folder
+    (the engine is started)
+    """
+    root = Path(tempfile.mkdtemp(prefix="bibliophant-bench-"))
+    start_engine(root, create_db=True, profile=profile)
+    return root
+
+
+def remove_collection(root: Path, keep: bool = False):
+    """stops the engine and removes the temporary collection (unless keep)"""
+    stop_engine()
+    if keep:
+        print(f"collection left in {root}")
+    else:
+        shutil.rmtree(root)
+
+
+def fill_collection(n: int):
+    """adds n synthetic records to the database of the started engine"""
+    with session_scope() as session:
+        bulk_add_records(session, (record_dict(i) for i in range(n)))
+
+
+@contextmanager
+def timed(label: str) -> Iterator[Dict]:
+    """prints the wall-clock time of the block;
+    an "info" put into the yielded dict is printed after it
+    """
+    result = {}
+    start = time.perf_counter()
+    yield result
+    seconds = time.perf_counter() - start
+    info = f"  ({result['info']})" if "info" in result else ""
+    print(f"  {label:<46} {seconds:8.2f} s{info}", flush=True)
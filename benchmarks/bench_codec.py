@@ -0,0 +1,83 @@
+"""Benchmark of the JSON codecs of the record files (user-019).
+
+Compares the available codecs of bibliophant.json_codec (the json module
+of the standard library and orjson, if installed) on --records synthetic
+records:
+- dumps and loads of the record dicts in memory,
+- store_records when all record files are unchanged (serializing and
+  comparing every file) and reading and parsing every record file
+  (read_record_file + parse_record_file, as done by reindex and sync).
+
+usage: python benchmarks/bench_codec.py [--records 100000]
+"""
+
+from _common import (
+    fill_collection,
+    make_parser,
+    new_collection,
+    record_dict,
+    remove_collection,
+    timed,
+)
+
+from bibliophant import json_codec
+from bibliophant.db_shortcuts import select_records, stream_records
+from bibliophant.json_io import store_records
+from bibliophant.record_files import (
+    parse_record_file,
+    read_record_file,
+    scan_record_folders,
+)
+from bibliophant.session import session_scope
+
+
+def bench_memory(record_dicts):
+    print(f"in memory, {len(record_dicts)} record dicts")
+    documents = None
+    for name, codec in json_codec.CODECS.items():
+        with timed(f"{name}: dumps"):
+            documents = [codec.dumps(record) for record in record_dicts]
+        with timed(f"{name}: loads"):
+            for document in documents:
+                codec.loads(document)
+
+
+def bench_files(root):
+    print("record files")
+    names = sorted(scan_record_folders(root))
+    for name in json_codec.CODECS:
+        json_codec.set_codec(name)
+        with timed(f"{name}: store_records, all unchanged") as result:
+            with session_scope() as session:
+                report = store_records(
+                    stream_records(session, select_records("full")), root
+                )
+            result["info"] = f"{len(report['unchanged'])} unchanged"
+        with timed(f"{name}: read + parse_record_file"):
+            for name_ in names:
+                path = f"{root}/{name_}/{name_}.json"
+                data, _ = read_record_file(path)
+                parse_record_file(path, data)
+
+
+def main():
+    args = make_parser(__doc__.splitlines()[0], records=100000).parse_args()
+    if "orjson" not in json_codec.CODECS:
+        print("orjson is not installed, only the stdlib codec is measured")
+    bench_memory([record_dict(i) for i in range(args.records)])
+
+    root = new_collection(args.profile)
+    with timed(f"creating and storing {args.records} records"):
+        fill_collection(args.records)
+        with session_scope() as session:
+            store_records(stream_records(session, select_records("full")), root)
+    default = json_codec.get_codec().name
+    try:
+        bench_files(root)
+    finally:
+        json_codec.set_codec(default)
+    remove_collection(root, args.keep)
+
+
+if __name__ == "__main__":
+    main()
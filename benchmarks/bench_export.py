@@ -0,0 +1,206 @@
+"""Benchmark of exporting a collection.
+
+Measures, for --records synthetic records:
+- the number of statements and the time to load 1k and 10k records
+  with lazy loading (select(Record)) and with the "full" profile
+  (user-007),
+- exporting BibTeX through the ORM (records_to_bibfile, streamed;
+  user-008) against the Core read path (select_bibtex_rows and
+  render_row, without ORM objects; user-012, measured with
+  --records 500000) and against the cached BibTeX (collection_to_bibfile:
+  cold, ie. filling the cache, warm, and after renaming a journal; user-011),
+- the incremental export (update_bibfile) after a few changes (user-010),
+- filling the BibTeX cache (fill_bibtex_cache) with 1, 2 and 4 worker
+  processes (--workers; the speedup is relative to the first number;
+  user-009),
+- exporting 1 and 4 formats in one pass (collection_to_files) against
+  4 separate passes (user-013),
+- writing the .bib uncompressed, with fsync and gzip compressed (user-014).
+
+usage: python benchmarks/bench_export.py [--records 100000] [--workers 1,2,4]
+"""
+
+import os
+import time
+from typing import List
+
+from _common import (
+    fill_collection,
+    make_parser,
+    new_collection,
+    remove_collection,
+    timed,
+)
+
+from sqlalchemy import event, select, update
+
+from bibliophant.db_shortcuts import select_records, stream_records
+from bibliophant.exporters.bibtex import (
+    collection_to_bibfile,
+    fill_bibtex_cache,
+    records_to_bibfile,
+    render_row,
+    select_bibtex_rows,
+)
+from bibliophant.exporters.incremental import update_bibfile
+from bibliophant.exporters.pipeline import collection_to_files
+from bibliophant.misc import atomic_write
+from bibliophant.models import Journal, Record
+from bibliophant.session import session_scope
+
+
+_FORMATS = [
+    ("bibtex", "all.bib"),
+    ("csljson", "all.json"),
+    ("ris", "all.ris"),
+    ("ndjson", "all.ndjson"),
+]
+
+
+def _count_statements(session, function) -> int:
+    """the number of statements sent to the database by function()"""
+    statements = []
+
+    def count(*args):
+        statements.append(None)
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        function()
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return len(statements)
+
+
+def bench_loading(n: int):
+    print("loading records and their relationships")
+    for limit in (1000, 10000):
+        if limit > n:
+            break
+        for label, statement in (
+            ("lazy", select(Record)),
+            ("full profile", select_records("full")),
+        ):
+            with session_scope() as session, timed(
+                f"{limit} records, {label}"
+            ) as result:
+
+                def load():
+                    for record in session.execute(statement.limit(limit)).scalars():
+                        record.to_dict()
+
+                result["info"] = f"{_count_statements(session, load)} statements"
+
+
+def bench_bibtex(root):
+    print("BibTeX")
+    with timed("ORM path: records_to_bibfile, streamed"):
+        with session_scope() as session:
+            records_to_bibfile(
+                stream_records(session, select_records("export").order_by(Record.key)),
+                root / "orm.bib",
+            )
+    with timed("Core path: select_bibtex_rows + render_row") as result:
+        with session_scope() as session:
+            with atomic_write(root / "core.bib") as file:
+                for _, row in select_bibtex_rows(session):
+                    file.write(render_row(row) + "\n\n")
+        same = (root / "core.bib").read_bytes() == (root / "orm.bib").read_bytes()
+        result["info"] = "same file" if same else "the files differ"
+    with timed("collection_to_bibfile, cold (fills the cache)"):
+        with session_scope() as session:
+            collection_to_bibfile(session, root / "cached.bib")
+    with timed("collection_to_bibfile, warm"):
+        with session_scope() as session:
+            collection_to_bibfile(session, root / "cached.bib", overwrite=True)
+    with timed("collection_to_bibfile, a journal renamed") as result:
+        with session_scope() as session:
+            journal = session.execute(select(Journal).limit(1)).scalar_one()
+            journal.name = journal.name + " (renamed)"
+            result["info"] = f"{len(journal.articles)} records re-rendered"
+            collection_to_bibfile(session, root / "cached.bib", overwrite=True)
+
+    with timed("update_bibfile, first export"):
+        with session_scope() as session:
+            update_bibfile(session, root / "incremental.bib")
+    with timed("update_bibfile, 100 records changed") as result:
+        with session_scope() as session:
+            ids = session.execute(select(Record.id).limit(100)).scalars().all()
+            statement = select(Record).where(Record.id.in_(ids))
+            for record in session.execute(statement).scalars():
+                record.note = "revised"
+            counts = update_bibfile(session, root / "incremental.bib")
+            result["info"] = f"{counts['changed']} changed"
+
+
+def bench_cache_workers(workers_list: List[int]):
+    print(f"filling the BibTeX cache with worker processes ({os.cpu_count()} CPUs)")
+    record = Record.__table__
+    serial = None
+    for workers in workers_list:
+        with session_scope() as session:
+            session.execute(
+                update(record).values(
+                    _bibtex=None, modified_date=record.c.modified_date
+                )
+            )
+        with timed(f"fill_bibtex_cache, workers={workers}") as result:
+            start = time.perf_counter()
+            with session_scope() as session:
+                fill_bibtex_cache(session, workers=workers)
+            seconds = time.perf_counter() - start
+            if serial is None:
+                serial = seconds
+            result["info"] = f"speedup {serial / seconds:.2f}"
+
+
+def bench_formats(root):
+    print("several formats")
+    with timed("bibtex, 1 pass"):
+        with session_scope() as session:
+            collection_to_files(session, _targets(root, _FORMATS[:1]), overwrite=True)
+    with timed("all 4 formats, 1 pass"):
+        with session_scope() as session:
+            collection_to_files(session, _targets(root, _FORMATS), overwrite=True)
+    with timed("all 4 formats, 4 passes"):
+        for target in _FORMATS:
+            with session_scope() as session:
+                collection_to_files(session, _targets(root, [target]), overwrite=True)
+
+
+def bench_writing(root):
+    print("writing the bibfile (cached BibTeX)")
+    for name, fsync in (("all.bib", False), ("all.bib", True), ("all.bib.gz", False)):
+        path = root / name
+        with timed(f"{name}{', fsync' if fsync else ''}") as result:
+            with session_scope() as session:
+                collection_to_bibfile(session, path, overwrite=True, fsync=fsync)
+            result["info"] = f"{path.stat().st_size / 10**6:.1f} MB"
+
+
+def _targets(root, formats):
+    return [(format_, root / name) for format_, name in formats]
+
+
+def main():
+    parser = make_parser(__doc__.splitlines()[0], records=20000)
+    parser.add_argument(
+        "--workers",
+        default="1,2,4",
+        help="numbers of processes filling the BibTeX cache (default 1,2,4)",
+    )
+    args = parser.parse_args()
+    root = new_collection(args.profile)
+    with timed(f"creating {args.records} records"):
+        fill_collection(args.records)
+    bench_loading(args.records)
+    bench_bibtex(root)
+    bench_cache_workers([int(workers) for workers in args.workers.split(",")])
+    bench_formats(root)
+    bench_writing(root)
+    remove_collection(root, args.keep)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Benchmark of importing records and keeping the record folders in sync.
+
+Measures, for --records synthetic records:
+- adding records one by one with record_from_dict (ORM) against
+  bulk_add_records (on --orm-records records, the ORM path is slow;
+  user-003),
+- writing the record folders with store_records (all added, then
+  all unchanged; user-018),
+- sync_collection right after store_records and after editing files
+  (user-016),
+- rebuilding the database from the record folders (reindex_collection;
+  user-015),
+- building and updating the pack file and reading every record from
+  the record files against reading them from the pack (user-020).
+
+usage: python benchmarks/bench_import.py [--records 100000] [--orm-records 2000]
+"""
+
+import json
+
+from _common import make_parser, new_collection, record_dict, remove_collection, timed
+
+from bibliophant.bulk import bulk_add_records
+from bibliophant.db_shortcuts import select_records, stream_records
+from bibliophant.json_io import record_from_dict, store_records
+from bibliophant.pack import Pack, update_pack
+from bibliophant.record_files import read_record_file, scan_record_folders
+from bibliophant.reindex import reindex_collection
+from bibliophant.session import session_scope, stop_engine
+from bibliophant.sync import sync_collection
+
+
+def bench_adding(n_orm: int, n: int, profile):
+    print(f"adding records ({n_orm} with the ORM, {n} in bulk)")
+    orm_root = new_collection(profile)
+    with timed(f"record_from_dict + session.add, {n_orm}"):
+        with session_scope() as session:
+            for i in range(n_orm):
+                session.add(record_from_dict(record_dict(i)))
+    remove_collection(orm_root)
+
+    root = new_collection(profile)
+    with timed(f"bulk_add_records, {n}") as result:
+        with session_scope() as session:
+            bulk_add_records(session, (record_dict(i) for i in range(n)))
+        result["info"] = f"{n / 1000:.0f}k records"
+    return root
+
+
+def bench_record_folders(root):
+    print("record folders")
+    with timed("store_records, all added"):
+        with session_scope() as session:
+            store_records(stream_records(session, select_records("full")), root)
+    with timed("store_records, all unchanged") as result:
+        with session_scope() as session:
+            written = store_records(
+                stream_records(session, select_records("full")), root
+            )
+        result["info"] = f"{len(written['added'] + written['changed'])} files written"
+    with timed("sync_collection after store_records") as result:
+        with session_scope() as session:
+            counts, _ = sync_collection(session, root)
+        result["info"] = f"{counts['changed']} changed"
+
+    names = sorted(scan_record_folders(root))
+    edited = names[:: max(len(names) // 100, 1)]
+    for name in edited:
+        path = root / name / f"{name}.json"
+        record = json.loads(path.read_text())
+        record["title"] += " (revised)"
+        path.write_text(json.dumps(record, indent=4))
+    with timed(f"sync_collection, {len(edited)} files edited") as result:
+        with session_scope() as session:
+            counts, _ = sync_collection(session, root)
+        result["info"] = f"{counts['changed']} changed"
+    with timed("sync_collection, nothing changed"):
+        with session_scope() as session:
+            sync_collection(session, root)
+
+
+def bench_reindex(root):
+    print("rebuilding the database from the record folders")
+    stop_engine()
+    with timed("reindex_collection") as result:
+        n_records, errors = reindex_collection(root)
+        result["info"] = f"{n_records} records, {len(errors)} errors"
+
+
+def bench_pack(root):
+    print("pack file")
+    with timed("update_pack, full build"):
+        update_pack(root)
+    with timed("update_pack, nothing changed"):
+        update_pack(root)
+    names = sorted(scan_record_folders(root))
+    with timed("read every record: record files"):
+        for name in names:
+            json.loads(read_record_file(root / name / f"{name}.json")[0])
+    with timed("read every record: pack"):
+        with Pack(root) as pack:
+            for name in names:
+                pack[name]
+    with timed("open pack and decode one record"):
+        with Pack(root) as pack:
+            pack[names[len(names) // 2]]
+
+
+def main():
+    parser = make_parser(__doc__.splitlines()[0], records=20000)
+    parser.add_argument(
+        "--orm-records",
+        type=int,
+        default=2000,
+        help="number of records added with the ORM (default 2000)",
+    )
+    args = parser.parse_args()
+    root = bench_adding(min(args.orm_records, args.records), args.records, args.profile)
+    bench_record_folders(root)
+    bench_reindex(root)
+    bench_pack(root)
+    remove_collection(root, args.keep)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Benchmark of the lookups served by the indexes of migration 1 (user-002).
+
+For each size in --sizes, a collection of synthetic records is created
+and --lookups random ORM lookups of each kind are timed without the
+indexes (as in databases created before migration 1) and with them:
+- a record by key and by DOI,
+- a tag by name and the tags of a record,
+- an author by last and first name.
+The time to create the indexes (ie. to migrate) is printed in between.
+The numbers of the request were measured with --sizes 10000,100000,1000000.
+
+usage: python benchmarks/bench_lookup.py [--sizes 10000,100000] [--lookups 500]
+"""
+
+import random
+import time
+
+from _common import (
+    fill_collection,
+    make_parser,
+    new_collection,
+    record_key,
+    remove_collection,
+    timed,
+)
+
+from sqlalchemy import select, text
+
+from bibliophant.models import Author, Record, Tag
+from bibliophant.models.base import _create_indexes
+from bibliophant.session import session_scope
+
+
+# the indexes created by migration 1 (cf. models.base)
+_INDEXES = [
+    "ix_record__key",
+    "ix_record__doi",
+    "ix_tag__name",
+    "ix_author_last_first",
+    "ix_journal__name",
+    "ix_publisher__name",
+    "ix_url_record_id",
+    "ix_article_journal_id",
+    "ix_article_eprint_id",
+    "ix_book_publisher_id",
+    "ix_author_association_record_author",
+    "ix_author_association_author_id",
+    "ix_tag_association_tag_record",
+    "ix_tag_association_record_id",
+]
+
+
+def _lookups(n_records: int, n_lookups: int):
+    """the lookups (name -> function of the session and a random number)"""
+
+    def by_key(session, i):
+        key = record_key(i % n_records)
+        return session.execute(select(Record).where(Record._key == key)).scalar_one()
+
+    def by_doi(session, i):
+        i = i % n_records
+        i += i % 5 == 0  # books have no DOI
+        doi = f"10.1000/x{i % n_records}"
+        return session.execute(select(Record).where(Record._doi == doi)).scalar()
+
+    def tag_by_name(session, i):
+        name = f"topic-{record_key(i % 100)[5:]}"
+        return session.execute(select(Tag).where(Tag._name == name)).scalar()
+
+    def tags_of_record(session, i):
+        return session.get(Record, 1 + i % n_records).tags
+
+    def author_by_name(session, i):
+        last = f"Auth{record_key(i % 500)}"
+        statement = select(Author).where(Author._last == last, Author._first == "John")
+        return session.execute(statement).scalars().first()
+
+    generator = random.Random(0)
+    numbers = [generator.randrange(10**9) for _ in range(n_lookups)]
+    return numbers, {
+        "key": by_key,
+        "doi": by_doi,
+        "tag": tag_by_name,
+        "tags of a record": tags_of_record,
+        "author": author_by_name,
+    }
+
+
+def _lookups_per_second(numbers, lookups):
+    rates = {}
+    for name, lookup in lookups.items():
+        with session_scope() as session:
+            start = time.perf_counter()
+            for i in numbers:
+                lookup(session, i)
+                # every lookup goes to the database
+                session.expunge_all()
+            rates[name] = len(numbers) / (time.perf_counter() - start)
+    return rates
+
+
+def bench_size(n_records: int, n_lookups: int, profile, keep: bool):
+    print(f"{n_records} records")
+    root = new_collection(profile)
+    with timed("creating the records"):
+        fill_collection(n_records)
+    numbers, lookups = _lookups(n_records, n_lookups)
+
+    with session_scope() as session:
+        for name in _INDEXES:
+            session.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    before = _lookups_per_second(numbers, lookups)
+    with timed("creating the indexes (migration 1)"):
+        with session_scope() as session:
+            _create_indexes(session.connection(), _INDEXES)
+    after = _lookups_per_second(numbers, lookups)
+
+    for name in lookups:
+        print(f"  {name:<20} {before[name]:8.0f} -> {after[name]:8.0f} lookups/s")
+    remove_collection(root, keep)
+
+
+def main():
+    parser = make_parser(__doc__.splitlines()[0], records=0)
+    parser.add_argument(
+        "--sizes",
+        default="10000,100000",
+        help="numbers of records, separated by commas (default 10000,100000)",
+    )
+    parser.add_argument(
+        "--lookups",
+        type=int,
+        default=500,
+        help="number of lookups of each kind (default 500)",
+    )
+    args = parser.parse_args()
+    for size in args.sizes.split(","):
+        bench_size(int(size), args.lookups, args.profile, args.keep)
+
+
+if __name__ == "__main__":
+    main()
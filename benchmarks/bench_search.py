@@ -0,0 +1,90 @@
+"""Benchmark of the full-text search (user-006).
+
+Runs --queries random queries of one to three words (the last word is
+matched as a prefix, as typed in the shell; half of the queries contain
+a rare word, the number of a record) against --records synthetic
+records and prints the median, 90th percentile and maximum latency of
+search_records (FTS5 index, at most 20 results) and of a LIKE search
+in the titles only, as done before the index existed.
+
+usage: python benchmarks/bench_search.py [--records 100000] [--queries 200]
+"""
+
+import random
+import statistics
+import time
+
+from _common import (
+    WORDS,
+    fill_collection,
+    make_parser,
+    new_collection,
+    remove_collection,
+    timed,
+)
+
+from sqlalchemy import and_, select
+
+from bibliophant.models import Record
+from bibliophant.search import search_records
+from bibliophant.session import session_scope
+
+
+def _queries(n: int, n_records: int):
+    generator = random.Random(0)
+    queries = []
+    for i in range(n):
+        words = generator.sample(WORDS, generator.randint(1, 3))
+        if i % 2:
+            words.insert(0, str(generator.randrange(n_records)))
+        # an incomplete last word, as while typing
+        words[-1] = words[-1][: generator.randint(3, len(words[-1]))]
+        queries.append(" ".join(words))
+    return queries
+
+
+def _like_search(session, query: str):
+    conditions = [Record._title.like(f"%{word}%") for word in query.split()]
+    statement = select(Record).where(and_(*conditions)).limit(20)
+    return session.execute(statement).scalars().all()
+
+
+def _latencies(search, queries):
+    """runs the queries and prints the latency statistics"""
+    seconds = []
+    with session_scope() as session:
+        for query in queries:
+            start = time.perf_counter()
+            search(session, query)
+            seconds.append(time.perf_counter() - start)
+    seconds.sort()
+    p90 = seconds[int(0.9 * (len(seconds) - 1))]
+    print(
+        f"  median {statistics.median(seconds) * 1000:.1f} ms,"
+        f" p90 {p90 * 1000:.1f} ms, max {seconds[-1] * 1000:.1f} ms"
+    )
+
+
+def main():
+    parser = make_parser(__doc__.splitlines()[0], records=100000)
+    parser.add_argument(
+        "--queries",
+        type=int,
+        default=200,
+        help="number of random queries (default 200)",
+    )
+    args = parser.parse_args()
+    root = new_collection(args.profile)
+    with timed(f"creating {args.records} records"):
+        fill_collection(args.records)
+    queries = _queries(args.queries, args.records)
+
+    print(f"search_records (FTS5), {len(queries)} queries")
+    _latencies(lambda session, query: search_records(session, query, limit=20), queries)
+    print(f"LIKE on the title, {len(queries)} queries")
+    _latencies(_like_search, queries)
+    remove_collection(root, args.keep)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,572 @@
+"""This module contains functions for adding many records to the database at once.
+
+Other than record_from_dict, bulk_add_records does not create ORM objects.
+The record dicts are checked with the validators of the models,
+and the resulting rows are inserted chunk by chunk with executemany.
+
+Authors, journals, publishers and tags are shared between records.
+An EntityCache maps their normalized names to the ids of the rows
+in the database, so that each of them is stored only once.
+
+example:
+> with session_scope() as s:
+>     bulk_add_records(s, [load_json(p) for p in paths], chunk_size=5000)
+"""
+
+__all__ = [
+    "PreparedRecord",
+    "prepare_record",
+    "EntityCache",
+    "bulk_add_prepared",
+    "bulk_add_records",
+    "bulk_update_prepared",
+]
+
+
+from collections import namedtuple
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, select, update
+
+from .db_shortcuts import (
+    _chunks as _id_chunks,
+    _delete_dangling,
+    _delete_rows,
+    _forget_deleted,
+    _linked_children,
+    exists_keys,
+    key_index,
+)
+from .models import Record, Article, Book, Author, Journal, Publisher, Eprint, Tag, Url
+from .models.author import author_association_table
+from .models.tag import tag_association_table
+from .models import record as record_module
+from .models import article as article_module
+from .models import book as book_module
+from .models import author as author_module
+from .models import journal as journal_module
+from .models import publisher as publisher_module
+from .models import eprint as eprint_module
+from .models import tag as tag_module
+from .models import url as url_module
+
+
+_RECORD_FIELDS = ("key", "title", "year", "doi", "month", "note", "open_access")
+
+_RECORD_VALIDATORS = {
+    "key": record_module.validate_key,
+    "title": record_module.validate_title,
+    "year": record_module.validate_year,
+    "doi": record_module.validate_doi,
+    "month": record_module.validate_month,
+    "note": record_module.validate_note,
+    "open_access": record_module.validate_open_access,
+}
+
+_SUBCLASS_VALIDATORS = {
+    "article": {
+        "volume": article_module.validate_volume,
+        "number": article_module.validate_number,
+        "pages": article_module.validate_pages,
+        "abstract": article_module.validate_abstract,
+    },
+    "book": {
+        "volume": book_module.validate_volume,
+        "edition": book_module.validate_edition,
+        "series": book_module.validate_series,
+    },
+}
+
+_ENTITY_FIELDS = {"article": ("journal", "eprint"), "book": ("publisher",)}
+
+_LIST_FIELDS = ("authors", "urls", "tags")
+
+
+# a record dict which has passed validation,
+# broken up into the rows of the different tables
+# (plain data only, so it can be passed between processes)
+PreparedRecord = namedtuple(
+    "PreparedRecord",
+    "type key record subclass authors urls tags journal publisher eprint",
+)
+
+
+def _check_fields(name: str, dict_: Dict, allowed: Tuple[str, ...]):
+    if not isinstance(dict_, dict):
+        raise ValueError(f"{name} must be a dict")
+    for field in dict_:
+        if field not in allowed:
+            raise ValueError(f"{name} has an unexpected field '{field}'")
+
+
+def _prepare_author(author: Dict) -> Dict:
+    _check_fields("author", author, ("last", "first", "email"))
+    if "last" not in author:
+        raise ValueError("author must have a field 'last'")
+    return {
+        "_last": author_module.validate_last(author["last"]),
+        "_first": author_module.validate_first(author.get("first")),
+        "_email": author_module.validate_email(author.get("email")),
+    }
+
+
+def _prepare_journal(journal: Dict) -> Dict:
+    _check_fields("journal", journal, ("name",))
+    if "name" not in journal:
+        raise ValueError("journal must have a field 'name'")
+    return {"_name": journal_module.validate_name(journal["name"])}
+
+
+def _prepare_publisher(publisher: Dict) -> Dict:
+    _check_fields("publisher", publisher, ("name", "address"))
+    if "name" not in publisher:
+        raise ValueError("publisher must have a field 'name'")
+    return {
+        "_name": publisher_module.validate_name(publisher["name"]),
+        "_address": publisher_module.validate_address(publisher.get("address")),
+    }
+
+
+def _prepare_eprint(eprint: Dict) -> Dict:
+    _check_fields("eprint", eprint, ("eprint", "archive_prefix", "primary_class"))
+    if "eprint" not in eprint:
+        raise ValueError("eprint must have a field 'eprint'")
+    return {
+        "_eprint": eprint_module.validate_eprint(eprint["eprint"]),
+        "_archive_prefix": eprint_module.validate_archive_prefix(
+            eprint["eprint"], eprint.get("archive_prefix")
+        ),
+        "_primary_class": eprint_module.validate_primary_class(
+            eprint["eprint"], eprint.get("primary_class")
+        ),
+    }
+
+
+def _prepare_url(url: Dict) -> Dict:
+    _check_fields("url", url, ("url", "description"))
+    if "url" not in url:
+        raise ValueError("url must have a field 'url'")
+    return {
+        "_url": url_module.validate_url(url["url"]),
+        "_description": url_module.validate_description(url.get("description")),
+    }
+
+
+def _prepare_tag(tag: Dict) -> Dict:
+    _check_fields("tag", tag, ("name", "color"))
+    if "name" not in tag:
+        raise ValueError("tag must have a field 'name'")
+    return {
+        "_name": tag_module.validate_name(tag["name"]),
+        "_color": tag_module.validate_color(tag.get("color")),
+    }
+
+
+def _prepare_list(name: str, values, prepare, str_) -> List[Dict]:
+    """validate a list of entities like validate_authors etc. do"""
+    if not isinstance(values, list):
+        raise ValueError(f"{name} must be a list")
+    rows = [prepare(value) for value in values]
+    if len(rows) > len(set(str_(row) for row in rows)):
+        raise ValueError("elements must be unique")
+    return rows
+
+
+def prepare_record(record_dict: Dict) -> PreparedRecord:
+    """Validates a record dict (as used by record_from_dict)
+    and turns it into a PreparedRecord.
+    Raises ValueError if the dict does not describe a valid record.
+    """
+    record_dict = record_dict.copy()
+
+    try:
+        type_ = record_dict.pop("type")
+    except KeyError:
+        raise ValueError("record_dict must have a key 'type'")
+    if type_ not in _SUBCLASS_VALIDATORS:
+        raise ValueError("record_dict['type'] must be 'book' or 'article'")
+
+    subclass_validators = _SUBCLASS_VALIDATORS[type_]
+    _check_fields(
+        type_,
+        record_dict,
+        _RECORD_FIELDS
+        + _LIST_FIELDS
+        + _ENTITY_FIELDS[type_]
+        + tuple(subclass_validators),
+    )
+
+    for field in ("key", "title", "year", "authors"):
+        if field not in record_dict:
+            raise ValueError(f"{type_} must have a field '{field}'")
+
+    record = {"record_type": type_}
+    for field in _RECORD_FIELDS:
+        record["_" + field] = _RECORD_VALIDATORS[field](record_dict.get(field))
+
+    subclass = {}
+    for field, validate in subclass_validators.items():
+        subclass["_" + field] = validate(record_dict.get(field))
+
+    authors = _prepare_list(
+        "authors",
+        record_dict["authors"],
+        _prepare_author,
+        lambda a: (a["_last"], a["_first"]),
+    )
+    if not authors:
+        raise ValueError("authors must be a non-empty list")
+
+    urls = _prepare_list(
+        "urls", record_dict.get("urls", []), _prepare_url, lambda u: u["_url"]
+    )
+    tags = _prepare_list(
+        "tags", record_dict.get("tags", []), _prepare_tag, lambda t: t["_name"]
+    )
+
+    journal = publisher = eprint = None
+    if type_ == "article":
+        if "journal" not in record_dict:
+            raise ValueError("article must have a field 'journal'")
+        journal = _prepare_journal(record_dict["journal"])
+        if record_dict.get("eprint") is not None:
+            eprint = _prepare_eprint(record_dict["eprint"])
+    else:
+        if "publisher" not in record_dict:
+            raise ValueError("book must have a field 'publisher'")
+        publisher = _prepare_publisher(record_dict["publisher"])
+
+    return PreparedRecord(
+        type=type_,
+        key=record["_key"],
+        record=record,
+        subclass=subclass,
+        authors=authors,
+        urls=urls,
+        tags=tags,
+        journal=journal,
+        publisher=publisher,
+        eprint=eprint,
+    )
+
+
+def _author_name(row) -> Tuple[str, str]:
+    return (row["_last"].casefold(), (row["_first"] or "").casefold())
+
+
+def _journal_name(row) -> str:
+    return row["_name"].casefold()
+
+
+def _publisher_name(row) -> Tuple[str, str]:
+    return (row["_name"].casefold(), (row["_address"] or "").casefold())
+
+
+def _tag_name(row) -> str:
+    return row["_name"]
+
+
+class EntityCache:
+    """In-memory identity map for the entities which are shared between records.
+    Maps the normalized name of an author, journal, publisher or tag
+    to the id of its row in the database.
+    The existing rows of a table are read when the table is first needed.
+    If the database already contains duplicates, the oldest row wins.
+    An EntityCache must only be used with one database
+    and becomes invalid when the session rolls back.
+    """
+
+    _ENTITIES = {
+        "author": (Author.__table__, ("_last", "_first"), _author_name),
+        "journal": (Journal.__table__, ("_name",), _journal_name),
+        "publisher": (Publisher.__table__, ("_name", "_address"), _publisher_name),
+        "tag": (Tag.__table__, ("_name",), _tag_name),
+    }
+
+    def __init__(self):
+        self._ids = {}  # entity -> {normalized name -> id}
+
+    def _load(self, session, entity: str) -> Dict:
+        if entity not in self._ids:
+            table, columns, normalize = self._ENTITIES[entity]
+            ids = {}
+            rows = session.execute(
+                select(table.c.id, *(table.c[c] for c in columns)).order_by(
+                    table.c.id.desc()
+                )
+            )
+            for row in rows:
+                ids[normalize(row._mapping)] = row.id
+            self._ids[entity] = ids
+        return self._ids[entity]
+
+    def allocate_ids(self, session, table, n: int) -> range:
+        """Returns n consecutive ids for new rows of a table,
+        which must be inserted in the same transaction.
+        The largest id is read again every time (a cheap lookup
+        in the primary key), so rows inserted in between by other
+        writers are not collided with.
+        """
+        max_id = session.execute(select(func.max(table.c.id))).scalar()
+        start = (max_id or 0) + 1
+        return range(start, start + n)
+
+    def resolve(self, session, entity: str, rows: Iterable[Dict]) -> List[int]:
+        """Returns the ids of the given (validated) entity rows.
+        Entities that are not yet in the database are inserted.
+        """
+        table, _, normalize = self._ENTITIES[entity]
+        ids = self._load(session, entity)
+
+        names = [normalize(row) for row in rows]
+        new_rows = {}
+        for name, row in zip(names, rows):
+            if name not in ids and name not in new_rows:
+                new_rows[name] = row
+
+        if new_rows:
+            new_ids = self.allocate_ids(session, table, len(new_rows))
+            values = []
+            for (name, row), id_ in zip(new_rows.items(), new_ids):
+                ids[name] = id_
+                values.append(dict(row, id=id_))
+            session.execute(table.insert(), values)
+
+        return [ids[name] for name in names]
+
+    def forget(self, entity: str, ids: Iterable[int]):
+        """Forgets the rows of an entity with the given ids
+        (eg. after they were deleted).
+        """
+        ids = set(ids)
+        if ids and entity in self._ids:
+            self._ids[entity] = {
+                name: id_ for name, id_ in self._ids[entity].items() if id_ not in ids
+            }
+
+
+# the model classes of the entities in an EntityCache
+_ENTITY_CLASSES = {
+    Author: "author",
+    Journal: "journal",
+    Publisher: "publisher",
+    Tag: "tag",
+}
+
+
+def _chunks(iterable: Iterable, chunk_size: int) -> Iterable[List]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _insert_chunk(
+    session,
+    prepared: List[PreparedRecord],
+    cache: EntityCache,
+    record_ids: Optional[List[int]] = None,
+):
+    """Inserts a chunk of prepared records with a few executemany statements.
+    If the ids of existing records (without children) are given,
+    their rows are updated instead.
+    """
+    keys = [p.key for p in prepared]
+    if len(keys) > len(set(keys)):
+        raise ValueError("the records must have unique keys")
+    if record_ids is None:
+        existing = exists_keys(session, keys)
+        if existing:
+            raise ValueError(
+                "records with the following keys already exist: "
+                + ", ".join(sorted(existing))
+            )
+
+    # shared entities
+    flat_authors = [a for p in prepared for a in p.authors]
+    author_ids = iter(cache.resolve(session, "author", flat_authors))
+    flat_tags = [t for p in prepared for t in p.tags]
+    tag_ids = iter(cache.resolve(session, "tag", flat_tags))
+    journals = [p.journal for p in prepared if p.journal is not None]
+    journal_ids = iter(cache.resolve(session, "journal", journals))
+    publishers = [p.publisher for p in prepared if p.publisher is not None]
+    publisher_ids = iter(cache.resolve(session, "publisher", publishers))
+
+    # entities which belong to a single record
+    eprints = [p.eprint for p in prepared if p.eprint is not None]
+    eprint_ids = iter(cache.allocate_ids(session, Eprint.__table__, len(eprints)))
+    eprint_rows = []
+
+    update_records = record_ids is not None
+    if not update_records:
+        record_ids = cache.allocate_ids(session, Record.__table__, len(prepared))
+    record_rows = []
+    subclass_rows = {"article": [], "book": []}
+    url_rows = []
+    author_links = []
+    tag_links = []
+
+    for p, record_id in zip(prepared, record_ids):
+        record_rows.append(dict(p.record, id=record_id))
+
+        subclass_row = dict(p.subclass, id=record_id)
+        if p.type == "article":
+            subclass_row["journal_id"] = next(journal_ids)
+            subclass_row["eprint_id"] = None
+            if p.eprint is not None:
+                eprint_id = next(eprint_ids)
+                eprint_rows.append(dict(p.eprint, id=eprint_id))
+                subclass_row["eprint_id"] = eprint_id
+        else:
+            subclass_row["publisher_id"] = next(publisher_ids)
+        subclass_rows[p.type].append(subclass_row)
+
+        for _ in p.authors:
+            author_links.append({"author_id": next(author_ids), "record_id": record_id})
+        for _ in p.tags:
+            tag_links.append({"tag_id": next(tag_ids), "record_id": record_id})
+        for url in p.urls:
+            url_rows.append(dict(url, record_id=record_id))
+
+    # The record rows come last, so that the triggers of the search index
+    # (cf. models/search_index.py) index every record once with all its parts.
+    for table, rows in (
+        (Eprint.__table__, eprint_rows),
+        (Article.__table__, subclass_rows["article"]),
+        (Book.__table__, subclass_rows["book"]),
+        (Url.__table__, url_rows),
+        (author_association_table, author_links),
+        (tag_association_table, tag_links),
+    ):
+        if rows:
+            session.execute(table.insert(), rows)
+    if update_records:
+        # the id and the created_date stay, the cached BibTeX is outdated
+        record = Record.__table__
+        session.execute(
+            update(record).where(record.c.id == bindparam("record_id")),
+            [dict(row, record_id=row.pop("id"), _bibtex=None) for row in record_rows],
+        )
+        return
+    session.execute(Record.__table__.insert(), record_rows)
+
+    index = key_index(session, refresh=False)
+    for key in keys:
+        index.add(key)
+
+
+def bulk_add_prepared(
+    session: "sqlalchemy.orm.session.Session",
+    prepared_records: Iterable[PreparedRecord],
+    chunk_size: int = 1000,
+    cache: Optional[EntityCache] = None,
+) -> int:
+    """Adds many records which were already validated by prepare_record
+    (eg. in worker processes) to the database.
+    Refer to bulk_add_records for further details.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive int")
+
+    if cache is None:
+        cache = EntityCache()
+
+    # pending ORM objects must get their ids before we allocate ours
+    session.flush()
+
+    n_records = 0
+    for prepared in _chunks(prepared_records, chunk_size):
+        _insert_chunk(session, prepared, cache)
+        n_records += len(prepared)
+
+    return n_records
+
+
+def bulk_update_prepared(
+    session: "sqlalchemy.orm.session.Session",
+    prepared_records: Iterable[PreparedRecord],
+    chunk_size: int = 1000,
+    cache: Optional[EntityCache] = None,
+) -> int:
+    """Replaces the content of existing records (found by their keys)
+    with the given prepared records (cf. prepare_record).
+    The rows of the records are updated in place, so their ids
+    and created_date stay the same; their authors, tags, URLs, journals,
+    publishers and eprints are replaced. Authors, tags, journals and
+    publishers which are no longer linked to any record are deleted.
+    Afterwards all instances in the session are expired.
+    Returns the number of updated records.
+    Raises ValueError if a key does not exist (or is given twice).
+    In that case the session should be rolled back.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive int")
+
+    if cache is None:
+        cache = EntityCache()
+
+    session.flush()
+    record = Record.__table__
+    n_records = 0
+    deleted = {}
+    for prepared in _chunks(prepared_records, chunk_size):
+        keys = [p.key for p in prepared]
+        ids = {}
+        for chunk in _id_chunks(keys):
+            ids.update(
+                session.execute(
+                    select(record.c._key, record.c.id).where(record.c._key.in_(chunk))
+                ).all()
+            )
+        missing = [key for key in keys if key not in ids]
+        if missing:
+            raise ValueError(
+                "records with the following keys do not exist: "
+                + ", ".join(sorted(missing))
+            )
+        record_ids = [ids[key] for key in keys]
+
+        counts = {}
+        candidates, eprint_ids = _linked_children(session, record_ids)
+        _delete_rows(session, record_ids, eprint_ids, counts, keep_records=True)
+        _insert_chunk(session, prepared, cache, record_ids)
+        chunk_deleted = _delete_dangling(session, candidates, counts)
+        chunk_deleted[Eprint] = eprint_ids
+        for cls, entity in _ENTITY_CLASSES.items():
+            cache.forget(entity, chunk_deleted[cls])
+        for cls, deleted_ids in chunk_deleted.items():
+            deleted.setdefault(cls, []).extend(deleted_ids)
+        n_records += len(prepared)
+
+    _forget_deleted(session, deleted)
+    return n_records
+
+
+def _prepare_records(record_dicts: Iterable[Dict]) -> Iterator[PreparedRecord]:
+    for i, record_dict in enumerate(record_dicts):
+        try:
+            yield prepare_record(record_dict)
+        except ValueError as error:
+            key = record_dict.get("key") if isinstance(record_dict, dict) else None
+            raise ValueError(f"record {key or i}: {error}")
+
+
+def bulk_add_records(
+    session: "sqlalchemy.orm.session.Session",
+    record_dicts: Iterable[Dict],
+    chunk_size: int = 1000,
+    cache: Optional[EntityCache] = None,
+) -> int:
+    """Adds many records (given as dicts like for record_from_dict) to the database.
+    The records are validated and inserted in chunks of chunk_size.
+    Authors, journals, publishers and tags are looked up in the EntityCache
+    (a new one is created if cache is None), so that they are shared
+    with existing records instead of being duplicated.
+    Returns the number of added records.
+    Raises ValueError if a record is invalid or its key already exists.
+    In that case the session should be rolled back.
+    """
+    return bulk_add_prepared(session, _prepare_records(record_dicts), chunk_size, cache)
@@ -4,4 +4,16 @@ __all__ = ["root_command"]
 
 from .bib import bib as root_command
 
-from . import exporters, get, help, importers, tag_untag
+from . import (
+    exporters,
+    fsck,
+    get,
+    help,
+    importers,
+    pack,
+    pdfs,
+    reindex,
+    search,
+    sync,
+    tag_untag,
+)
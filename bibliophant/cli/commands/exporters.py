@@ -1,17 +1,49 @@
-"""This module defines the 'export' command group of the application."""
+"""This module defines the 'export' command of the application."""
 
-from ..repl import Command
-from .bib import bib
+from pathlib import Path
+import sys
 
+from bibliophant.exporters.pipeline import WRITERS, export_records, feed_writers
 
-export_group = bib.add_command_group("export", "receiving-closed")
+from ..repl import Command, QueryAbortError
+from ..repl.misc import ask_yes_no
+from .bib import bib
 
 
-@export_group.add("doi")
-class BibTeX(Command):
+@bib.add("export", "receiving-closed")
+class Export(Command):
     def execute(self, arguments, session, config, result=None):
-        # TODO
-        print("export all received records as BibTeX")
+        words = arguments.split()
+        overwrite = bool(words) and words[-1] == "overwrite"
+        if overwrite:
+            words.pop()
+        if not words:
+            raise QueryAbortError(f"'export' requires a format ({', '.join(WRITERS)}).")
+
+        # a single format without a path is printed to the command line
+        if len(words) == 1:
+            if words[0] not in WRITERS:
+                raise QueryAbortError(f"'{words[0]}' is not a format.")
+            feed_writers(result, [WRITERS[words[0]](sys.stdout)])
+            return
+
+        if len(words) % 2:
+            raise QueryAbortError("Every format requires a path.")
+        targets = [
+            (format_, Path(path).expanduser())
+            for format_, path in zip(words[::2], words[1::2])
+        ]
+
+        try:
+            try:
+                export_records(result, targets, overwrite=overwrite)
+            except FileExistsError as error:
+                question = f"{error}, overwrite it and all other existing files?"
+                if not ask_yes_no(question):
+                    raise QueryAbortError("The export was cancelled.")
+                export_records(result, targets, overwrite=True)
+        except (FileNotFoundError, ValueError) as error:
+            raise QueryAbortError(f"Cannot export: {error}.")
 
     def get_completions(self, document, complete_event):
         # TODO
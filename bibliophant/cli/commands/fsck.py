@@ -0,0 +1,19 @@
+"""This module defines the 'fsck' command."""
+
+from bibliophant.fsck import check_collection
+
+from ..repl import Command
+from .bib import bib
+
+
+@bib.add("fsck", "closed-closed")
+class Fsck(Command):
+    def execute(self, arguments, session, config, result=None):
+        n_findings = 0
+        for finding in check_collection(session, config["root"]):
+            print(f"{finding.kind}: {finding.key}: {finding.message}", flush=True)
+            n_findings += 1
+        if n_findings:
+            print(f"{n_findings} problems found.")
+        else:
+            print("No problems found.")
@@ -1,6 +1,8 @@
 """This module defines the 'get' command group of the application."""
 
-from ..repl import Command
+from bibliophant.search import search_records
+
+from ..repl import Command, QueryAbortError
 from .bib import bib
 
 
@@ -21,8 +23,10 @@ class GetKey(Command):
 @get_group.add("title")
 class GetTitle(Command):
     def execute(self, arguments, session, config, result=None):
-        # TODO
-        print("get a record given (parts of) its title")
+        records = search_records(session, arguments, fields=["title"], limit=1)
+        if not records:
+            raise QueryAbortError(f"There is no record with the title '{arguments}'.")
+        return records
 
     def get_completions(self, document, complete_event):
         # TODO
@@ -42,6 +42,41 @@ This section presents the commands which cannot be chained together.
     Imports various bibliophant modules.
     Established a connection to the database.
 
+`sync`
+    Updates the database after record folders were added, changed
+    or removed by other means (eg. by a `git pull`).
+    Only the JSON files which changed since the previous
+    sync (or reindex) are read.
+    Record folders with an invalid JSON file are skipped and reported.
+
+`reindex [yes]`
+    Rebuilds the database from the JSON files in the record folders,
+    eg. after the database file was damaged or the record folders
+    were changed by other means (like a git checkout).
+    Record folders with a missing or invalid JSON file are skipped
+    and reported. If the 'yes' option is not provided,
+    the command asks for confirmation.
+
+`fsck`
+    Checks that every record has a record folder with a JSON file
+    of the same content, that every record folder belongs to a record
+    and that the records are still valid.
+    The problems are reported as they are found; nothing is changed.
+
+`pack`
+    Creates or updates the pack file bibliophant.pack, which holds
+    the JSON files of all record folders in a single file
+    for tools which read many records at once.
+    Only the JSON files which changed since the previous
+    update are read.
+
+`pdfs`
+    Updates the index of the PDF files in the record folders
+    and reports PDF files with the same content and records
+    without a PDF file.
+    Only the PDF files which changed since the previous
+    update are read.
+
 
 All 'edit' commands save changes to the database and to all
 the affected JSON files in the collection's record folders.
@@ -81,11 +116,13 @@ and in a JSON file within the created record folder.
     If a path to a PDF file is provided,
     this file is moved into the created record folder.
 
-`import doi <DOI> [<path to pdf>]` --> {record}
-    Given a DOI, tries to fetch bibliographic data from the web.
-    Opens the article editor (with certain fields already filled in).
-    If a path to a PDF file is provided,
-    this file is moved into the created record folder.
+`import doi (<DOI>... | <path to file>)` --> {records}
+    Given DOIs or a file with one DOI per line (lines starting
+    with '#' are skipped), fetches bibliographic data from Crossref
+    (a few requests at a time, at most 5 per second)
+    and adds the records to the collection.
+    DOIs which are already in the collection are skipped,
+    DOIs which cannot be imported are reported.
 
 `import arxiv <arXiv id>` --> {record}
     Given an arXiv id, tries to fetch bibliographic data from the arXiv.
@@ -113,8 +150,11 @@ It does not make sense to run these commands solo.
 
 `get title <record title>` --> {record}
     Given (parts of) the title of a record (article or book),
-    gets the record from the database,
+    gets the best matching record from the database,
     and passes it on to the follow-up command.
+    Words are matched as a whole (ignoring case and accents),
+    except for the last word and words ending with '*',
+    which may be incomplete.
 
 `get doi <doi> -->` {record}
     Given the DOI of a record (article or book),
@@ -150,6 +190,14 @@ only the first <limit> most recent results will be passed on.
     Passes on all or the <limit> most-recently added books,
     which were published by the given publisher.
 
+`search <words> [<limit>]` --> {records}
+    Passes on all or the <limit> best matching records,
+    which contain all the given words in their title, abstract,
+    note, author names or journal name.
+    The words are matched like the ones of `get title`.
+    Matches in the title count the most, followed by
+    matches in the author names and in the journal name.
+
 
 ## Follow-up sub-queries (the receiving-producing kind)
 
@@ -199,14 +247,20 @@ of a pipeline.
     The commands used for opening PDF files and folders,
     can be specified in the configuration file.
 
-{records} --> `export bibtex [< path to bib file > [overwrite]]`
-    Converts all received records to the BibTeX format.
-    If a path to a '*.bib' file is provided,
-    the output will be written in that file.
-    If the file already exists, the command asks
+{records} --> `export <format> [<path> [<format> <path> ...]] [overwrite]`
+    Converts all received records to the given formats
+    and writes each format into the file following it.
+    The formats are 'bibtex' ('*.bib' file), 'csljson' ('*.json' file),
+    'ris' ('*.ris' file) and 'ndjson' ('*.ndjson' or '*.jsonl' file).
+    All files are written in a single pass over the records,
+    eg. `export bibtex refs.bib csljson refs.json ris refs.ris`.
+    A file whose path ends in an additional '.gz' (or '.zst')
+    is compressed with gzip (or Zstandard, if installed).
+    The files are replaced only once they were written completely.
+    If a file already exists, the command asks
     if it should be overwritten. This confirmation can be provided
     when invoking the command with the 'overwrite' option.
-    If no path is given, the BibTeX output will be
+    If a single format is given without a path, the output will be
     printed to the command line.
 
 {records} --> `delete [yes] [dangling]`
@@ -246,6 +300,9 @@ of a pipeline.
 - Export the entire collection to a BibTeX file:  
   `get all : export bibtex ~/Desktop/references.bib overwrite`
 
+- Export the records tagged 'thesis' to a BibTeX and a CSL-JSON file:  
+  `get tag thesis : export bibtex thesis.bib csljson thesis.json`
+
 
 # Configuration
 
@@ -268,4 +325,28 @@ A configuration file (~/.bibliophant) might then look like this:
 }
 
 Note that the JSON format is very picky about commas.
+
+The following options are optional:
+- "history": true enables a persistent command history
+- "watch": true keeps the database in sync with the record folders
+  while the interactive shell is running (cf. the sync command)
+- "sqlite_profile" selects how SQLite accesses the database file
+- "http_cache" configures the cache of the responses of Crossref
+  and the arXiv (in the file .http_cache.db in the collection's folder)
+
+The SQLite profile can be "default", "safe" or "performance".
+"safe" and "performance" use a write-ahead log, which lets several
+bib processes read a collection while another one writes to it.
+"performance" additionally uses a larger page cache and memory-mapped I/O.
+Individual settings can be overridden by giving an object instead:
+    "sqlite_profile": {"profile": "performance", "cache_size": -131072}
+Supported settings are journal_mode, synchronous, cache_size,
+mmap_size, temp_store and busy_timeout (cf. the SQLite PRAGMA documentation).
+
+The HTTP cache is enabled by default; false disables it.
+Cached responses are used for "ttl_days" days (default 7), then they are
+revalidated with the server. Once the cache holds more than "max_mb"
+megabytes (default 100), the least recently used responses are removed.
+With "offline": true, the importers only use cached responses:
+    "http_cache": {"ttl_days": 30, "max_mb": 200, "offline": false}
 """
@@ -1,17 +1,131 @@
 """This module defines the 'import' command group of the application."""
 
-from ..repl import Command
+from pathlib import Path
+import re
+from typing import List, Set
+
+from sqlalchemy import func, select
+
+from bibliophant.bulk import bulk_add_prepared, prepare_record
+from bibliophant.db_shortcuts import key_index, select_records
+from bibliophant.importers.crossref import dois_to_records
+from bibliophant.importers.http import HttpCache, get_cache, set_cache
+from bibliophant.json_io import store_records
+from bibliophant.models.record import Record
+
+from ..repl import Command, QueryAbortError, print_error
 from .bib import bib
 
 
+# keep the number of bound parameters per statement well below SQLite's limit
+_CHUNK_SIZE = 500
+
+# the prefixes with which DOIs are often written (cf. _normalize_doi)
+_DOI_PREFIX = re.compile(r"^(?:https?://(?:dx[.])?doi[.]org/|doi:)", re.IGNORECASE)
+
 import_group = bib.add_command_group("import", "closed-producing")
 
 
+def _read_identifiers(arguments: str) -> List[str]:
+    """the identifiers given on the command line
+    or, if the argument is a file, the lines of the file
+    (empty lines and lines starting with '#' are skipped)
+    """
+    words = arguments.split()
+    if len(words) == 1 and Path(words[0]).expanduser().is_file():
+        lines = Path(words[0]).expanduser().read_text().splitlines()
+        return [
+            line.strip()
+            for line in lines
+            if line.strip() and not line.lstrip().startswith("#")
+        ]
+    return words
+
+
+def _open_http_cache(config):
+    """sets the cache used by the importers (once, on first use),
+    cf. _http_cache_settings in main
+    """
+    settings = config.get("http_cache", {})
+    if settings is None or get_cache() is not None:
+        return
+    set_cache(
+        HttpCache(
+            config["root"] / ".http_cache.db",
+            ttl=settings.get("ttl_days", 7) * 24 * 3600,
+            max_size=settings.get("max_mb", 100) * 10**6,
+            offline=settings.get("offline", False),
+        )
+    )
+
+
+def _normalize_doi(doi: str) -> str:
+    """the DOI without a resolver URL or 'doi:' prefix, in lower case
+    (DOIs are case insensitive)
+    """
+    return _DOI_PREFIX.sub("", doi.strip()).lower()
+
+
+def _existing_dois(session, dois: List[str]) -> Set[str]:
+    """the (normalized) DOIs which are already in the collection"""
+    record = Record.__table__
+    doi = func.lower(record.c._doi)
+    existing = set()
+    for i in range(0, len(dois), _CHUNK_SIZE):
+        existing.update(
+            session.execute(
+                select(doi).where(doi.in_(dois[i : i + _CHUNK_SIZE]))
+            ).scalars()
+        )
+    return existing
+
+
 @import_group.add("doi")
 class ImportDoi(Command):
     def execute(self, arguments, session, config, result=None):
-        # TODO
-        print("import from Crossref and spin up the editor soon ...")
+        dois = _read_identifiers(arguments)
+        if not dois:
+            raise QueryAbortError("'import doi' requires DOIs or a file of DOIs.")
+
+        # normalized and without duplicates (in the given order)
+        dois = list(dict.fromkeys(_normalize_doi(doi) for doi in dois))
+        existing = _existing_dois(session, dois)
+        for doi in sorted(existing):
+            print(f"{doi} is already in the collection.")
+        dois = [doi for doi in dois if doi not in existing]
+
+        _open_http_cache(config)
+        records, errors = dois_to_records(dois)
+        for doi, message in errors.items():
+            print_error(f"could not import {doi}: {message}")
+        if not records:
+            raise QueryAbortError("No records were imported.")
+
+        # an invalid record is reported and does not stop the others
+        index = key_index(session)
+        prepared = []
+        for doi, record in records.items():
+            record["key"] = index.allocate(record["year"], record["authors"])
+            try:
+                prepared.append(prepare_record(record))
+            except ValueError as error:
+                print_error(f"could not import {doi}: {error}")
+        if not prepared:
+            raise QueryAbortError("No records were imported.")
+        try:
+            bulk_add_prepared(session, prepared)
+        except ValueError as error:
+            raise QueryAbortError(f"Cannot import: {error}.")
+
+        keys = [item.key for item in prepared]
+        added = (
+            session.execute(select_records("full").where(Record.key.in_(keys)))
+            .scalars()
+            .all()
+        )
+        store_records(added, config["root"])
+        print(f"Imported {len(added)} records.")
+        return added
 
     def get_completions(self, document, complete_event):
         # TODO
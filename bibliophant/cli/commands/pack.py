@@ -0,0 +1,16 @@
+"""This module defines the 'pack' command."""
+
+from bibliophant.pack import update_pack
+
+from ..repl import Command
+from .bib import bib
+
+
+@bib.add("pack", "closed-closed")
+class Pack(Command):
+    def execute(self, arguments, session, config, result=None):
+        counts = update_pack(config["root"])
+        print(
+            f"{counts['added']} added, {counts['changed']} changed, "
+            f"{counts['removed']} removed, {counts['unchanged']} unchanged records."
+        )
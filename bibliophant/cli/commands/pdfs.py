@@ -0,0 +1,28 @@
+"""This module defines the 'pdfs' command."""
+
+from bibliophant.pdf_index import (
+    duplicate_pdfs,
+    records_without_pdf,
+    update_pdf_index,
+)
+
+from ..repl import Command, print_error
+from .bib import bib
+
+
+@bib.add("pdfs", "closed-closed")
+class Pdfs(Command):
+    def execute(self, arguments, session, config, result=None):
+        counts, errors = update_pdf_index(session, config["root"])
+        for path, message in sorted(errors.items()):
+            print_error(f"could not read {path}: {message}")
+        print(
+            f"{counts['added']} added, {counts['changed']} changed, "
+            f"{counts['removed']} removed, {counts['unchanged']} unchanged PDF files."
+        )
+
+        for group in duplicate_pdfs(session):
+            print("\nduplicates:\n    " + "\n    ".join(group))
+        keys = records_without_pdf(session)
+        if keys:
+            print(f"\n{len(keys)} records without PDF:\n    " + "\n    ".join(keys))
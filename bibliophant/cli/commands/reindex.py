@@ -0,0 +1,29 @@
+"""This module defines the 'reindex' command."""
+
+from bibliophant.reindex import reindex_collection
+from bibliophant.session import start_engine, stop_engine
+
+from ..repl import Command, QueryAbortError, print_error
+from ..repl.misc import ask_yes_no
+from .bib import bib
+
+
+@bib.add("reindex", "closed-closed")
+class Reindex(Command):
+    def execute(self, arguments, session, config, result=None):
+        if arguments.strip() != "yes" and not ask_yes_no(
+            "Rebuild the database from the record folders?"
+        ):
+            raise QueryAbortError("The database was not rebuilt.")
+
+        # the database file is replaced, so all connections must be closed
+        session.close()
+        stop_engine()
+        try:
+            n_records, errors = reindex_collection(config["root"])
+        finally:
+            start_engine(config["root"], profile=config.get("sqlite_profile"))
+
+        for folder_name, message in sorted(errors.items()):
+            print_error(f"skipped {folder_name}: {message}")
+        print(f"Rebuilt the database with {n_records} records.")
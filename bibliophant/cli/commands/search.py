@@ -0,0 +1,22 @@
+"""This module defines the 'search' command."""
+
+from bibliophant.search import search_records
+
+from ..repl import Command, QueryAbortError
+from .bib import bib
+
+
+@bib.add("search", "closed-producing")
+class Search(Command):
+    def execute(self, arguments, session, config, result=None):
+        words = arguments.split()
+        limit = None
+        if len(words) > 1 and words[-1].isdigit() and int(words[-1]) > 0:
+            limit = int(words.pop())
+        if not words:
+            raise QueryAbortError("'search' requires at least one word.")
+
+        records = search_records(session, " ".join(words), limit=limit)
+        if not records:
+            raise QueryAbortError(f"There are no records matching '{arguments}'.")
+        return records
@@ -0,0 +1,18 @@
+"""This module defines the 'sync' command."""
+
+from bibliophant.sync import sync_collection
+
+from ..repl import Command, print_error
+from .bib import bib
+
+
+@bib.add("sync", "closed-closed")
+class Sync(Command):
+    def execute(self, arguments, session, config, result=None):
+        counts, errors = sync_collection(session, config["root"])
+        for folder_name, message in sorted(errors.items()):
+            print_error(f"skipped {folder_name}: {message}")
+        print(
+            f"{counts['added']} added, {counts['changed']} changed, "
+            f"{counts['removed']} removed, {counts['unchanged']} unchanged records."
+        )
@@ -7,6 +7,7 @@ import argparse
 import json
 import sys
 from pathlib import Path
+from typing import Dict, Optional
 
 from ..session import resolve_root, start_engine, session_scope
 from .repl import Repl, QueryAbortError, print_error
@@ -15,6 +16,40 @@ from .commands import root_command
 from .config_wizard import config_wizard
 
 
+# the settings of the HTTP cache and their types
+_HTTP_CACHE_SETTINGS = {
+    "ttl_days": (int, float),
+    "max_mb": (int, float),
+    "offline": (bool,),
+}
+
+
+def _http_cache_settings(value) -> Optional[Dict]:
+    """Returns the settings of the HTTP cache given by the "http_cache"
+    field of the configuration (true, false or a dict),
+    None if the cache is disabled.
+    Raises ValueError if the value is not valid.
+    """
+    if value is True:
+        return {}
+    if value is False:
+        return None
+    if not isinstance(value, dict):
+        raise ValueError("it must be true, false or an object")
+    for name, setting in value.items():
+        if name not in _HTTP_CACHE_SETTINGS:
+            raise ValueError(f'"{name}" is not a setting of the cache')
+        types = _HTTP_CACHE_SETTINGS[name]
+        # bool is an int but not a number of days or megabytes
+        if not isinstance(setting, types) or (
+            bool not in types and isinstance(setting, bool)
+        ):
+            raise ValueError(f'"{name}" has an invalid value')
+        if bool not in types and setting <= 0:
+            raise ValueError(f'"{name}" must be positive')
+    return value
+
+
 def bib():
     """bibliophant is a tool for managing bibliographies and PDF documents"""
 
@@ -91,9 +126,23 @@ def bib():
         print_error(f"The folder \"{config['root']}\" was not found.")
         sys.exit(-1)
 
+    # the cache of the responses of the web services used by the importers
+    # (opened by the importers when they need it)
+    try:
+        config["http_cache"] = _http_cache_settings(config.get("http_cache", True))
+    except ValueError as error:
+        print_error(
+            f'The "http_cache" field of "{config_file}" is invalid: {error}.\n'
+            'Example: "http_cache": {"ttl_days": 30, "max_mb": 200, "offline": false}\n'
+            "true enables the cache with the default settings, false disables it."
+        )
+        sys.exit(-1)
+
     # open database
     try:
-        start_engine(config["root"], create_db=True)
+        start_engine(
+            config["root"], create_db=True, profile=config.get("sqlite_profile")
+        )
     except Exception as error:
         print_error(error)
         sys.exit(-1)
@@ -9,6 +9,7 @@ into its own transactional scope (session_scope context manager).
 __all__ = ["Repl"]
 
 
+from contextlib import nullcontext
 from typing import Dict, Optional
 import sys
 
@@ -16,6 +17,7 @@ from prompt_toolkit import PromptSession
 from prompt_toolkit.history import FileHistory
 
 from bibliophant.session import session_scope
+from bibliophant.watcher import Watcher
 
 from .command import Command
 from .exceptions import QueryAbortError, print_error
@@ -41,6 +43,12 @@ class Repl:
 
         prompt = f"{self.config['root'].name}> "
 
+        # optionally keep the database in sync with the record folders
+        watcher = None
+        if self.config.get("watch"):
+            watcher = Watcher(self.config["root"])
+            watcher.start()
+
         try:
             while True:
                 try:
@@ -52,8 +60,14 @@ class Repl:
                 # If the user has typed anything, process it
                 if query.strip():
                     try:
-                        # each query has its own transactional scope
-                        with session_scope() as session:
+                        if watcher is not None:
+                            # changes which were not applied yet (debouncing)
+                            apply_watched_changes(watcher)
+
+                        # each query has its own transactional scope;
+                        # the files written by the query are not applied again
+                        paused = nullcontext() if watcher is None else watcher.paused()
+                        with paused, session_scope() as session:
                             self.root_command.execute(query, session, self.config)
 
                     # If a command raised QueryAbortError it must have
@@ -66,6 +80,22 @@ class Repl:
         except EOFError:
             pass
 
+        finally:
+            if watcher is not None:
+                watcher.stop()
+
+
+def apply_watched_changes(watcher: Watcher):
+    """Applies the changes seen by the watcher (cf. Watcher.apply_pending).
+    If they cannot be applied (eg. the database is locked by another process
+    or a record file conflicts with the database), the user is informed
+    and the changes are kept for the next query, like the watcher's thread does.
+    """
+    try:
+        watcher.apply_pending()
+    except Exception as error:  # pylint: disable=W0703
+        print_error(f"The changed record folders could not be applied: {error}")
+
 
 def get_history(config) -> Optional[FileHistory]:
     """Returns a FileHistory object,
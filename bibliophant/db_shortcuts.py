@@ -1,58 +1,464 @@
 """This module is a collection of helper functions for working with the database."""
 
-__all__ = ["exists_key", "delete_record_and_children", "tag_record", "untag_record"]
+__all__ = [
+    "KeyIndex",
+    "key_index",
+    "exists_key",
+    "exists_keys",
+    "LOADING_PROFILES",
+    "select_records",
+    "stream_records",
+    "delete_record_and_children",
+    "delete_records",
+    "delete_keys",
+    "gc_dangling",
+    "tag_record",
+    "untag_record",
+]
 
 
-from .models import Record, Article, Book, Tag
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import delete, exists, or_, select, type_coerce
+from sqlalchemy.orm import joinedload, selectinload, with_polymorphic
+from sqlalchemy.types import String
+
+from .misc import key_generator
+from .models import Record, Article, Book, Tag, Author, Journal, Publisher, Eprint, Url
+from .models.author import author_association_table
+from .models.tag import tag_association_table
+
+
+class KeyIndex:
+    """In-memory set of the keys of all records in a database.
+    refresh only reads the rows which were added or modified since
+    the previous refresh (using the record ids and modified_date).
+    Keys of records which were renamed or deleted by other means than
+    delete_records may linger in the index. Membership tests can therefore
+    give false positives, but no false negatives after a refresh.
+    Use exists_keys to get an exact answer.
+    """
+
+    def __init__(self):
+        self._keys = set()
+        self._max_id = 0
+        self._since = None  # latest modified_date seen (as stored by SQLite)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def refresh(self, session: "sqlalchemy.orm.session.Session"):
+        """Adds the keys of new and modified records."""
+        record = Record.__table__
+        # compare the dates as strings, just like SQLite does
+        modified_date = type_coerce(record.c.modified_date, String)
+        query = select(record.c.id, record.c._key, modified_date)
+        if self._since is not None:
+            query = query.where(
+                or_(record.c.id > self._max_id, modified_date >= self._since)
+            )
+        for id_, key, modified in session.execute(query):
+            self._keys.add(key)
+            self._max_id = max(self._max_id, id_)
+            if modified is not None and (self._since is None or modified > self._since):
+                self._since = modified
+
+    def add(self, key: str):
+        """Marks a key as taken."""
+        self._keys.add(key)
+
+    def discard(self, key: str):
+        """Forgets a key (eg. after the record was deleted)."""
+        self._keys.discard(key)
+
+    def allocate(self, year: int, authors: List[Dict[str, str]]) -> str:
+        """Generates a key for a new record that does not collide with
+        any key in the index and marks it as taken.
+        """
+        key = key_generator(year, authors, taken=self)
+        self._keys.add(key)
+        return key
+
+
+# one KeyIndex per engine (i.e. per database file)
+_key_indexes = WeakKeyDictionary()
+
+
+def key_index(
+    session: "sqlalchemy.orm.session.Session", refresh: Optional[bool] = True
+) -> KeyIndex:
+    """Returns the KeyIndex of the session's database (refreshed by default)."""
+    engine = session.get_bind()
+    if engine not in _key_indexes:
+        _key_indexes[engine] = KeyIndex()
+    index = _key_indexes[engine]
+    if refresh:
+        session.flush()
+        index.refresh(session)
+    return index
+
+
+def exists_keys(
+    session: "sqlalchemy.orm.session.Session", keys: Iterable[str]
+) -> Set[str]:
+    """Returns the subset of the given keys which exist in the database.
+    Keys which are not in the (refreshed) KeyIndex are known not to exist,
+    the others are confirmed with batched queries.
+    """
+    index = key_index(session)
+    candidates = list({key for key in keys if key in index})
+    record = Record.__table__
+    existing = set()
+    for chunk in _chunks(candidates):
+        existing.update(
+            session.execute(
+                select(record.c._key).where(record.c._key.in_(chunk))
+            ).scalars()
+        )
+    return existing
 
 
 def exists_key(session: "sqlalchemy.orm.session.Session", key: str) -> bool:
     """Checks if a given key exists."""
-    if session.query(Record).filter(Record.key == key).all():
-        return True
-    return False
+    return key in exists_keys(session, [key])
+
+
+def _summary_options(records) -> List:
+    return [selectinload(records._authors), selectinload(records._tags)]
+
+
+def _export_options(records) -> List:
+    return [
+        selectinload(records._authors),
+        joinedload(records.Article._journal),
+        joinedload(records.Article._eprint),
+        joinedload(records.Book._publisher),
+    ]
+
+
+def _full_options(records) -> List:
+    return _export_options(records) + [
+        selectinload(records._tags),
+        selectinload(records._urls),
+    ]
+
+
+# profile name -> function returning the loader options for a polymorphic entity
+# The many-to-one relationships are joined, the collections are loaded
+# with one extra SELECT ... IN per collection and batch of records.
+LOADING_PROFILES = {
+    "summary": _summary_options,  # key, title, authors and tags
+    "export": _export_options,  # everything record_to_bibtex touches
+    "full": _full_options,  # everything
+}
+
+
+def select_records(profile: str = "full") -> "sqlalchemy.sql.Select":
+    """Returns a SELECT statement for records (articles and books)
+    which eagerly loads what the given loading profile needs.
+    Hence, the number of SQL statements does not grow with the number
+    of records. The statement can be refined with where, order_by, ...
+    Raises ValueError if the profile is unknown.
+    """
+    if profile not in LOADING_PROFILES:
+        raise ValueError(
+            f"unknown loading profile '{profile}' "
+            f"(choose from {', '.join(LOADING_PROFILES)})"
+        )
+    records = with_polymorphic(Record, [Article, Book])
+    return select(records).options(*LOADING_PROFILES[profile](records))
+
+
+def stream_records(
+    session: "sqlalchemy.orm.session.Session",
+    statement: Optional["sqlalchemy.sql.Select"] = None,
+    chunk_size: int = 1000,
+) -> Iterator[Record]:
+    """Yields the records of a statement (cf. select_records; by default
+    all records in the "export" profile) chunk by chunk.
+    Only one chunk of rows is fetched and loaded at a time and the records
+    of a chunk are expunged from the session once the next chunk is needed,
+    so the memory consumption does not grow with the number of records.
+    Do not modify the yielded records; changes are not saved.
+    """
+    if statement is None:
+        statement = select_records("export")
+    session.flush()
+    result = session.execute(statement.execution_options(yield_per=chunk_size))
+    for chunk in result.scalars().partitions():
+        yield from chunk
+        for record in chunk:
+            session.expunge(record)
 
 
 def delete_record_and_children(
     session: "sqlalchemy.orm.session.Session", record: Record
 ):
     """Delete a record and all its dangling children."""
-    # delete all dangling authors
-    for author in record.authors:
-        if len(author.records) == 1:
-            assert author.records[0] == record
-            session.delete(author)
-
-    # delete all URLs
-    for url in record.urls:
-        session.delete(url)
-
-    # delete all dangling tags
-    for tag in record.tags:
-        if len(tag.records) == 1:
-            assert tag.records[0] == record
-            session.delete(tag)
-
-    if isinstance(record, Article):
-
-        # delete a dangling journal
-        if len(record.journal.articles) == 1:
-            assert record.journal.articles[0] == record
-            session.delete(record.journal)
-
-        # delete the eprint
-        if record.eprint:
-            session.delete(record.eprint)
-
-    if isinstance(record, Book):
-
-        # delete a dangling publisher
-        if len(record.publisher.books) == 1:
-            assert record.publisher.books[0] == record
-            session.delete(record.publisher)
-
-    # delete the record itself
-    session.delete(record)
+    delete_records(session, [record])
+
+
+# keep the number of bound parameters per statement well below SQLite's limit
+_CHUNK_SIZE = 500
+
+
+def _chunks(ids: List) -> Iterable[List]:
+    for i in range(0, len(ids), _CHUNK_SIZE):
+        yield ids[i : i + _CHUNK_SIZE]
+
+
+def _select_ids(session, column, where_column, ids: List[int]) -> List[int]:
+    """Returns the distinct non-NULL values of column for the rows
+    whose where_column is in ids.
+    """
+    result = set()
+    for chunk in _chunks(ids):
+        result.update(
+            session.execute(select(column).where(where_column.in_(chunk))).scalars()
+        )
+    result.discard(None)
+    return list(result)
+
+
+# the entities which are shared between records,
+# together with the table and columns which link them to a record
+_SHARED_CHILDREN = (
+    (Author, author_association_table, "author_id", "record_id"),
+    (Tag, tag_association_table, "tag_id", "record_id"),
+    (Journal, Article.__table__, "journal_id", "id"),
+    (Publisher, Book.__table__, "publisher_id", "id"),
+)
+
+
+def _forget_deleted(session, deleted: Dict[type, List[int]]):
+    """Removes the instances of deleted rows from the session
+    and expires all other instances, whose relationships might be outdated.
+    """
+    deleted = {cls: set(ids) for cls, ids in deleted.items()}
+    for instance in list(session.identity_map.values()):
+        for cls, ids in deleted.items():
+            if isinstance(instance, cls) and instance.id in ids:
+                session.expunge(instance)
+                break
+    session.expire_all()
+
+
+def _linked_children(
+    session, record_ids: List[int]
+) -> Tuple[Dict[type, List[int]], List[int]]:
+    """Returns the ids of the shared children of the records
+    (which might become dangling) per model class
+    and the ids of the eprints of the records.
+    """
+    candidates = {}
+    for cls, link_table, link_column, record_column in _SHARED_CHILDREN:
+        candidates[cls] = _select_ids(
+            session,
+            link_table.c[link_column],
+            link_table.c[record_column],
+            record_ids,
+        )
+    eprint_ids = _select_ids(
+        session, Article.__table__.c.eprint_id, Article.__table__.c.id, record_ids
+    )
+    return candidates, eprint_ids
+
+
+def _delete_rows(
+    session,
+    record_ids: List[int],
+    eprint_ids: List[int],
+    counts: Dict[str, int],
+    keep_records: bool = False,
+):
+    """Deletes the records with the given ids (unless keep_records is True)
+    and everything that belongs to them alone.
+    """
+    for table, column in (
+        (author_association_table, author_association_table.c.record_id),
+        (tag_association_table, tag_association_table.c.record_id),
+        (Url.__table__, Url.__table__.c.record_id),
+        (Article.__table__, Article.__table__.c.id),
+        (Book.__table__, Book.__table__.c.id),
+        (Record.__table__, Record.__table__.c.id),
+        (Eprint.__table__, Eprint.__table__.c.id),
+    ):
+        if keep_records and table is Record.__table__:
+            continue
+        ids = eprint_ids if table is Eprint.__table__ else record_ids
+        counts[table.name] = counts.get(table.name, 0)
+        for chunk in _chunks(ids):
+            counts[table.name] += session.execute(
+                delete(table).where(column.in_(chunk))
+            ).rowcount
+
+
+def _delete_dangling(
+    session, candidates: Dict[type, List[int]], counts: Dict[str, int]
+) -> Dict[type, List[int]]:
+    """Deletes the candidates (cf. _linked_children) which are no longer
+    linked to any record. Returns the ids of the deleted rows per model class.
+    """
+    deleted = {}
+    for cls, link_table, link_column, _ in _SHARED_CHILDREN:
+        table = cls.__table__
+        counts[table.name] = counts.get(table.name, 0)
+        for chunk in _chunks(candidates[cls]):
+            counts[table.name] += session.execute(
+                delete(table).where(
+                    table.c.id.in_(chunk),
+                    ~exists().where(link_table.c[link_column] == table.c.id),
+                )
+            ).rowcount
+        remaining = set(_select_ids(session, table.c.id, table.c.id, candidates[cls]))
+        deleted[cls] = [id_ for id_ in candidates[cls] if id_ not in remaining]
+    return deleted
+
+
+def _delete_record_ids(
+    session, record_ids: List[int]
+) -> Tuple[Dict[str, int], Dict[type, List[int]]]:
+    """Deletes the records with the given ids, their URLs and eprints,
+    and all authors, tags, journals and publishers
+    which are no longer linked to any record.
+    Returns the number of deleted rows per table
+    and the ids of the deleted instances per model class.
+    """
+    session.flush()
+    record_ids = list(set(record_ids))
+    counts = {}
+
+    # children that might become dangling
+    candidates, eprint_ids = _linked_children(session, record_ids)
+
+    # the records themselves and everything that belongs to them alone
+    _delete_rows(session, record_ids, eprint_ids, counts)
+
+    # dangling children
+    deleted = {Record: record_ids, Eprint: eprint_ids}
+    deleted.update(_delete_dangling(session, candidates, counts))
+
+    return counts, deleted
+
+
+def delete_records(
+    session: "sqlalchemy.orm.session.Session", records: Iterable[Record]
+) -> Dict[str, int]:
+    """Delete many records and all their dangling children
+    with a few set-based statements (instead of walking the relationships).
+    Pending changes are flushed first. Afterwards the deleted instances
+    are no longer part of the session and all other instances are expired.
+    Returns the number of deleted rows per table.
+    """
+    records = list(records)
+    keys = [record.key for record in records]
+    counts, deleted = _delete_record_ids(session, [record.id for record in records])
+    _forget_deleted(session, deleted)
+    index = key_index(session, refresh=False)
+    for key in keys:
+        index.discard(key)
+    return counts
+
+
+def delete_keys(
+    session: "sqlalchemy.orm.session.Session", keys: Iterable[str]
+) -> Dict[str, int]:
+    """Like delete_records, but the records are given by their keys.
+    Keys which do not exist are ignored.
+    """
+    keys = list(keys)
+    session.flush()
+    record = Record.__table__
+    record_ids = _select_ids(session, record.c.id, record.c._key, keys)
+    counts, deleted = _delete_record_ids(session, record_ids)
+    _forget_deleted(session, deleted)
+    index = key_index(session, refresh=False)
+    for key in keys:
+        index.discard(key)
+    return counts
+
+
+def gc_dangling(session: "sqlalchemy.orm.session.Session") -> Dict[str, int]:
+    """Delete all authors, tags, journals, publishers, eprints and URLs
+    which do not belong to any record (and links to records which do not exist).
+    Every table is cleaned with a single statement (anti-join).
+    Note that this also deletes tags which were created but not used yet.
+    Afterwards all instances in the session are expired.
+    Returns the number of deleted rows per table.
+    """
+    session.flush()
+    record = Record.__table__
+    article = Article.__table__
+    book = Book.__table__
+    author = Author.__table__
+    tag = Tag.__table__
+    journal = Journal.__table__
+    publisher = Publisher.__table__
+    eprint = Eprint.__table__
+    url = Url.__table__
+
+    statements = (
+        (
+            "author_association",
+            delete(author_association_table).where(
+                ~exists().where(record.c.id == author_association_table.c.record_id)
+            ),
+        ),
+        (
+            "tag_association",
+            delete(tag_association_table).where(
+                ~exists().where(record.c.id == tag_association_table.c.record_id)
+            ),
+        ),
+        (
+            "author",
+            delete(author).where(
+                ~exists().where(author_association_table.c.author_id == author.c.id)
+            ),
+        ),
+        (
+            "tag",
+            delete(tag).where(
+                ~exists().where(tag_association_table.c.tag_id == tag.c.id)
+            ),
+        ),
+        (
+            "journal",
+            delete(journal).where(
+                ~exists().where(article.c.journal_id == journal.c.id)
+            ),
+        ),
+        (
+            "publisher",
+            delete(publisher).where(
+                ~exists().where(book.c.publisher_id == publisher.c.id)
+            ),
+        ),
+        (
+            "eprint",
+            delete(eprint).where(~exists().where(article.c.eprint_id == eprint.c.id)),
+        ),
+        (
+            "url",
+            delete(url).where(
+                or_(
+                    url.c.record_id.is_(None),
+                    ~exists().where(record.c.id == url.c.record_id),
+                )
+            ),
+        ),
+    )
+
+    counts = {}
+    for name, statement in statements:
+        counts[name] = session.execute(statement).rowcount
+
+    session.expire_all()
+    return counts
 
 
 def tag_record(
@@ -5,13 +5,35 @@ If you need any char replacement for non-UTF8 software you may adapt this from
 fxcoudert/tools/doi2bib (on GitHub).
 """
 
-__all__ = ["record_to_bibtex", "records_to_bibfile", "collection_to_bibfile"]
+__all__ = [
+    "BibtexRow",
+    "row_from_record",
+    "render_row",
+    "record_to_bibtex",
+    "BibtexWriter",
+    "select_bibtex_rows",
+    "records_to_bibfile",
+    "fill_bibtex_cache",
+    "collection_to_bibfile",
+]
 
 
+from collections import deque, namedtuple
 from pathlib import Path
-from typing import List, Iterable, Optional, Union
+from typing import Iterator, List, Iterable, Optional, Tuple, Union
 
+from sqlalchemy import bindparam, case, func, select, update
+
+from ..db_shortcuts import _CHUNK_SIZE, _chunks, select_records
+from ..misc import atomic_write, ordered_map, strip_compression_suffix
+from ..models.article import Article
+from ..models.author import author_association_table
+from ..models.book import Book
+from ..models.eprint import Eprint
+from ..models.journal import Journal
+from ..models.publisher import Publisher
 from ..models.record import Record, Author
+from .writer import Writer
 
 
 _MONTH_CODES = {
@@ -29,6 +51,9 @@ _MONTH_CODES = {
     12: "dec",
 }
 
+# number of cached BibTeX strings fetched at once
+_CACHE_SCAN_SIZE = 5000
+
 
 def _make_author_string(authors: List[Author]) -> str:
     author_names = []
@@ -40,84 +65,330 @@ def _make_author_string(authors: List[Author]) -> str:
     return " and ".join(author_names)
 
 
+# everything that is needed for rendering a record as BibTeX in plain data
+# (authors is the rendered author string; fields that do not apply are None)
+BibtexRow = namedtuple(
+    "BibtexRow",
+    [
+        "record_type",
+        "key",
+        "title",
+        "authors",
+        "year",
+        "month",
+        "doi",
+        "journal",
+        "volume",
+        "number",
+        "pages",
+        "eprint",
+        "archive_prefix",
+        "primary_class",
+        "publisher",
+        "address",
+        "edition",
+        "series",
+    ],
+)
+
+
+def row_from_record(record: Record) -> BibtexRow:
+    """Extracts the data needed by render_row from a record."""
+    row = dict.fromkeys(BibtexRow._fields)
+    row.update(
+        record_type=record.record_type,
+        key=record.key,
+        title=record.title,
+        authors=_make_author_string(record.authors),
+        year=record.year,
+        month=record.month,
+        doi=record.doi,
+        volume=record.volume,
+    )
+    if record.record_type == "article":
+        row.update(
+            journal=record.journal.name, number=record.number, pages=record.pages
+        )
+        if record.eprint:
+            row.update(
+                eprint=record.eprint.eprint,
+                archive_prefix=record.eprint.archive_prefix,
+                primary_class=record.eprint.primary_class,
+            )
+    if record.record_type == "book":
+        row.update(
+            publisher=record.publisher.name,
+            address=record.publisher.address,
+            edition=record.edition,
+            series=record.series,
+        )
+    return BibtexRow(**row)
+
+
 # pylint: disable=R0912
-def record_to_bibtex(record: Record) -> str:
+def render_row(row: BibtexRow) -> str:
     """Returns a BibTeX record as a string.
     The function assumes that the input is valid.
     """
-    bibtex = "@" + record.record_type + "{" + record.key + ",\n"
-    bibtex += "\ttitle         = {" + record.title + "},\n"
-    bibtex += "\tauthor        = {" + _make_author_string(record.authors) + "},\n"
-    bibtex += "\tyear          = {" + str(record.year) + "},\n"
-    if record.month:
-        bibtex += "\tmonth         = {" + _MONTH_CODES[record.month] + "},\n"
-    if record.doi:
-        bibtex += "\tdoi           = {" + record.doi + "},\n"
-    if record.record_type == "article":
-        bibtex += "\tjournal       = {" + record.journal.name + "},\n"
-        if record.volume:
-            bibtex += "\tvolume        = {" + record.volume + "},\n"
-        if record.number:
-            bibtex += "\tnumber        = {" + record.number + "},\n"
-        if record.pages:
-            bibtex += "\tpages         = {" + record.pages + "},\n"
-        if record.eprint:
-            if "/" not in record.eprint.eprint:
+    bibtex = "@" + row.record_type + "{" + row.key + ",\n"
+    bibtex += "\ttitle         = {" + row.title + "},\n"
+    bibtex += "\tauthor        = {" + row.authors + "},\n"
+    bibtex += "\tyear          = {" + str(row.year) + "},\n"
+    if row.month:
+        bibtex += "\tmonth         = {" + _MONTH_CODES[row.month] + "},\n"
+    if row.doi:
+        bibtex += "\tdoi           = {" + row.doi + "},\n"
+    if row.record_type == "article":
+        bibtex += "\tjournal       = {" + row.journal + "},\n"
+        if row.volume:
+            bibtex += "\tvolume        = {" + row.volume + "},\n"
+        if row.number:
+            bibtex += "\tnumber        = {" + row.number + "},\n"
+        if row.pages:
+            bibtex += "\tpages         = {" + row.pages + "},\n"
+        if row.eprint:
+            if "/" not in row.eprint:
                 # new style id
-                bibtex += "\tarchivePrefix = {" + record.eprint.archive_prefix + "},\n"
-                bibtex += "\teprint        = {" + record.eprint.eprint + "},\n"
-                bibtex += "\tprimaryClass  = {" + record.eprint.primary_class + "},\n"
+                bibtex += "\tarchivePrefix = {" + row.archive_prefix + "},\n"
+                bibtex += "\teprint        = {" + row.eprint + "},\n"
+                bibtex += "\tprimaryClass  = {" + row.primary_class + "},\n"
             else:
                 # old style id (before April 2007)
-                bibtex += "\teprint        = {" + record.eprint.eprint + "},\n"
-    if record.record_type == "book":
-        bibtex += "\tpublisher     = {" + record.publisher.name + "},\n"
-        if record.publisher.address:
-            bibtex += "\taddress       = {" + record.publisher.address + "},\n"
-        if record.volume:
-            bibtex += "\tvolume        = {" + record.volume + "},\n"
-        if record.edition:
-            bibtex += "\tedition       = {" + record.edition + "},\n"
-        if record.series:
-            bibtex += "\tseries        = {" + record.series + "},\n"
+                bibtex += "\teprint        = {" + row.eprint + "},\n"
+    if row.record_type == "book":
+        bibtex += "\tpublisher     = {" + row.publisher + "},\n"
+        if row.address:
+            bibtex += "\taddress       = {" + row.address + "},\n"
+        if row.volume:
+            bibtex += "\tvolume        = {" + row.volume + "},\n"
+        if row.edition:
+            bibtex += "\tedition       = {" + row.edition + "},\n"
+        if row.series:
+            bibtex += "\tseries        = {" + row.series + "},\n"
     bibtex += "}"
     return bibtex
 
 
+def record_to_bibtex(record: Record) -> str:
+    """Returns a BibTeX record as a string.
+    The function assumes that the input is valid.
+    """
+    return render_row(row_from_record(record))
+
+
+class BibtexWriter(Writer):
+    """writes the records to a bibfile (cf. export_records)"""
+
+    name = "bibtex"
+    extensions = (".bib",)
+
+    def record(self, record: Record):
+        self.file.write(record_to_bibtex(record) + "\n\n")
+
+
+def _render_rows(rows: List[BibtexRow]) -> List[str]:
+    """renders a chunk of records (in a worker process)"""
+    return [render_row(row) for row in rows]
+
+
+def _check_bibfile_path(full_path: Union[Path, str], overwrite: bool) -> Path:
+    full_path = Path(full_path)
+    if not full_path.parent.is_dir():
+        raise FileNotFoundError(f"the directory {full_path.parent} does not exist")
+    if strip_compression_suffix(full_path).suffix != ".bib":
+        raise ValueError("the file extension must be '.bib', '.bib.gz' or '.bib.zst'")
+    if full_path.exists() and not overwrite:
+        raise FileExistsError(f"the file {full_path} already exists")
+    return full_path
+
+
 def records_to_bibfile(
     records: Iterable[Record],
     full_path: Union[Path, str],
     overwrite: Optional[bool] = False,
+    fsync: bool = False,
 ):
     """Takes an iterable of records` and writes the BibTeX for all of them
     in a file.
-    full_path can be relative or absolute and must end in '.bib'.
+    full_path can be relative or absolute and must end in '.bib',
+    '.bib.gz' (gzip compressed) or '.bib.zst' (Zstandard compressed).
+    The file is replaced atomically once all records are written
+    (cf. atomic_write; fsync is passed on).
+    To render many records in parallel, use collection_to_bibfile
+    (cf. fill_bibtex_cache), which does not load them with the ORM.
     Raises FileNotFoundError if the specified directory does not exist.
-    Raises ValueError if the file extension is not 'bib'.
+    Raises ValueError if the file extension is not 'bib' (or the
+    compression is not available).
     Raises FileExistsError if the file already exists and overwrite is False.
     """
-    full_path = Path(full_path)
-    if not full_path.parent.is_dir():
-        raise FileNotFoundError(f"the directory {full_path.parent} does not exist")
-    if full_path.suffix != ".bib":
-        raise ValueError("the file extension must be '.bib'")
-    if full_path.exists() and not overwrite:
-        raise FileExistsError(f"the file {full_path} already exists")
-    with open(full_path, "w") as file:
+    full_path = _check_bibfile_path(full_path, overwrite)
+    with atomic_write(full_path, fsync=fsync) as file:
         for record in records:
             file.write(record_to_bibtex(record) + "\n\n")
 
 
+def _bibtex_rows_statement() -> "sqlalchemy.sql.Select":
+    """SELECT of the record ids and the columns of BibtexRow with Core,
+    which is a lot faster than loading the records with the ORM
+    """
+    record = Record.__table__
+    article = Article.__table__
+    book = Book.__table__
+    journal = Journal.__table__
+    eprint = Eprint.__table__
+    publisher = Publisher.__table__
+    author = Author.__table__
+    links = author_association_table
+
+    # the names of the authors in their order (cf. _make_author_string)
+    names = (
+        select(
+            case(
+                (
+                    func.coalesce(author.c._first, "") != "",
+                    author.c._first + " " + author.c._last,
+                ),
+                else_=author.c._last,
+            ).label("name")
+        )
+        .join_from(links, author, author.c.id == links.c.author_id)
+        .where(links.c.record_id == record.c.id)
+        .order_by(links.c.id)
+        .correlate(record)
+        .subquery()
+    )
+    authors = select(func.group_concat(names.c.name, " and ")).scalar_subquery()
+
+    return select(
+        record.c.id,
+        record.c.record_type,
+        record.c._key,
+        record.c._title,
+        func.coalesce(authors, ""),
+        record.c._year,
+        record.c._month,
+        record.c._doi,
+        journal.c._name,
+        func.coalesce(article.c._volume, book.c._volume),
+        article.c._number,
+        article.c._pages,
+        eprint.c._eprint,
+        eprint.c._archive_prefix,
+        eprint.c._primary_class,
+        publisher.c._name,
+        publisher.c._address,
+        book.c._edition,
+        book.c._series,
+    ).select_from(
+        record.outerjoin(article, article.c.id == record.c.id)
+        .outerjoin(book, book.c.id == record.c.id)
+        .outerjoin(journal, journal.c.id == article.c.journal_id)
+        .outerjoin(eprint, eprint.c.id == article.c.eprint_id)
+        .outerjoin(publisher, publisher.c.id == book.c.publisher_id)
+    )
+
+
+def select_bibtex_rows(
+    session: "sqlalchemy.orm.session.Session", ids: Optional[List[int]] = None
+) -> Iterator[Tuple[int, BibtexRow]]:
+    """Yields the ids and BibtexRows of the given (or all) records
+    ordered by key, without loading any records into the session.
+    The rows are identical to the ones made by row_from_record.
+    """
+    statement = _bibtex_rows_statement()
+    if ids is not None:
+        statement = statement.where(Record.__table__.c.id.in_(ids))
+    statement = statement.order_by(Record.__table__.c._key)
+    for id_, *row in session.execute(statement):
+        yield id_, BibtexRow(*row)
+
+
+def _load_rows(
+    session: "sqlalchemy.orm.session.Session", ids: List[int]
+) -> Tuple[List[int], List[BibtexRow]]:
+    """loads the BibtexRows of the given records"""
+    loaded_ids, rows = [], []
+    for chunk in _chunks(ids):
+        for id_, row in select_bibtex_rows(session, chunk):
+            loaded_ids.append(id_)
+            rows.append(row)
+    return loaded_ids, rows
+
+
+def fill_bibtex_cache(
+    session: "sqlalchemy.orm.session.Session",
+    workers: Optional[int] = None,
+    chunk_size: int = _CHUNK_SIZE,
+) -> int:
+    """Renders the BibTeX of all records whose cached BibTeX
+    (Record._bibtex) is missing and stores it in the database.
+    The cache is cleared automatically when a record or one of its authors,
+    its journal, publisher or eprint is modified through the ORM.
+    The rows are selected without the ORM (cf. select_bibtex_rows)
+    in chunks of chunk_size records (the ids are bound in lists of at most 500).
+    If workers > 1, they are rendered by a pool of worker processes.
+    Returns the number of rendered records.
+    """
+    session.flush()
+    record = Record.__table__
+    missing = (
+        session.execute(select(record.c.id).where(record.c._bibtex.is_(None)))
+        .scalars()
+        .all()
+    )
+
+    # the ids stay in this process, only the rows are sent to the workers
+    pending_ids = deque()
+
+    def row_chunks():
+        for i in range(0, len(missing), chunk_size):
+            ids, rows = _load_rows(session, missing[i : i + chunk_size])
+            pending_ids.append(ids)
+            yield rows
+
+    if workers is not None and workers > 1:
+        bibtex_chunks = ordered_map(_render_rows, row_chunks(), workers)
+    else:
+        bibtex_chunks = map(_render_rows, row_chunks())
+
+    statement = (
+        update(record).where(record.c.id == bindparam("record_id"))
+        # caching does not modify the record
+        .values(_bibtex=bindparam("bibtex"), modified_date=record.c.modified_date)
+    )
+    for bibtex_chunk in bibtex_chunks:
+        ids = pending_ids.popleft()
+        session.execute(
+            statement,
+            [
+                {"record_id": id_, "bibtex": bibtex}
+                for id_, bibtex in zip(ids, bibtex_chunk)
+            ],
+        )
+    return len(missing)
+
+
 def collection_to_bibfile(
     session: "sqlalchemy.orm.session.Session",
     full_path: Union[Path, str],
     overwrite: Optional[bool] = False,
+    workers: Optional[int] = None,
+    fsync: bool = False,
 ):
     """Exports the entire collection to a bibfile.
+    Missing cached BibTeX is rendered first (cf. fill_bibtex_cache),
+    then the cached BibTeX of all records is written without loading
+    any records into the session.
     Refer to records_to_bibfile for further details.
     """
-    records_to_bibfile(
-        records=session.query(Record).order_by(Record.key.asc()),
-        full_path=full_path,
-        overwrite=overwrite,
+    full_path = _check_bibfile_path(full_path, overwrite)
+    fill_bibtex_cache(session, workers=workers)
+    record = Record.__table__
+    statement = (
+        select(record.c._bibtex)
+        .order_by(record.c._key.asc())
+        .execution_options(yield_per=_CACHE_SCAN_SIZE)
     )
+    with atomic_write(full_path, fsync=fsync) as file:
+        for bibtex in session.execute(statement).scalars():
+            file.write(bibtex + "\n\n")
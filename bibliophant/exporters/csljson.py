@@ -0,0 +1,83 @@
+"""export bibliographic records in CSL-JSON format
+
+CSL-JSON is the input format of citeproc processors (eg. pandoc, Zotero).
+The output is a JSON array with one item per line.
+"""
+
+__all__ = ["record_to_csl", "CslJsonWriter"]
+
+
+import json
+from typing import Dict
+
+from ..models.record import Record
+from .writer import Writer
+
+
+_ITEM_TYPES = {"article": "article-journal", "book": "book"}
+
+
+def record_to_csl(record: Record) -> Dict:
+    """Returns a CSL-JSON item (a dict) given a record.
+    Fields which are not set are left out.
+    """
+    date_parts = [record.year]
+    if record.month:
+        date_parts.append(record.month)
+    fields = [
+        ("id", record.key),
+        ("type", _ITEM_TYPES[record.record_type]),
+        ("title", record.title),
+        (
+            "author",
+            [
+                (
+                    {"family": author.last, "given": author.first}
+                    if author.first
+                    else {"family": author.last}
+                )
+                for author in record.authors
+            ],
+        ),
+        ("issued", {"date-parts": [date_parts]}),
+        ("DOI", record.doi),
+        ("volume", record.volume),
+    ]
+    if record.record_type == "article":
+        fields += [
+            ("container-title", record.journal.name),
+            ("issue", record.number),
+            ("page", record.pages),
+            ("abstract", record.abstract),
+        ]
+    if record.record_type == "book":
+        fields += [
+            ("publisher", record.publisher.name),
+            ("publisher-place", record.publisher.address),
+            ("edition", record.edition),
+            ("collection-title", record.series),
+        ]
+    fields += [
+        ("URL", record.urls[0].url if record.urls else None),
+        ("keyword", ", ".join(tag.name for tag in record.tags)),
+        ("note", record.note),
+    ]
+    return {key: value for key, value in fields if value}
+
+
+class CslJsonWriter(Writer):
+    """writes the records to a CSL-JSON file (cf. export_records)"""
+
+    name = "csljson"
+    extensions = (".json",)
+
+    def begin(self):
+        self.file.write("[")
+        self._separator = "\n"
+
+    def record(self, record: Record):
+        self.file.write(self._separator + json.dumps(record_to_csl(record)))
+        self._separator = ",\n"
+
+    def end(self):
+        self.file.write("\n]\n")
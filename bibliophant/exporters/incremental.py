@@ -0,0 +1,254 @@
+"""incremental export of the collection in BibTeX format
+
+update_bibfile keeps a bibfile in sync with the collection.
+Next to the bibfile <name>.bib it stores a manifest <name>.bib.manifest
+which lists for every record (in the order of the bibfile)
+its key, its modification stamp, and the position of its BibTeX
+in the bibfile. On the next run only the (cached) BibTeX of added and
+modified records is written; everything else is copied from the old bibfile.
+
+The modification stamp of a record consists of the latest modified_date
+of the record and the rows its BibTeX depends on (journal, publisher,
+eprint, authors) and of a digest of the rows which have no modified_date
+(article or book, the ids of its authors in order).
+"""
+
+__all__ = ["update_bibfile"]
+
+
+from hashlib import blake2b
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import select, text
+
+from ..misc import atomic_write
+from ..models.record import Record
+from .bibtex import fill_bibtex_cache
+
+
+# version of the manifest format
+_MANIFEST_VERSION = 1
+
+# number of records which are processed (and rendered) at once
+_WINDOW_SIZE = 1000
+
+# all records in the order of the bibfile with the latest modified_date
+# of the rows their BibTeX depends on and the content of the rows
+# without modified_date (article, book, author_association)
+_STAMPS = text("""
+    SELECT record.id, record._key,
+        max(
+            record.modified_date,
+            coalesce(journal.modified_date, ''),
+            coalesce(publisher.modified_date, ''),
+            coalesce(eprint.modified_date, ''),
+            coalesce((
+                SELECT max(author.modified_date)
+                FROM author_association
+                JOIN author ON author.id = author_association.author_id
+                WHERE author_association.record_id = record.id
+            ), '')
+        ),
+        (SELECT group_concat(author_id, ',') FROM (
+            SELECT author_id FROM author_association
+            WHERE author_association.record_id = record.id
+            ORDER BY author_association.id)),
+        article.journal_id, article.eprint_id, article._volume,
+        article._number, article._pages,
+        book.publisher_id, book._volume, book._edition, book._series
+    FROM record
+    LEFT JOIN article ON article.id = record.id
+    LEFT JOIN book ON book.id = record.id
+    LEFT JOIN journal ON journal.id = article.journal_id
+    LEFT JOIN publisher ON publisher.id = book.publisher_id
+    LEFT JOIN eprint ON eprint.id = article.eprint_id
+    ORDER BY record._key
+    """)
+
+
+def _signature(parts: Tuple) -> str:
+    """short digest of the content of the rows without modified_date"""
+    return blake2b(repr(parts).encode("utf8"), digest_size=8).hexdigest()
+
+
+def _manifest_path(full_path: Path) -> Path:
+    return full_path.with_name(full_path.name + ".manifest")
+
+
+def _load_manifest(full_path: Path) -> Optional[Dict]:
+    """Returns the manifest of the bibfile or None if there is no manifest
+    or if the bibfile was changed by someone else (or an update_bibfile
+    was interrupted after replacing the bibfile).
+    """
+    try:
+        with _manifest_path(full_path).open("r") as file:
+            manifest = json.load(file)
+        stat = full_path.stat()
+    except (FileNotFoundError, ValueError):
+        return None
+    if (
+        manifest.get("version") != _MANIFEST_VERSION
+        or manifest.get("size") != stat.st_size
+        or manifest.get("mtime_ns") != stat.st_mtime_ns
+    ):
+        return None
+    return manifest
+
+
+def _store_manifest(full_path: Path, exported: str, entries: List[List]):
+    stat = full_path.stat()
+    manifest = {
+        "version": _MANIFEST_VERSION,
+        "exported": exported,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "records": entries,
+    }
+    with atomic_write(_manifest_path(full_path)) as file:
+        file.write(json.dumps(manifest))  # much faster than json.dump
+
+
+class _Splicer:
+    """Writes the new bibfile, copying runs of unchanged entries
+    from the old bibfile with as few reads as possible.
+    """
+
+    def __init__(self, old_file, new_file):
+        self.old_file = old_file
+        self.new_file = new_file
+        self.offset = 0  # in the new file
+        self._run_start = 0  # pending run in the old file
+        self._run_end = 0
+
+    def copy(self, offset: int, length: int) -> int:
+        """Copies an entry of the old bibfile; returns its new offset."""
+        if offset != self._run_end:
+            self.flush()
+            self._run_start = offset
+        self._run_end = offset + length
+        new_offset = self.offset
+        self.offset += length
+        return new_offset
+
+    def write(self, data: bytes) -> int:
+        """Writes a new entry; returns its offset."""
+        self.flush()
+        self.new_file.write(data)
+        new_offset = self.offset
+        self.offset += len(data)
+        return new_offset
+
+    def flush(self):
+        remaining = self._run_end - self._run_start
+        if remaining:
+            self.old_file.seek(self._run_start)
+            while remaining:
+                data = self.old_file.read(min(remaining, 1 << 20))
+                if not data:
+                    raise ValueError("the old bibfile is shorter than its manifest")
+                self.new_file.write(data)
+                remaining -= len(data)
+        self._run_start = self._run_end = 0
+
+
+def _render(session, ids: List[int]) -> Dict[int, bytes]:
+    """the cached BibTeX of the given records (UTF8 encoded)"""
+    if not ids:
+        return {}
+    record = Record.__table__
+    statement = select(record.c.id, record.c._bibtex).where(record.c.id.in_(ids))
+    return {
+        id_: (bibtex + "\n\n").encode("utf8")
+        for id_, bibtex in session.execute(statement)
+    }
+
+
+def update_bibfile(
+    session: "sqlalchemy.orm.session.Session",
+    full_path: Union[Path, str],
+    overwrite: Optional[bool] = False,
+) -> Dict[str, int]:
+    """Exports the entire collection to a bibfile (like collection_to_bibfile),
+    but renders only the records which were added or modified since the
+    previous update_bibfile of the same file.
+    Returns the number of added, changed, deleted and unchanged records.
+    full_path can be relative or absolute and must end in '.bib'.
+    If the bibfile was modified by other means (or does not match its
+    manifest for another reason), it is written from scratch.
+    Both the bibfile and the manifest are written with atomic_write,
+    so concurrent updates of the same file do not mix their output.
+    Raises FileNotFoundError if the specified directory does not exist.
+    Raises ValueError if the file extension is not 'bib'.
+    Raises FileExistsError if the file already exists, was not written
+    by update_bibfile (ie. has no manifest) and overwrite is False.
+    """
+    full_path = Path(full_path)
+    if not full_path.parent.is_dir():
+        raise FileNotFoundError(f"the directory {full_path.parent} does not exist")
+    if full_path.suffix != ".bib":
+        raise ValueError("the file extension must be '.bib'")
+    manifest = _load_manifest(full_path)
+    if (
+        manifest is None
+        and full_path.exists()
+        and not _manifest_path(full_path).exists()
+        and not overwrite
+    ):
+        raise FileExistsError(f"the file {full_path} already exists")
+
+    fill_bibtex_cache(session)
+    # records modified later within the same second get the same stamp,
+    # they are rendered again next time
+    exported = session.execute(text("SELECT CURRENT_TIMESTAMP")).scalar()
+    stamps = [
+        (id_, key, modified, _signature(parts))
+        for id_, key, modified, *parts in session.execute(_STAMPS)
+    ]
+
+    old_entries = {}
+    old_exported = ""
+    if manifest is not None:
+        old_exported = manifest["exported"]
+        for key, modified, signature, offset, length in manifest["records"]:
+            old_entries[key] = (modified, signature, offset, length)
+
+    counts = {"added": 0, "changed": 0, "deleted": 0, "unchanged": 0}
+    entries = []
+    old_file = full_path.open("rb") if manifest is not None else None
+    try:
+        with atomic_write(full_path, binary=True) as new_file:
+            splicer = _Splicer(old_file, new_file)
+            for start in range(0, len(stamps), _WINDOW_SIZE):
+                window = stamps[start : start + _WINDOW_SIZE]
+                reusable = {}
+                for id_, key, modified, signature in window:
+                    old = old_entries.get(key)
+                    if (
+                        old is not None
+                        and old[:2] == (modified, signature)
+                        and modified < old_exported
+                    ):
+                        reusable[key] = old
+                rendered = _render(
+                    session, [row[0] for row in window if row[1] not in reusable]
+                )
+                for id_, key, modified, signature in window:
+                    if key in reusable:
+                        _, _, offset, length = reusable[key]
+                        offset = splicer.copy(offset, length)
+                        counts["unchanged"] += 1
+                    else:
+                        length = len(rendered[id_])
+                        offset = splicer.write(rendered[id_])
+                        counts["changed" if key in old_entries else "added"] += 1
+                    entries.append([key, modified, signature, offset, length])
+            splicer.flush()
+    finally:
+        if old_file is not None:
+            old_file.close()
+    _store_manifest(full_path, exported, entries)
+
+    counts["deleted"] = len(old_entries) - counts["changed"] - counts["unchanged"]
+    return counts
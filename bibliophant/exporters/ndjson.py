@@ -0,0 +1,24 @@
+"""export bibliographic records as newline-delimited JSON
+
+Every line holds the JSON of one record as it is stored
+in the record folders (cf. json_io.py).
+Such a file can be processed line by line, eg. with jq or grep.
+"""
+
+__all__ = ["NdjsonWriter"]
+
+
+import json
+
+from ..models.record import Record
+from .writer import Writer
+
+
+class NdjsonWriter(Writer):
+    """writes the records to an NDJSON file (cf. export_records)"""
+
+    name = "ndjson"
+    extensions = (".ndjson", ".jsonl")
+
+    def record(self, record: Record):
+        self.file.write(json.dumps(record.to_dict()) + "\n")
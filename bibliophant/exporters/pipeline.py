@@ -0,0 +1,117 @@
+"""export bibliographic records in several formats at once
+
+The records are read (and loaded) only once; every record is handed
+to the writers of all requested formats (cf. writer.py) before the
+next one is loaded. Thus exporting the collection as BibTeX, CSL-JSON
+and RIS costs the same number of SQL statements as exporting it as BibTeX.
+
+Further formats can be plugged in by adding a Writer class to WRITERS.
+"""
+
+__all__ = ["WRITERS", "feed_writers", "export_records", "collection_to_files"]
+
+
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Type, Union
+
+from ..db_shortcuts import select_records, stream_records
+from ..misc import atomic_write, strip_compression_suffix
+from ..models.record import Record
+from .bibtex import BibtexWriter
+from .csljson import CslJsonWriter
+from .ndjson import NdjsonWriter
+from .ris import RisWriter
+from .writer import Writer
+
+
+# format name -> writer class
+WRITERS: Dict[str, Type[Writer]] = {
+    writer.name: writer
+    for writer in (BibtexWriter, CslJsonWriter, RisWriter, NdjsonWriter)
+}
+
+
+def _check_targets(
+    targets: Sequence[Tuple[str, Union[Path, str]]], overwrite: bool
+) -> List[Tuple[Type[Writer], Path]]:
+    checked = []
+    seen = set()
+    for format_, full_path in targets:
+        if format_ not in WRITERS:
+            raise ValueError(
+                f"unknown format '{format_}' (choose from {', '.join(WRITERS)})"
+            )
+        writer_class = WRITERS[format_]
+        full_path = Path(full_path)
+        if not full_path.parent.is_dir():
+            raise FileNotFoundError(f"the directory {full_path.parent} does not exist")
+        if strip_compression_suffix(full_path).suffix not in writer_class.extensions:
+            raise ValueError(
+                f"the file extension of a {format_} file must be "
+                + " or ".join(f"'{extension}'" for extension in writer_class.extensions)
+            )
+        if full_path.exists() and not overwrite:
+            raise FileExistsError(f"the file {full_path} already exists")
+        if full_path.resolve() in seen:
+            raise ValueError(f"the file {full_path} is given more than once")
+        seen.add(full_path.resolve())
+        checked.append((writer_class, full_path))
+    return checked
+
+
+def feed_writers(records: Iterable[Record], writers: Sequence[Writer]):
+    """Hands every record to all writers (in a single pass over the records)."""
+    for writer in writers:
+        writer.begin()
+    for record in records:
+        for writer in writers:
+            writer.record(record)
+    for writer in writers:
+        writer.end()
+
+
+def export_records(
+    records: Iterable[Record],
+    targets: Sequence[Tuple[str, Union[Path, str]]],
+    overwrite: Optional[bool] = False,
+    fsync: bool = False,
+):
+    """Writes the records in several formats with a single pass
+    over the records.
+    targets is a sequence of (format, full_path) pairs,
+    eg. [("bibtex", "a.bib"), ("csljson", "a.json.gz")];
+    the formats are the keys of WRITERS.
+    full_path can be relative or absolute and must have
+    one of the file extensions of the format,
+    optionally followed by '.gz' or '.zst' for compression.
+    The files are replaced atomically once all records are written
+    (cf. atomic_write; fsync is passed on).
+    Raises FileNotFoundError if a specified directory does not exist.
+    Raises ValueError if a format is unknown, a file extension does
+    not match its format, a compression is not available
+    or a file is given more than once.
+    Raises FileExistsError if a file already exists and overwrite is False.
+    """
+    checked = _check_targets(targets, overwrite)
+    with ExitStack() as stack:
+        writers = [
+            writer_class(stack.enter_context(atomic_write(full_path, fsync=fsync)))
+            for writer_class, full_path in checked
+        ]
+        feed_writers(records, writers)
+
+
+def collection_to_files(
+    session: "sqlalchemy.orm.session.Session",
+    targets: Sequence[Tuple[str, Union[Path, str]]],
+    overwrite: Optional[bool] = False,
+    fsync: bool = False,
+):
+    """Exports the entire collection (ordered by key) in several formats.
+    The records are streamed (cf. stream_records) and every record
+    is loaded only once, no matter how many formats are written.
+    Refer to export_records for further details.
+    """
+    statement = select_records("full").order_by(Record.key.asc())
+    export_records(stream_records(session, statement), targets, overwrite, fsync)
@@ -0,0 +1,84 @@
+"""export bibliographic records in RIS format
+
+RIS is understood by most reference managers (eg. EndNote, Zotero, Mendeley).
+Every record is a block of 'TAG  - value' lines ending with 'ER  - '.
+"""
+
+__all__ = ["record_to_ris", "RisWriter"]
+
+
+from typing import List, Tuple
+
+from ..models.record import Record
+from .writer import Writer
+
+
+_REFERENCE_TYPES = {"article": "JOUR", "book": "BOOK"}
+
+
+def _split_pages(pages: str) -> Tuple[str, str]:
+    """'123--456' -> ('123', '456'), '123' -> ('123', '')"""
+    first, _, last = pages.partition("-")
+    return first.strip(), last.strip("- ")
+
+
+def record_to_ris(record: Record) -> str:
+    """Returns a RIS record as a string.
+    The function assumes that the input is valid.
+    """
+    lines: List[Tuple[str, str]] = [
+        ("TY", _REFERENCE_TYPES[record.record_type]),
+        ("ID", record.key),
+        ("TI", record.title),
+    ]
+    for author in record.authors:
+        if author.first:
+            lines.append(("AU", author.last + ", " + author.first))
+        else:
+            lines.append(("AU", author.last))
+    lines.append(("PY", str(record.year)))
+    if record.month:
+        lines.append(("DA", f"{record.year}/{record.month:02d}//"))
+    if record.doi:
+        lines.append(("DO", record.doi))
+    if record.record_type == "article":
+        lines.append(("JO", record.journal.name))
+        if record.volume:
+            lines.append(("VL", record.volume))
+        if record.number:
+            lines.append(("IS", record.number))
+        if record.pages:
+            start_page, end_page = _split_pages(record.pages)
+            lines.append(("SP", start_page))
+            if end_page:
+                lines.append(("EP", end_page))
+        if record.abstract:
+            lines.append(("AB", record.abstract))
+    if record.record_type == "book":
+        lines.append(("PB", record.publisher.name))
+        if record.publisher.address:
+            lines.append(("CY", record.publisher.address))
+        if record.volume:
+            lines.append(("VL", record.volume))
+        if record.edition:
+            lines.append(("ET", record.edition))
+        if record.series:
+            lines.append(("T3", record.series))
+    for url in record.urls:
+        lines.append(("UR", url.url))
+    for tag in record.tags:
+        lines.append(("KW", tag.name))
+    if record.note:
+        lines.append(("N1", record.note))
+    lines.append(("ER", ""))
+    return "\n".join(f"{tag}  - {value}" for tag, value in lines)
+
+
+class RisWriter(Writer):
+    """writes the records to a RIS file (cf. export_records)"""
+
+    name = "ris"
+    extensions = (".ris",)
+
+    def record(self, record: Record):
+        self.file.write(record_to_ris(record) + "\n\n")
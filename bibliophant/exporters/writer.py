@@ -0,0 +1,42 @@
+"""This module defines the base class of the format writers.
+
+A writer turns a stream of records into one output file.
+An export calls begin once, record for every record (in order)
+and end once, so a writer never needs more than one record in memory.
+Several writers can subscribe to the same stream of records
+(cf. export_records in pipeline.py).
+"""
+
+__all__ = ["Writer"]
+
+
+from abc import ABCMeta, abstractmethod
+from typing import TextIO, Tuple
+
+from ..models.record import Record
+
+
+class Writer(metaclass=ABCMeta):
+    """abstract base class for a format writer"""
+
+    # name of the format (as used by the 'export' command)
+    name: str = ""
+
+    # the allowed file extensions (the first one is the default)
+    extensions: Tuple[str, ...] = ()
+
+    def __init__(self, file: TextIO):
+        self.file = file
+
+    def begin(self):
+        """called before the first record (eg. for writing a header)"""
+        pass
+
+    @abstractmethod
+    def record(self, record: Record):
+        """called for every exported record"""
+        pass
+
+    def end(self):
+        """called after the last record (eg. for writing a footer)"""
+        pass
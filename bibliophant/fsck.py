@@ -0,0 +1,177 @@
+"""This module checks the integrity of a collection (cf. the fsck command).
+
+The records in the database and the record folders are walked side by side
+in the order of their keys: the folders are listed in a background thread
+while the records are streamed from the database chunk by chunk
+(cf. stream_records). The chunks are checked in a pool of worker processes,
+which read the record files, compare them with the records in the database
+and run the validators of the models again (cf. prepare_record).
+The findings are yielded as soon as a chunk is checked; since only a few
+chunks are in flight (cf. ordered_map), the memory consumption does not
+grow with the size of the collection.
+
+Kinds of findings:
+- "missing folder": a record in the database has no record folder
+- "orphan folder": a record folder has no record in the database
+- "missing file": a record folder has no file <key>.json
+- "invalid file": the record file is not valid JSON or not a valid record
+- "invalid record": the values of a record in the database are not valid
+- "mismatch": the record file differs from the record in the database
+
+example:
+> for finding in check_collection(session, root):
+>     print(finding.kind, finding.key, finding.message)
+"""
+
+__all__ = ["Finding", "check_collection"]
+
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .bulk import prepare_record
+from .db_shortcuts import select_records, stream_records
+from .json_codec import loads
+from .misc import ordered_map
+from .models.record import Record
+from .record_files import read_record_file, scan_record_folders
+
+
+Finding = namedtuple("Finding", "kind key message")
+
+# (key, the record dict from the database or None, whether the folder exists)
+_Item = Tuple[str, Optional[Dict], bool]
+
+
+def _check_record_file(root: str, key: str, record_dict: Optional[Dict]) -> List:
+    """the findings about the record file in the folder key"""
+    path = f"{root}/{key}/{key}.json"
+    try:
+        data, _ = read_record_file(path)
+    except FileNotFoundError:
+        return [Finding("missing file", key, f"the file {key}.json was not found")]
+    try:
+        file_dict = loads(data)
+    except ValueError as error:
+        return [Finding("invalid file", key, f"invalid JSON: {error}")]
+    if not isinstance(file_dict, dict):
+        return [Finding("invalid file", key, "the file does not contain an object")]
+    if file_dict == record_dict:
+        return []  # the record was validated already
+
+    findings = []
+    try:
+        prepare_record(file_dict)
+        if file_dict["key"] != key:
+            raise ValueError(
+                f"the key {file_dict['key']} does not match the record folder"
+            )
+    except ValueError as error:
+        findings.append(Finding("invalid file", key, str(error)))
+    if record_dict is not None:
+        fields = sorted(
+            field
+            for field in file_dict.keys() | record_dict.keys()
+            if file_dict.get(field) != record_dict.get(field)
+        )
+        message = "differs from the database in " + ", ".join(fields)
+        findings.append(Finding("mismatch", key, message))
+    return findings
+
+
+def _check_chunk(root: str, items: List[_Item]) -> List:
+    """checks a chunk of records and record folders (in a worker process)"""
+    findings = []
+    for key, record_dict, has_folder in items:
+        if record_dict is None:
+            findings.append(
+                Finding("orphan folder", key, "there is no record with this key")
+            )
+        else:
+            try:
+                prepare_record(record_dict)
+            except ValueError as error:
+                findings.append(Finding("invalid record", key, str(error)))
+        if has_folder:
+            findings.extend(_check_record_file(root, key, record_dict))
+        else:
+            findings.append(
+                Finding("missing folder", key, "the record has no record folder")
+            )
+    return findings
+
+
+def _merge(
+    records: Iterable[Tuple[str, Dict]], folder_names: Iterable[str]
+) -> Iterator[_Item]:
+    """merges the records and the folder names (both sorted by key)"""
+    folders = iter(folder_names)
+    folder = next(folders, None)
+    for key, record_dict in records:
+        while folder is not None and folder < key:
+            yield folder, None, True
+            folder = next(folders, None)
+        if folder == key:
+            yield key, record_dict, True
+            folder = next(folders, None)
+        else:
+            yield key, record_dict, False
+    while folder is not None:
+        yield folder, None, True
+        folder = next(folders, None)
+
+
+def _chunks(iterable: Iterable, chunk_size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def check_collection(
+    session: "sqlalchemy.orm.session.Session",
+    root: Union[Path, str],
+    workers: Optional[int] = None,
+    chunk_size: int = 500,
+) -> Iterator[Finding]:
+    """Checks that every record in the database has a record folder
+    with a valid record file of the same content and vice versa,
+    and that the records in the database are still valid.
+    The records are checked in chunks of chunk_size by workers processes
+    (default: the number of CPUs). The database is only read.
+    Yields the findings (kind, key, message) chunk by chunk,
+    ordered by key (cf. the module docstring for the kinds).
+    """
+    root = str(root)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        folder_names = executor.submit(scan_record_folders, root)
+        statement = select_records("full").order_by(Record.key.asc())
+        records = (
+            (record.key, record.to_dict())
+            for record in stream_records(session, statement, chunk_size)
+        )
+        # the first chunk of records is loaded while the folders are listed
+        first = list(islice(records, chunk_size))
+        items = _merge(
+            (record for chunk in (first, records) for record in chunk),
+            folder_names.result(),
+        )
+
+    check = partial(_check_chunk, root)
+    chunks = _chunks(items, chunk_size)
+    if workers > 1:
+        results: Iterator = ordered_map(check, chunks, workers)
+    else:
+        results = map(check, chunks)
+    for findings in results:
+        yield from findings
@@ -1,18 +1,36 @@
 """get bibliographic data from arxiv.org (and crossref.org)"""
 
-__all__ = ["arxiv_id_to_record", "download_arxiv_eprint"]
+__all__ = [
+    "ARXIV_URL",
+    "arxiv_id_to_record",
+    "arxiv_ids_to_records",
+    "download_arxiv_eprint",
+]
 
 
-from urllib.request import urlopen, Request, urlretrieve
+import re
+from urllib.parse import urlencode
+from urllib.request import urlretrieve
 from xml.dom.minidom import parseString as parse_xml
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from .crossref import _get_item, _get_data, doi_to_record
+from .batch import TokenBucket
+from .crossref import _get_item, _get_data, dois_to_records
+from .http import fetch
 from ..models.article import Article
 from ..misc import format_string, key_generator
 
 
+# the query endpoint of the arXiv API (can be pointed to a local server for testing)
+ARXIV_URL = "http://export.arxiv.org/api/query"
+
+# the arXiv asks for at most one request every three seconds
+_ARXIV_RATE = 1 / 3
+
+_VERSION = re.compile(r"v[0-9]+$")
+
+
 def _author_from_name(name: str) -> Dict[str, str]:
     """Turns a name into a author by guessing that
     the last word is the last name.
@@ -25,35 +43,51 @@ def _author_from_name(name: str) -> Dict[str, str]:
     return author
 
 
-def arxiv_id_to_record(arxiv_id: str) -> Dict:
-    """Returns a record (dict / JSON) for a given arXiv ID."""
-    url = Request("http://export.arxiv.org/api/query?id_list=" + arxiv_id)
-    xml_data = urlopen(url).read()
-    doc = parse_xml(xml_data)
-
-    records = doc.getElementsByTagName("entry")
-
-    if not records:
-        raise Exception("arXiv returned no records")
-
-    if len(records) != 1:
-        raise Exception("arXiv returned more than one record")
+def _fetch_entries(arxiv_ids: List[str], limiter: Optional[TokenBucket]) -> Dict:
+    """Queries the arXiv for several IDs at once.
+    Returns the entries of the feed by their ID (as in the entry, with version).
+    """
+    params = urlencode({"id_list": ",".join(arxiv_ids), "max_results": len(arxiv_ids)})
+    doc = parse_xml(fetch(ARXIV_URL + "?" + params, limiter))
+    entries = {}
+    for entry in doc.getElementsByTagName("entry"):
+        # eg. http://arxiv.org/abs/2101.01234v2 (errors have other IDs)
+        entry_id = _get_data(_get_item(entry, "id")) or ""
+        if "/abs/" in entry_id:
+            entries[entry_id.split("/abs/", 1)[1]] = entry
+    return entries
+
+
+def _match_entries(arxiv_ids: List[str], entries: Dict) -> Dict:
+    """maps the requested IDs (with or without version) to the entries"""
+    by_base_id = {
+        _VERSION.sub("", entry_id): entry for entry_id, entry in entries.items()
+    }
+    matched = {}
+    for arxiv_id in arxiv_ids:
+        entry = entries.get(arxiv_id) or by_base_id.get(_VERSION.sub("", arxiv_id))
+        if entry is not None:
+            matched[arxiv_id] = entry
+    return matched
 
-    record = records[0]
 
-    doi = _get_data(_get_item(record, "arxiv:doi"))
-    if doi:
-        res = doi_to_record(doi)
+def _entry_to_record(arxiv_id: str, entry, doi_record: Optional[Dict]) -> Dict:
+    """Turns an entry of an arXiv feed into a record (dict / JSON).
+    If the bibliographic data of its DOI is given, it is used instead.
+    """
+    if doi_record is not None:
+        res = dict(doi_record)
     else:
         res = {}
         res["type"] = "article"
 
         authors = []
-        for author in record.getElementsByTagName("author"):
+        for author in entry.getElementsByTagName("author"):
             name = _get_data(_get_item(author, "name"))
             authors.append(_author_from_name(name))
 
-        date = _get_data(_get_item(record, "published"))
+        year = None
+        date = _get_data(_get_item(entry, "published"))
         if date:
             year = int(date[:4])
             month = int(date[5:7])
@@ -61,7 +95,7 @@ def arxiv_id_to_record(arxiv_id: str) -> Dict:
         if year and authors:
             res["key"] = key_generator(year, authors)
 
-        title = _get_data(_get_item(record, "title"))
+        title = _get_data(_get_item(entry, "title"))
         if title:
             res["title"] = format_string(title)
 
@@ -72,12 +106,16 @@ def arxiv_id_to_record(arxiv_id: str) -> Dict:
             res["year"] = year
             res["month"] = month
 
+        doi = _get_data(_get_item(entry, "arxiv:doi"))
+        if doi:
+            res["doi"] = doi
+
         res["journal"] = {"name": "arXiv e-print"}
 
     res["eprint"] = {}
     if "/" not in arxiv_id:
         # new style id
-        categorys = record.getElementsByTagName("category")
+        categorys = entry.getElementsByTagName("category")
         primary_category = categorys[0].getAttribute("term")
         res["eprint"]["archive_prefix"] = "arXiv"
         res["eprint"]["eprint"] = arxiv_id
@@ -88,13 +126,82 @@ def arxiv_id_to_record(arxiv_id: str) -> Dict:
 
     res["open_access"] = True
 
-    summary = _get_data(_get_item(record, "summary"))
+    summary = _get_data(_get_item(entry, "summary"))
     if summary:
         res["abstract"] = format_string(summary)
 
     return res
 
 
+def arxiv_ids_to_records(
+    arxiv_ids: Iterable[str], batch_size: int = 100, concurrency: int = 4
+) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+    """Returns the records (dicts) for many arXiv IDs.
+    The IDs are looked up batch_size at a time, with one request per batch
+    (at most one request every three seconds, as the arXiv asks).
+    If a batch fails (eg. because of a malformed ID),
+    its IDs are looked up one by one.
+    For the articles which have a DOI, the bibliographic data is taken
+    from Crossref (cf. dois_to_records, with concurrency threads);
+    if that fails, the data of the arXiv is used.
+    Returns the records and the errors (ID -> message) of the IDs
+    which could not be imported, both in the order of the IDs.
+    The keys of the records are not checked for uniqueness.
+    """
+    arxiv_ids = list(dict.fromkeys(arxiv_id.strip() for arxiv_id in arxiv_ids))
+    limiter = TokenBucket(_ARXIV_RATE)
+
+    entries, errors = {}, {}
+    batches = [
+        arxiv_ids[i : i + batch_size] for i in range(0, len(arxiv_ids), batch_size)
+    ]
+    while batches:
+        batch = batches.pop(0)
+        try:
+            batch_entries = _fetch_entries(batch, limiter)
+        except Exception as error:  # pylint: disable=W0703
+            if len(batch) > 1:
+                batches[:0] = [[arxiv_id] for arxiv_id in batch]
+            else:
+                errors[batch[0]] = str(error) or type(error).__name__
+            continue
+        entries.update(_match_entries(batch, batch_entries))
+
+    dois = {}
+    for arxiv_id, entry in entries.items():
+        doi = _get_data(_get_item(entry, "arxiv:doi"))
+        if doi:
+            dois[arxiv_id] = doi
+    doi_records, _ = dois_to_records(dois.values(), concurrency)
+
+    records = {}
+    for arxiv_id in arxiv_ids:
+        if arxiv_id in errors:
+            continue
+        if arxiv_id not in entries:
+            errors[arxiv_id] = "arXiv returned no record"
+            continue
+        doi_record = doi_records.get(dois.get(arxiv_id))
+        try:
+            records[arxiv_id] = _entry_to_record(
+                arxiv_id, entries[arxiv_id], doi_record
+            )
+        except Exception as error:  # pylint: disable=W0703
+            errors[arxiv_id] = str(error) or type(error).__name__
+    errors = {
+        arxiv_id: errors[arxiv_id] for arxiv_id in arxiv_ids if arxiv_id in errors
+    }
+    return records, errors
+
+
+def arxiv_id_to_record(arxiv_id: str) -> Dict:
+    """Returns a record (dict / JSON) for a given arXiv ID."""
+    records, errors = arxiv_ids_to_records([arxiv_id])
+    if errors:
+        raise Exception(errors[arxiv_id.strip()])
+    return records[arxiv_id.strip()]
+
+
 def download_arxiv_eprint(
     article: Article, root_folder: Path, overwrite: Optional[bool] = False
 ):
@@ -0,0 +1,94 @@
+"""fetch bibliographic data for many identifiers at once
+
+The requests for the identifiers are sent by a pool of threads,
+so that the waiting times for the servers overlap.
+A TokenBucket keeps the rate of the requests within the limits
+of the services (eg. Crossref asks for at most a few requests per second).
+An identifier whose request fails does not stop the others;
+its error is reported instead.
+
+example:
+> records, errors = fetch_concurrently(doi_to_record, dois, concurrency=4, rate=5)
+"""
+
+__all__ = ["TokenBucket", "fetch_concurrently"]
+
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+
+class TokenBucket:
+    """Limits the rate of events to rate per second on average,
+    allowing bursts of up to capacity events
+    (default: 1, ie. the events are evenly spaced).
+    acquire can be called from several threads.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Any] = time.sleep,
+    ):
+        if rate <= 0:
+            raise ValueError("the rate must be positive")
+        if capacity < 1:
+            raise ValueError("the capacity must be at least 1")
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Takes a token, waiting until one is available."""
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+def fetch_concurrently(
+    function: Callable[[str], Any],
+    identifiers: Iterable[str],
+    concurrency: int = 4,
+    rate: Optional[float] = None,
+) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Calls function for every identifier (duplicates only once)
+    in a pool of concurrency threads, at most rate calls per second
+    (cf. TokenBucket; no limit if rate is None).
+    Returns the results and the errors (identifier -> message)
+    of the identifiers for which function raised an exception,
+    both in the order of the identifiers.
+    """
+    identifiers = list(dict.fromkeys(identifiers))
+    bucket = None if rate is None else TokenBucket(rate)
+
+    def call(identifier):
+        if bucket is not None:
+            bucket.acquire()
+        return function(identifier)
+
+    results, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(call, identifier) for identifier in identifiers]
+        for identifier, future in zip(identifiers, futures):
+            try:
+                results[identifier] = future.result()
+            except Exception as error:  # pylint: disable=W0703
+                errors[identifier] = str(error) or type(error).__name__
+    return results, errors
@@ -6,15 +6,21 @@ for more information.
 This code is adapted from fxcoudert/tools/doi2bib (on GitHub).
 """
 
-__all__ = ["doi_to_record"]
+__all__ = ["CROSSREF_URL", "doi_to_record", "dois_to_records"]
 
 
+from functools import partial
 from xml.dom.minidom import parseString as parse_xml
 from urllib.parse import urlencode
-from urllib.request import urlopen, Request
-from typing import Dict
+from typing import Dict, Iterable, Optional, Tuple
 
 from ..misc import format_string, key_generator
+from .batch import TokenBucket, fetch_concurrently
+from .http import fetch
+
+
+# the OpenURL endpoint of Crossref (can be pointed to a local server for testing)
+CROSSREF_URL = "http://www.crossref.org/openurl/"
 
 
 def _get_item(container, name):
@@ -30,10 +36,11 @@ def _get_data(node):
     return None
 
 
-def doi_to_record(doi: str) -> Dict:
+def doi_to_record(doi: str, limiter: Optional[TokenBucket] = None) -> Dict:
     """Returns a record (dict / JSON) given a DOI.
     The DOI must be in the format specified by the schema,
     i.e. a string without the URL part.
+    The limiter (if any) is passed on to fetch.
     """
     params = urlencode(
         {
@@ -43,8 +50,7 @@ def doi_to_record(doi: str) -> Dict:
             "format": "unixref",
         }
     )
-    url = Request("http://www.crossref.org/openurl/?" + params)
-    doc = parse_xml(urlopen(url).read())
+    doc = parse_xml(fetch(CROSSREF_URL + "?" + params, limiter))
     records = doc.getElementsByTagName("journal")
 
     if not records:
@@ -95,7 +101,8 @@ def doi_to_record(doi: str) -> Dict:
     res["authors"] = authors
     res["year"] = year
 
-    assert doi == _get_data(_get_item(journal_article, "doi"))
+    # DOIs are case insensitive
+    assert doi.lower() == _get_data(_get_item(journal_article, "doi")).lower()
     res["doi"] = doi
 
     if journal_metadata:
@@ -118,3 +125,20 @@ def doi_to_record(doi: str) -> Dict:
         res["pages"] = format_string(first_page)
 
     return res
+
+
+def dois_to_records(
+    dois: Iterable[str], concurrency: int = 4, rate: Optional[float] = 5.0
+) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+    """Returns the records (dicts) for many DOIs (cf. doi_to_record).
+    The requests are sent by concurrency threads, at most rate
+    requests per second (cf. TokenBucket; responses from the cache
+    are not limited).
+    Returns the records and the errors (DOI -> message) of the DOIs
+    which could not be imported, both in the order of the DOIs.
+    The keys of the records are not checked for uniqueness.
+    """
+    limiter = None if rate is None else TokenBucket(rate)
+    return fetch_concurrently(
+        partial(doi_to_record, limiter=limiter), dois, concurrency
+    )
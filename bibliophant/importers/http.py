@@ -0,0 +1,213 @@
+"""HTTP requests of the importers, with a persistent response cache
+
+The importers fetch their data with fetch. If a cache is set (cf. set_cache),
+the responses are stored in a SQLite file (by default <root>/.http_cache.db)
+keyed by the URL:
+- a response younger than the TTL is served from the cache
+- an older response is revalidated with If-None-Match / If-Modified-Since
+  (if the server sent an ETag or Last-Modified header); if the server
+  answers '304 Not Modified', the cached body is used
+- if the cache grows beyond its size cap, the least recently used
+  responses are evicted
+- in offline mode, only cached responses are served (of any age)
+Every response is stored as soon as it arrives, so an import batch
+which is run again after a failure does not repeat the finished requests.
+
+example:
+> set_cache(HttpCache(root / ".http_cache.db", ttl=7 * 24 * 3600))
+> data = fetch("http://export.arxiv.org/api/query?id_list=1234.5678")
+"""
+
+__all__ = ["HttpCache", "set_cache", "get_cache", "fetch"]
+
+
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple, Union
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from .batch import TokenBucket
+
+
+# seconds to wait for a response
+_TIMEOUT = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS response (
+    url TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_response_accessed ON response (accessed);
+"""
+
+
+class HttpCache:
+    """A persistent cache of HTTP responses in a SQLite file.
+    Responses are fresh for ttl seconds (default: one week).
+    If the bodies take more than max_size bytes (default: 100 MB),
+    the least recently used responses are evicted.
+    If offline is True, fetch serves only cached responses.
+    The cache can be used by several threads.
+    """
+
+    def __init__(
+        self,
+        path: Union[Path, str],
+        ttl: float = 7 * 24 * 3600,
+        max_size: int = 100 * 10**6,
+        offline: bool = False,
+    ):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_size = max_size
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            self.path, timeout=10, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.executescript(_SCHEMA)
+
+    def get(
+        self, url: str
+    ) -> Optional[Tuple[bytes, Optional[str], Optional[str], float]]:
+        """Returns the cached body, ETag, Last-Modified and the time
+        it was fetched (or revalidated) or None if the URL is not cached.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body, etag, last_modified, fetched FROM response WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is not None:
+                self._connection.execute(
+                    "UPDATE response SET accessed = ? WHERE url = ?", (time.time(), url)
+                )
+        return row
+
+    def put(
+        self,
+        url: str,
+        body: bytes,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        """Stores a response (and evicts old ones if necessary)."""
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO response VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, body, etag, last_modified, now, now, len(body)),
+            )
+            self._evict()
+
+    def refresh(self, url: str):
+        """Marks a cached response as revalidated (fresh again)."""
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "UPDATE response SET fetched = ?, accessed = ? WHERE url = ?",
+                (now, now, url),
+            )
+
+    def _evict(self):
+        """removes the least recently used responses beyond max_size"""
+        total = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM response"
+        ).fetchone()[0]
+        if total <= self.max_size:
+            return
+        self._connection.execute("BEGIN")
+        try:
+            rows = self._connection.execute(
+                "SELECT url, size FROM response ORDER BY accessed"
+            ).fetchall()
+            evicted = []
+            for url, size in rows:
+                if total <= self.max_size:
+                    break
+                evicted.append((url,))
+                total -= size
+            self._connection.executemany("DELETE FROM response WHERE url = ?", evicted)
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+
+    def size(self) -> int:
+        """the total size of the cached bodies in bytes"""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM response"
+            ).fetchone()[0]
+
+    def clear(self):
+        """Removes all cached responses."""
+        with self._lock:
+            self._connection.execute("DELETE FROM response")
+
+    def close(self):
+        self._connection.close()
+
+
+# the cache used by fetch (None: no caching)
+_cache: Optional[HttpCache] = None
+
+
+def set_cache(cache: Optional[HttpCache]):
+    """Sets the cache used by fetch (None disables caching)."""
+    global _cache  # pylint: disable=W0603
+    _cache = cache
+
+
+def get_cache() -> Optional[HttpCache]:
+    """Returns the cache used by fetch (or None)."""
+    return _cache
+
+
+def fetch(url: str, limiter: Optional[TokenBucket] = None) -> bytes:
+    """Returns the body of the response to a GET request,
+    using the cache (if one is set, cf. set_cache and the module docstring).
+    If a limiter is given, a token is taken before a request is sent
+    (responses from the cache are not limited).
+    Raises urllib.error.HTTPError or URLError if the request fails.
+    Raises ConnectionError in offline mode if the URL is not cached.
+    """
+    cache = _cache
+    cached = None if cache is None else cache.get(url)
+    if cached is not None:
+        body, etag, last_modified, fetched = cached
+        if cache.offline or time.time() - fetched < cache.ttl:
+            return body
+    elif cache is not None and cache.offline:
+        raise ConnectionError(f"offline mode: {url} is not in the cache")
+
+    request = Request(url)
+    if cached is not None:
+        if etag:
+            request.add_header("If-None-Match", etag)
+        if last_modified:
+            request.add_header("If-Modified-Since", last_modified)
+    if limiter is not None:
+        limiter.acquire()
+    try:
+        with urlopen(request, timeout=_TIMEOUT) as response:
+            body = response.read()
+            headers = response.headers
+    except HTTPError as error:
+        if error.code == 304 and cached is not None:
+            cache.refresh(url)
+            return cached[0]
+        raise
+
+    if cache is not None:
+        cache.put(url, body, headers.get("ETag"), headers.get("Last-Modified"))
+    return body
@@ -0,0 +1,146 @@
+"""This module contains the JSON codecs for reading and writing record files.
+
+The record files are written exactly like json.dumps(data, indent=4)
+(ASCII only, non-ASCII characters escaped) so that they are easy to diff.
+With indent, the json module of the standard library uses its pure Python
+encoder, which is slow. If orjson is installed, it is used instead and
+its output is converted to the very same bytes, so the record files do
+not change (and git shows no diffs) whichever codec wrote them.
+
+The fastest available codec is used by default (cf. loads and dumps).
+
+example:
+> data = dumps(record.to_dict())
+> record_dict = loads(data)
+> set_codec("stdlib")
+"""
+
+__all__ = ["JsonCodec", "CODECS", "get_codec", "set_codec", "loads", "dumps"]
+
+
+from abc import ABCMeta, abstractmethod
+import json
+import re
+from typing import Any, Dict, Optional, Union
+
+
+class JsonCodec(metaclass=ABCMeta):
+    """parses and serializes the content of record files"""
+
+    # the name of the codec (a key of CODECS)
+    name: str
+
+    @abstractmethod
+    def loads(self, data: Union[bytes, str]) -> Any:
+        """Parses a JSON document.
+        Raises ValueError if it is not valid JSON.
+        """
+
+    @abstractmethod
+    def dumps(self, obj: Any) -> bytes:
+        """Returns the bytes of json.dumps(obj, indent=4)."""
+
+
+class StdlibCodec(JsonCodec):
+    """the json module of the standard library"""
+
+    name = "stdlib"
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, indent=4).encode("utf8")
+
+
+# the characters which json.dumps escapes but orjson does not
+_NOT_ESCAPED = re.compile(rb"[\x7f-\xff]+")
+
+
+def _escape(match: "re.Match") -> bytes:
+    return json.dumps(match.group().decode("utf8"))[1:-1].encode("ascii")
+
+
+class OrjsonCodec(JsonCodec):
+    """orjson (if installed)
+    Like the record files, obj may not contain floats
+    (orjson formats some of them differently).
+    """
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+        self._stdlib = StdlibCodec()
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return self._orjson.loads(data)  # orjson.JSONDecodeError is a ValueError
+
+    def dumps(self, obj: Any) -> bytes:
+        try:
+            data = self._orjson.dumps(obj, option=self._orjson.OPT_INDENT_2)
+        except TypeError:
+            # eg. lone surrogates, integers with more than 64 bits, other key types
+            return self._stdlib.dumps(obj)
+        # two spaces per level -> four spaces: the indentation is first
+        # turned into tabs, one level per pass (orjson escapes line breaks
+        # and tabs in strings, so these only occur in the indentation)
+        data = data.replace(b"\n  ", b"\n\t")
+        while b"\t  " in data:
+            data = data.replace(b"\t  ", b"\t\t")
+        data = data.replace(b"\t", b"    ")
+        if not data.isascii() or b"\x7f" in data:
+            data = _NOT_ESCAPED.sub(_escape, data)
+        return data
+
+
+def _available_codecs() -> Dict[str, JsonCodec]:
+    codecs = {"stdlib": StdlibCodec()}
+    try:
+        codecs["orjson"] = OrjsonCodec()
+    except ImportError:
+        pass
+    return codecs
+
+
+# codec name -> codec (only the available ones)
+CODECS: Dict[str, JsonCodec] = _available_codecs()
+
+_codec = CODECS.get("orjson", CODECS["stdlib"])
+
+
+def get_codec(name: Optional[str] = None) -> JsonCodec:
+    """Returns the codec with the given name or the one in use (if name is None).
+    Raises ValueError if the codec is not available.
+    """
+    if name is None:
+        return _codec
+    if name not in CODECS:
+        raise ValueError(
+            f"the JSON codec '{name}' is not available (choose from {', '.join(CODECS)})"
+        )
+    return CODECS[name]
+
+
+def set_codec(name: str):
+    """Selects the codec for reading and writing record files.
+    Raises ValueError if the codec is not available.
+    """
+    global _codec  # pylint: disable=W0603
+    _codec = get_codec(name)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Parses the content of a record file with the selected codec.
+    Raises ValueError if it is not valid JSON.
+    """
+    return _codec.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Serializes the content of a record file with the selected codec
+    (the bytes of json.dumps(obj, indent=4)).
+    """
+    return _codec.dumps(obj)
@@ -1,16 +1,26 @@
 """This module contains functions for exporting records to json files
 and for recreating records from such files.
+
+If the records belong to a session, store_record and store_records
+also stamp the written files in the manifest (cf. sync_collection),
+so that a sync does not read them again.
 """
 
-__all__ = ["record_from_dict", "load_record", "store_record"]
+__all__ = ["record_from_dict", "load_record", "store_record", "store_records"]
 
 
+from concurrent.futures import ThreadPoolExecutor
+import os
 from pathlib import Path
-import json
-from typing import Optional, Dict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import object_session
 
+from . import json_codec
+from .misc import atomic_write
 from .models.author import Author
 from .models.record import Record
+from .record_files import record_file_stamp
 
 
 def record_from_dict(record_dict: Dict) -> Record:
@@ -71,17 +81,49 @@ def load_record(path: Path) -> Record:
     if path.is_dir():
         path = path / (path.name + ".json")
     try:
-        with path.open("r") as file:
-            record = json.load(file)
+        record = json_codec.loads(path.read_bytes())
     except FileNotFoundError:
         raise FileNotFoundError(f"the record file {path} was not found")
 
     return record_from_dict(record)
 
 
-def store_record(record: Record, root_folder: Path, overwrite: Optional[bool] = False):
+def _record_json(record: Record) -> bytes:
+    """the content of the record file"""
+    return json_codec.dumps(record.to_dict())
+
+
+def _write_if_changed(record_file: Path, data: bytes) -> Tuple[Optional[bool], Dict]:
+    """Writes the file (atomically) unless it already has the given content.
+    Returns None if the file is unchanged, otherwise if it is new,
+    and the stamp of the file (cf. read_record_file).
+    """
+    try:
+        if record_file.stat().st_size == len(data) and record_file.read_bytes() == data:
+            return None, record_file_stamp(str(record_file), data, os.stat(record_file))
+        new = False
+    except FileNotFoundError:
+        new = True
+    with atomic_write(record_file, binary=True) as file:
+        file.write(data)
+    return new, record_file_stamp(str(record_file), data, os.stat(record_file))
+
+
+def _stamp_record_files(session, stamps: List[Dict]):
+    if session is not None:
+        from .sync import stamp_record_files
+
+        stamp_record_files(session, stamps)
+
+
+def store_record(
+    record: Record, root_folder: Path, overwrite: Optional[bool] = False
+) -> bool:
     """Creates record folder and exports a record to the JSON file
     <root_folder>/<record.key>/<record.key>.json.
+    The file is not touched if it already has the same content.
+    If the record belongs to a session, the file is stamped in the manifest.
+    Returns whether the file was written.
     Raises FileExistsError if the record already exists and overwrite is False.
     """
     record_folder = root_folder / record.key
@@ -92,5 +134,49 @@ def store_record(record: Record, root_folder: Path, overwrite: Optional[bool] =
         raise FileExistsError(f"the record folder {record_folder} already exists")
 
     record_file = record_folder / (record.key + ".json")
-    with record_file.open("w") as file:
-        json.dump(record.to_dict(), file, indent=4)
+    new, stamp = _write_if_changed(record_file, _record_json(record))
+    _stamp_record_files(object_session(record), [stamp])
+    return new is not None
+
+
+def store_records(
+    records: Iterable[Record], root_folder: Path, workers: Optional[int] = None
+) -> Dict[str, List[str]]:
+    """Exports many records to their JSON files (cf. store_record),
+    creating the record folders if necessary.
+    The records are serialized first, then the files are compared
+    and written by a pool of workers threads (default: 8).
+    Files which already have the right content are not touched,
+    so their modification times stay the same.
+    If the records belong to a session, the files are stamped in the manifest.
+    Returns the keys of the records whose file was "added" or "changed"
+    and of those whose file was "unchanged".
+    """
+    root_folder = Path(root_folder)
+    # the records must not be touched by the worker threads;
+    # the session is taken while a record is yielded, as stream_records
+    # expunges the records afterwards
+    session = None
+    serialized = []
+    for record in records:
+        if session is None:
+            session = object_session(record)
+        serialized.append((record.key, _record_json(record)))
+
+    def store(item):
+        key, data = item
+        record_folder = root_folder / key
+        record_folder.mkdir(exist_ok=True)
+        return _write_if_changed(record_folder / (key + ".json"), data)
+
+    report = {"added": [], "changed": [], "unchanged": []}
+    stamps = []
+    with ThreadPoolExecutor(max_workers=workers or 8) as executor:
+        for (key, _), (new, stamp) in zip(serialized, executor.map(store, serialized)):
+            if new is None:
+                report["unchanged"].append(key)
+            else:
+                report["added" if new else "changed"].append(key)
+            stamps.append(stamp)
+    _stamp_record_files(session, stamps)
+    return report
@@ -2,9 +2,36 @@
 which do not involve talking to the the database.
 """
 
-__all__ = ["format_string", "key_generator"]
+__all__ = [
+    "format_string",
+    "key_generator",
+    "ordered_map",
+    "COMPRESSION_SUFFIXES",
+    "strip_compression_suffix",
+    "atomic_write",
+]
 
-from typing import Dict, List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import gzip
+import io
+from itertools import count
+import os
+from pathlib import Path
+import stat
+import tempfile
+from typing import (
+    IO,
+    Callable,
+    Container,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Union,
+)
 from unicodedata import normalize
 
 
@@ -115,9 +142,175 @@ UNICODE_TO_ASCII = {
 }
 
 
-def key_generator(year: int, authors: List[Dict[str, str]]) -> str:
-    """Creates a key for a (new) record."""
+def _key_suffix(n: int) -> str:
+    """Returns the n-th suffix of the sequence a, b, ..., z, aa, ab, ..."""
+    suffix = ""
+    while n > 0:
+        n, remainder = divmod(n - 1, 26)
+        suffix = chr(ord("a") + remainder) + suffix
+    return suffix
+
+
+def key_generator(
+    year: int, authors: List[Dict[str, str]], taken: Optional[Container[str]] = None
+) -> str:
+    """Creates a key for a (new) record.
+    If a container of taken keys is given (eg. a set or a KeyIndex),
+    a suffix a, b, ..., z, aa, ab, ... is appended if necessary
+    to make the key unique.
+    """
     key = str(year)
     for author in authors:
         key += author["last"]
-    return key.replace(" ", "").translate(UNICODE_TO_ASCII)
+    key = key.replace(" ", "").translate(UNICODE_TO_ASCII)
+
+    if taken is None or key not in taken:
+        return key
+
+    for n in count(1):
+        candidate = key + _key_suffix(n)
+        if candidate not in taken:
+            return candidate
+
+
+def ordered_map(
+    function: Callable,
+    iterable: Iterable,
+    workers: int,
+    max_pending: Optional[int] = None,
+) -> Iterator:
+    """Like map, but the function is applied in a pool of worker processes.
+    The results are yielded in the order of the input.
+    Unlike Executor.map, at most max_pending (default: 2 * workers) items
+    are submitted ahead of the consumer, so the input is consumed lazily
+    and the memory consumption stays bounded.
+    The function and the items must be picklable.
+    """
+    if max_pending is None:
+        max_pending = 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        try:
+            for item in iterable:
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+                pending.append(executor.submit(function, item))
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # the consumer stopped early or a worker failed
+            for future in pending:
+                future.cancel()
+
+
+# file name suffixes which make atomic_write compress the output
+COMPRESSION_SUFFIXES = (".gz", ".zst")
+
+# size of the blocks written by atomic_write
+_BLOCK_SIZE = 1 << 20
+
+
+def strip_compression_suffix(full_path: Union[Path, str]) -> Path:
+    """Returns the path without a compression suffix
+    (eg. 'refs.bib.gz' -> 'refs.bib').
+    Raises ValueError if the suffix is '.zst',
+    but the zstandard package is not installed.
+    """
+    full_path = Path(full_path)
+    if full_path.suffix not in COMPRESSION_SUFFIXES:
+        return full_path
+    if full_path.suffix == ".zst":
+        try:
+            import zstandard  # pylint: disable=W0611
+        except ImportError:
+            raise ValueError("writing '.zst' files requires the zstandard package")
+    return full_path.with_suffix("")
+
+
+def _fsync_directory(directory: Path):
+    """makes a rename in the directory durable (where supported)"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    descriptor = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def _default_mode() -> int:
+    """the permissions of a new file (cf. open) under the current umask"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+# determined once, since changing the umask affects all threads
+_DEFAULT_MODE = _default_mode()
+
+
+@contextmanager
+def atomic_write(
+    full_path: Union[Path, str], binary: bool = False, fsync: bool = False
+) -> Iterator[IO]:
+    """Context manager for writing a file all at once.
+    The output goes to a new temporary file <full_path>.<random>.tmp
+    (so that several writers do not collide),
+    which replaces full_path only after everything was written,
+    so readers never see a partially written file.
+    The new file gets the permissions of the file it replaces
+    (or the default permissions if full_path does not exist yet).
+    If an exception is raised, the temporary file is removed
+    and full_path is left untouched.
+    The output is written in blocks of 1 MiB and compressed
+    if full_path ends in '.gz' (gzip) or '.zst' (Zstandard).
+    If fsync is True, the data is flushed to the disk
+    before the file is renamed (slower, but survives a power cut).
+    Yields a text file (UTF8) or, if binary is True, a binary file.
+    Raises ValueError if the compression is not available
+    (cf. strip_compression_suffix).
+    """
+    full_path = Path(full_path)
+    strip_compression_suffix(full_path)
+    try:
+        mode = stat.S_IMODE(os.stat(full_path).st_mode)
+    except FileNotFoundError:
+        mode = _DEFAULT_MODE
+    descriptor, temporary_name = tempfile.mkstemp(
+        dir=full_path.parent, prefix=full_path.name + ".", suffix=".tmp"
+    )
+    temporary_path = Path(temporary_name)
+    raw = open(descriptor, "wb", buffering=_BLOCK_SIZE)
+    try:
+        stream = raw
+        text = None
+        try:
+            if full_path.suffix == ".gz":
+                # no file name and time stamp, so equal content gives equal files
+                stream = gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0)
+            elif full_path.suffix == ".zst":
+                import zstandard
+
+                stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+            if binary:
+                yield stream
+            else:
+                text = io.TextIOWrapper(stream, encoding="utf8")
+                yield text
+        finally:
+            if text is not None:
+                text.detach()  # flushes, but does not close stream
+            if stream is not raw:
+                stream.close()  # writes the end of the compressed data
+        raw.flush()
+        if fsync:
+            os.fsync(raw.fileno())
+        os.chmod(temporary_path, mode)
+    except BaseException:
+        raw.close()
+        temporary_path.unlink()
+        raise
+    raw.close()
+    os.replace(temporary_path, full_path)
+    if fsync:
+        _fsync_directory(full_path.parent)
@@ -12,3 +12,5 @@ from .book import Book
 from .publisher import Publisher
 from .tag import Tag
 from .url import Url
+from .record_file import record_file_table
+from .pdf_file import pdf_file_table
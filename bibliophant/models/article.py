@@ -74,12 +74,12 @@ class Article(Record):
 
     __mapper_args__ = {"polymorphic_identity": "article"}
 
-    journal_id = Column(Integer, ForeignKey("journal.id"))
+    journal_id = Column(Integer, ForeignKey("journal.id"), index=True)
     _journal = relationship("Journal", back_populates="articles")
     _volume = Column(String)
     _number = Column(String)
     _pages = Column(String)
-    eprint_id = Column(Integer, ForeignKey("eprint.id"))
+    eprint_id = Column(Integer, ForeignKey("eprint.id"), index=True)
     _eprint = relationship("Eprint", back_populates="article")
     _abstract = Column(String)
 
@@ -9,7 +9,7 @@ __all__ = []
 import re
 from typing import Optional
 
-from sqlalchemy.sql.schema import Column, Table, ForeignKey
+from sqlalchemy.sql.schema import Column, Table, ForeignKey, Index
 from sqlalchemy.types import Integer, String
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.hybrid import hybrid_property
@@ -65,8 +65,12 @@ def validate_email(email: Optional[str]) -> Optional[str]:
 author_association_table = Table(
     "author_association",
     ModelBase.metadata,
+    Column("id", Integer, primary_key=True),
     Column("author_id", Integer, ForeignKey("author.id")),
     Column("record_id", Integer, ForeignKey("record.id")),
+    # an author appears at most once in the list of authors of a record
+    Index("ix_author_association_record_author", "record_id", "author_id", unique=True),
+    Index("ix_author_association_author_id", "author_id"),
 )
 
 
@@ -76,6 +80,7 @@ class Author(ModelBase):
     """
 
     __tablename__ = "author"
+    __table_args__ = (Index("ix_author_last_first", "_last", "_first"),)
 
     id = Column(Integer, primary_key=True)
 
@@ -5,17 +5,21 @@ modified_date fields. These two columns will be added to all tables.
 
 The init_database function can be used to create all tables
 for a new collection.
+The migrate_database function upgrades the database file of an existing
+collection to the current SCHEMA_VERSION.
+The schema version of a database file is stored in SQLite's user_version.
 """
 
 __all__ = []
 
 
 from abc import ABCMeta, abstractmethod
+from typing import List
 
 from sqlalchemy.ext.declarative import declared_attr, declarative_base, DeclarativeMeta
 from sqlalchemy.sql.schema import Column
 from sqlalchemy.types import DateTime
-from sqlalchemy import func
+from sqlalchemy import func, text
 
 
 class BaseMixin(metaclass=ABCMeta):
@@ -61,3 +65,171 @@ ModelBase = declarative_base(cls=BaseMixin, metaclass=DeclarativeABCMeta)
 def init_database(engine: "sqlalchemy.engine.Engine"):
     """Initialize all tables when starting a new collection"""
     ModelBase.metadata.create_all(engine)
+    migrate_database(engine)
+
+
+def _create_indexes(connection: "sqlalchemy.engine.Connection", names: List[str]):
+    """Creates the named indexes (as declared in the models) if they do not exist."""
+    indexes = {
+        index.name: index
+        for table in ModelBase.metadata.tables.values()
+        for index in table.indexes
+    }
+    for name in names:
+        indexes[name].create(connection, checkfirst=True)
+
+
+def _migration_1(connection: "sqlalchemy.engine.Connection"):
+    """indexes for keys, DOIs, names and the association tables"""
+    from .author import author_association_table
+
+    # a record's key must be unique, we cannot fix that automatically
+    duplicate_keys = connection.execute(
+        text("SELECT _key FROM record GROUP BY _key HAVING COUNT(*) > 1")
+    ).fetchall()
+    if duplicate_keys:
+        raise ValueError(
+            "the database contains records with duplicate keys: "
+            + ", ".join(row[0] for row in duplicate_keys)
+        )
+
+    # merge tags which have the same name into the one that was created first
+    # (a link which already exists for the first tag is left behind and dropped)
+    connection.execute(
+        text(
+            "UPDATE OR IGNORE tag_association SET tag_id = ("
+            " SELECT MIN(other.id) FROM tag AS this JOIN tag AS other"
+            " ON this._name = other._name WHERE this.id = tag_association.tag_id)"
+        )
+    )
+    for table, column in (("tag_association", "tag_id"), ("tag", "id")):
+        connection.execute(
+            text(
+                f"DELETE FROM {table} WHERE {column} NOT IN ("
+                " SELECT MIN(id) FROM tag GROUP BY _name)"
+            )
+        )
+
+    # drop duplicate links between the same pair of rows
+    for table, column in (
+        ("author_association", "author_id"),
+        ("tag_association", "tag_id"),
+    ):
+        connection.execute(
+            text(
+                f"DELETE FROM {table} WHERE rowid NOT IN ("
+                f" SELECT MIN(rowid) FROM {table} GROUP BY record_id, {column})"
+            )
+        )
+
+    # author_association gets an explicit id column (an alias of SQLite's rowid),
+    # which is used to keep the authors of a record in order
+    columns = connection.execute(text("PRAGMA table_info(author_association)"))
+    if "id" not in [column.name for column in columns]:
+        connection.execute(
+            text("ALTER TABLE author_association RENAME TO _author_association")
+        )
+        author_association_table.create(connection)
+        connection.execute(
+            text(
+                "INSERT INTO author_association (id, author_id, record_id)"
+                " SELECT rowid, author_id, record_id FROM _author_association"
+            )
+        )
+        connection.execute(text("DROP TABLE _author_association"))
+
+    _create_indexes(
+        connection,
+        [
+            "ix_record__key",
+            "ix_record__doi",
+            "ix_tag__name",
+            "ix_author_last_first",
+            "ix_journal__name",
+            "ix_publisher__name",
+            "ix_url_record_id",
+            "ix_article_journal_id",
+            "ix_article_eprint_id",
+            "ix_book_publisher_id",
+            "ix_author_association_record_author",
+            "ix_author_association_author_id",
+            "ix_tag_association_tag_record",
+            "ix_tag_association_record_id",
+        ],
+    )
+
+
+def _migration_2(connection: "sqlalchemy.engine.Connection"):
+    """index for finding recently added or modified records"""
+    _create_indexes(connection, ["ix_record_modified_date"])
+
+
+def _migration_3(connection: "sqlalchemy.engine.Connection"):
+    """full-text search index (if SQLite provides FTS5)"""
+    from .search_index import create_search_index
+
+    create_search_index(connection)
+
+
+def _migration_4(connection: "sqlalchemy.engine.Connection"):
+    """column for the cached BibTeX of the records"""
+    columns = connection.execute(text("PRAGMA table_info(record)")).all()
+    if "_bibtex" not in [column[1] for column in columns]:
+        connection.execute(text("ALTER TABLE record ADD COLUMN _bibtex VARCHAR"))
+
+
+def _migration_5(connection: "sqlalchemy.engine.Connection"):
+    """manifest of the record files (cf. sync_collection)"""
+    from .record_file import record_file_table
+
+    record_file_table.create(connection, checkfirst=True)
+
+
+def _migration_6(connection: "sqlalchemy.engine.Connection"):
+    """index of the PDF files (cf. update_pdf_index)"""
+    from .pdf_file import pdf_file_table
+
+    pdf_file_table.create(connection, checkfirst=True)
+
+
+def _migration_7(connection: "sqlalchemy.engine.Connection"):
+    """triggers which index a record once per change of its authors"""
+    from .search_index import create_search_triggers, has_search_index
+
+    if has_search_index(connection):
+        create_search_triggers(connection)
+
+
+# Every migration brings the database from version i to version i + 1.
+# Migrations are also run on newly created databases (after create_all),
+# so they must not fail if their changes are already in place.
+_MIGRATIONS = [
+    _migration_1,
+    _migration_2,
+    _migration_3,
+    _migration_4,
+    _migration_5,
+    _migration_6,
+    _migration_7,
+]
+
+SCHEMA_VERSION = len(_MIGRATIONS)
+
+
+def migrate_database(engine: "sqlalchemy.engine.Engine"):
+    """Upgrades the database to SCHEMA_VERSION by running all pending migrations.
+    Raises ValueError if the database was created by a newer version of bibliophant
+    or if its content prevents a migration.
+    """
+    with engine.begin() as connection:
+        version = connection.execute(text("PRAGMA user_version")).scalar()
+
+        if version > SCHEMA_VERSION:
+            raise ValueError(
+                f"the database has schema version {version}, "
+                f"but this version of bibliophant only supports up to {SCHEMA_VERSION}"
+            )
+
+        for version in range(version, SCHEMA_VERSION):
+            _MIGRATIONS[version](connection)
+            connection.execute(text(f"PRAGMA user_version = {version + 1}"))
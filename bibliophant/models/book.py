@@ -87,7 +87,7 @@ class Book(Record):
 
     __mapper_args__ = {"polymorphic_identity": "book"}
 
-    publisher_id = Column(Integer, ForeignKey("publisher.id"))
+    publisher_id = Column(Integer, ForeignKey("publisher.id"), index=True)
     _publisher = relationship("Publisher", back_populates="books")
     _volume = Column(String)
     _edition = Column(String)
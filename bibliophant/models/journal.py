@@ -37,7 +37,7 @@ class Journal(ModelBase):
 
     articles = relationship("Article", back_populates="_journal")
 
-    _name = Column(String, nullable=False)
+    _name = Column(String, nullable=False, index=True)
 
     def __init__(self, name: str):
         self._name = validate_name(name)
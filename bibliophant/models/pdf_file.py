@@ -0,0 +1,28 @@
+"""This module defines the table 'pdf_file',
+the index of the PDF documents in the record folders.
+
+For every PDF file (its path relative to the root folder of the collection,
+ie. '<key>/<title>.pdf') the table stores the key of the record
+(the name of the record folder), the size and modification time the file
+had when it was hashed, and the SHA-256 hash of its content
+(cf. update_pdf_index).
+"""
+
+__all__ = ["pdf_file_table"]
+
+
+from sqlalchemy.sql.schema import Column, Table
+from sqlalchemy.types import Integer, String
+
+from .base import ModelBase
+
+
+pdf_file_table = Table(
+    "pdf_file",
+    ModelBase.metadata,
+    Column("path", String, primary_key=True),
+    Column("key", String, nullable=False, index=True),
+    Column("size", Integer, nullable=False),
+    Column("mtime_ns", Integer, nullable=False),
+    Column("sha256", String, nullable=False, index=True),
+)
@@ -54,7 +54,7 @@ class Publisher(ModelBase):
 
     books = relationship("Book", back_populates="_publisher")
 
-    _name = Column(String, nullable=False)
+    _name = Column(String, nullable=False, index=True)
     _address = Column(String)
 
     def __init__(self, name: str, address: Optional[str] = None):
@@ -12,9 +12,13 @@ from abc import abstractmethod
 import re
 from typing import List, Optional
 
-from sqlalchemy.sql.schema import Column
+from itertools import chain
+
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.sql.schema import Column, Index
 from sqlalchemy.types import Integer, String, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship, Session
+from sqlalchemy.orm.attributes import flag_modified, get_history, PASSIVE_NO_INITIALIZE
 from sqlalchemy.ext.hybrid import hybrid_property
 
 from .base import ModelBase
@@ -144,19 +148,24 @@ class Record(ModelBase):
     """abstract base class for a bibliographic record"""
 
     __tablename__ = "record"
+    __table_args__ = (Index("ix_record_modified_date", "modified_date"),)
 
     id = Column(Integer, primary_key=True)
 
     record_type = Column(String(16), nullable=False)
     __mapper_args__ = {"polymorphic_on": record_type}
 
-    _key = Column(String, nullable=False)
+    _key = Column(String, nullable=False, index=True, unique=True)
     _title = Column(String, nullable=False)
     _year = Column(Integer, nullable=False)
     _authors = relationship(
-        "Author", secondary=author_association_table, back_populates="records"
+        "Author",
+        secondary=author_association_table,
+        back_populates="records",
+        # keep the authors in the order in which they were linked to the record
+        order_by=author_association_table.c.id,
     )
-    _doi = Column(String)
+    _doi = Column(String, index=True)
     _month = Column(Integer)
     _note = Column(String)
     _urls = relationship("Url", back_populates="record")
@@ -164,6 +173,8 @@ class Record(ModelBase):
         "Tag", secondary=tag_association_table, back_populates="records"
     )
     _open_access = Column(Boolean)
+    # cached output of record_to_bibtex (None if it has to be rendered again)
+    _bibtex = deferred(Column(String))
 
     # pylint: disable=dangerous-default-value, too-many-arguments
     @abstractmethod
@@ -283,3 +294,88 @@ class Record(ModelBase):
     @open_access.setter
     def open_access(self, value: Optional[bool]):
         self._open_access = validate_open_access(value)
+
+
+def _authors_reordered(record: Record) -> bool:
+    """whether the loaded authors of the record are the committed ones
+    in another order (which the attribute history does not report)
+    """
+    committed = inspect(record).committed_state.get("_authors")
+    return isinstance(committed, list) and committed != list(record._authors)
+
+
+@event.listens_for(Session, "after_flush")
+def _store_author_order(session, flush_context):
+    """The unit of work writes the links between records and authors
+    in no particular order. The links of every record whose list of authors
+    has changed (or was only reordered) are therefore rewritten,
+    so that their ids follow the list.
+    """
+    for record in chain(session.new, session.dirty):
+        if not isinstance(record, Record) or record in session.deleted:
+            continue
+        history = get_history(record, "_authors", passive=PASSIVE_NO_INITIALIZE)
+        if not (history.added or history.deleted or _authors_reordered(record)):
+            continue
+        connection = session.connection()
+        connection.execute(
+            author_association_table.delete().where(
+                author_association_table.c.record_id == record.id
+            )
+        )
+        connection.execute(
+            author_association_table.insert(),
+            [{"author_id": a.id, "record_id": record.id} for a in record._authors],
+        )
+
+
+@event.listens_for(Session, "before_flush")
+def _invalidate_bibtex(session, flush_context, instances):
+    """Clears the cached BibTeX (Record._bibtex) of all records whose BibTeX
+    may change with this flush: modified records and the records of
+    modified authors, journals, publishers and eprints.
+    Changes which bypass the ORM do not clear the cache.
+    """
+    from .article import Article
+    from .book import Book
+    from .eprint import Eprint
+    from .journal import Journal
+    from .publisher import Publisher
+
+    article = Article.__table__
+    # entity -> (record id column, foreign key column)
+    record_ids = {
+        Author: (
+            author_association_table.c.record_id,
+            author_association_table.c.author_id,
+        ),
+        Journal: (article.c.id, article.c.journal_id),
+        Publisher: (Book.__table__.c.id, Book.__table__.c.publisher_id),
+        Eprint: (article.c.id, article.c.eprint_id),
+    }
+    modified = {entity: [] for entity in record_ids}
+
+    for instance in session.dirty:
+        if isinstance(instance, Record) and _authors_reordered(instance):
+            # not a modification for the unit of work: force an UPDATE
+            instance._bibtex = None
+            flag_modified(instance, "_bibtex")
+            continue
+        if not session.is_modified(instance):
+            continue
+        if isinstance(instance, Record):
+            instance._bibtex = None
+        elif type(instance) in modified:
+            modified[type(instance)].append(instance.id)
+
+    record = Record.__table__
+    for entity, ids in modified.items():
+        if ids:
+            record_id, foreign_key = record_ids[entity]
+            session.connection().execute(
+                update(record).where(
+                    record.c.id.in_(select(record_id).where(foreign_key.in_(ids)))
+                )
+                # the records themselves were not modified
+                .values(_bibtex=None, modified_date=record.c.modified_date)
+            )
@@ -0,0 +1,26 @@
+"""This module defines the table 'record_file',
+the manifest of the JSON files in the record folders.
+
+For every record file (its path relative to the root folder of the
+collection, ie. '<key>/<key>.json') the table stores the modification time
+and the size the file had when its content was last applied to the database,
+together with a hash of its content (cf. sync_collection).
+"""
+
+__all__ = ["record_file_table"]
+
+
+from sqlalchemy.sql.schema import Column, Table
+from sqlalchemy.types import Integer, String
+
+from .base import ModelBase
+
+
+record_file_table = Table(
+    "record_file",
+    ModelBase.metadata,
+    Column("path", String, primary_key=True),
+    Column("mtime_ns", Integer, nullable=False),
+    Column("size", Integer, nullable=False),
+    Column("hash", String, nullable=False),
+)
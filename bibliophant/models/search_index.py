@@ -0,0 +1,212 @@
+"""This module defines the full-text search index of the records.
+
+The index is a SQLite FTS5 virtual table 'record_search'.
+Its rowid is the id of the record and it has the columns
+title, abstract, note, authors and journal.
+It is kept in sync by triggers on the tables it mirrors,
+so that it stays correct no matter if records are changed through
+the ORM or with plain SQL statements (cf. bulk_add_records).
+
+Changing the authors of a record inserts and deletes one row of
+author_association per author. Instead of rebuilding the index row of the
+record for every one of them, these triggers only note the record in the
+table record_search_pending. The noted records are indexed once by
+refresh_search_index, which runs after every flush of a session
+and before every search (cf. search_records).
+
+The index is not part of the ORM metadata,
+it is created by a migration (cf. migrate_database).
+If the SQLite library was built without FTS5, the index is not created
+and has_search_index returns False.
+Before inserting very many records, it is faster to drop the index
+and to create it again afterwards (cf. reindex_collection).
+"""
+
+__all__ = [
+    "SEARCH_COLUMNS",
+    "has_search_index",
+    "create_search_index",
+    "drop_search_index",
+    "create_search_triggers",
+    "refresh_search_index",
+]
+
+
+from typing import List
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import OperationalError
+
+
+SEARCH_COLUMNS = ("title", "abstract", "note", "authors", "journal")
+
+
+def _insert_rows(condition: str) -> str:
+    """SQL statement which indexes the records
+    whose id satisfies the condition (eg. '= NEW.id').
+    """
+    return f"""
+        INSERT INTO record_search (rowid, title, abstract, note, authors, journal)
+        SELECT record.id, record._title, article._abstract, record._note,
+            (SELECT group_concat(name, ' ') FROM (
+                SELECT coalesce(author._first || ' ', '') || author._last AS name
+                FROM author_association
+                JOIN author ON author.id = author_association.author_id
+                WHERE author_association.record_id = record.id
+                ORDER BY author_association.id)),
+            journal._name
+        FROM record
+        LEFT JOIN article ON article.id = record.id
+        LEFT JOIN journal ON journal.id = article.journal_id
+        WHERE record.id {condition};"""
+
+
+def _refresh_statements(condition: str) -> List[str]:
+    """SQL statements which rebuild the index rows of the records
+    whose id satisfies the condition.
+    """
+    return [
+        f"DELETE FROM record_search WHERE rowid {condition};",
+        _insert_rows(condition),
+        f"DELETE FROM record_search_pending WHERE record_id {condition};",
+    ]
+
+
+def _refresh_rows(condition: str) -> str:
+    return " ".join(_refresh_statements(condition))
+
+
+def _note_pending(record_id: str) -> str:
+    """SQL statement which notes a record for refresh_search_index"""
+    return f"INSERT OR IGNORE INTO record_search_pending VALUES ({record_id});"
+
+
+# trigger name -> (event, SQL statements)
+_TRIGGERS = {
+    "record_search_record_insert": (
+        "AFTER INSERT ON record",
+        _refresh_rows("= NEW.id"),
+    ),
+    "record_search_record_update": (
+        "AFTER UPDATE OF _title, _note ON record",
+        _refresh_rows("= NEW.id"),
+    ),
+    "record_search_record_delete": (
+        "AFTER DELETE ON record",
+        "DELETE FROM record_search_pending WHERE record_id = OLD.id; "
+        "DELETE FROM record_search WHERE rowid = OLD.id;",
+    ),
+    "record_search_article_insert": (
+        "AFTER INSERT ON article",
+        _refresh_rows("= NEW.id"),
+    ),
+    "record_search_article_update": (
+        "AFTER UPDATE OF _abstract, journal_id ON article",
+        _refresh_rows("= NEW.id"),
+    ),
+    "record_search_author_link": (
+        "AFTER INSERT ON author_association",
+        _note_pending("NEW.record_id"),
+    ),
+    "record_search_author_unlink": (
+        "AFTER DELETE ON author_association",
+        _note_pending("OLD.record_id"),
+    ),
+    "record_search_author_update": (
+        "AFTER UPDATE OF _last, _first ON author",
+        _refresh_rows(
+            "IN (SELECT record_id FROM author_association WHERE author_id = NEW.id)"
+        ),
+    ),
+    "record_search_journal_update": (
+        "AFTER UPDATE OF _name ON journal",
+        _refresh_rows("IN (SELECT id FROM article WHERE journal_id = NEW.id)"),
+    ),
+}
+
+
+def has_search_index(connection: "sqlalchemy.engine.Connection") -> bool:
+    """Checks if the database has the full-text search index."""
+    return (
+        connection.execute(
+            text(
+                "SELECT COUNT(*) FROM sqlite_master"
+                " WHERE type = 'table' AND name = 'record_search'"
+            )
+        ).scalar()
+        > 0
+    )
+
+
+def create_search_index(connection: "sqlalchemy.engine.Connection"):
+    """Creates the full-text search index and its triggers
+    and indexes all existing records.
+    Nothing happens if the index already exists or FTS5 is not available.
+    """
+    if has_search_index(connection):
+        return
+
+    try:
+        connection.execute(
+            text(
+                "CREATE VIRTUAL TABLE record_search USING fts5("
+                + ", ".join(SEARCH_COLUMNS)
+                + ", tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        )
+    except OperationalError as error:
+        if "fts5" in str(error):
+            return
+        raise
+
+    create_search_triggers(connection)
+
+    connection.execute(text(_insert_rows("IN (SELECT id FROM record)")))
+    # merge the index segments written by the bulk insert
+    connection.execute(
+        text("INSERT INTO record_search(record_search) VALUES('optimize')")
+    )
+
+
+def create_search_triggers(connection: "sqlalchemy.engine.Connection"):
+    """(Re)creates the triggers of the index and the table of pending records
+    (eg. when the triggers change, cf. migrate_database).
+    """
+    connection.execute(
+        text(
+            "CREATE TABLE IF NOT EXISTS record_search_pending"
+            " (record_id INTEGER PRIMARY KEY)"
+        )
+    )
+    for name, (event_, statements) in _TRIGGERS.items():
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        connection.execute(
+            text(f"CREATE TRIGGER {name} {event_} FOR EACH ROW BEGIN {statements} END")
+        )
+
+
+def drop_search_index(connection: "sqlalchemy.engine.Connection"):
+    """Drops the full-text search index and its triggers (if they exist)."""
+    for name in _TRIGGERS:
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+    connection.execute(text("DROP TABLE IF EXISTS record_search_pending"))
+    connection.execute(text("DROP TABLE IF EXISTS record_search"))
+
+
+def refresh_search_index(connection: "sqlalchemy.engine.Connection"):
+    """Indexes the records noted in record_search_pending (once each).
+    Nothing happens if there is no index.
+    """
+    if not has_search_index(connection):
+        return
+    if connection.execute(text("SELECT 1 FROM record_search_pending LIMIT 1")).first():
+        for statement in _refresh_statements(
+            "IN (SELECT record_id FROM record_search_pending)"
+        ):
+            connection.execute(text(statement))
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_after_flush(session, flush_context):
+    refresh_search_index(session.connection())
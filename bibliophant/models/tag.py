@@ -1,6 +1,11 @@
 """This module defines a class Tag.
 It further defines functions to validate the type and format
 of the class's data members.
+
+The names of the tags are unique. When a session is flushed,
+a new Tag whose name already exists (in the database or among the other
+new tags) is replaced by the existing one in all its records,
+so that eg. record_from_dict can simply create the tags of a record.
 """
 
 __all__ = []
@@ -9,9 +14,10 @@ __all__ = []
 import re
 from typing import Optional
 
-from sqlalchemy.sql.schema import Column, Table, ForeignKey
+from sqlalchemy import event, select
+from sqlalchemy.sql.schema import Column, Table, ForeignKey, Index
 from sqlalchemy.types import Integer, String
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import Session, relationship
 from sqlalchemy.ext.hybrid import hybrid_property
 
 from .base import ModelBase
@@ -55,6 +61,9 @@ tag_association_table = Table(
     ModelBase.metadata,
     Column("tag_id", Integer, ForeignKey("tag.id")),
     Column("record_id", Integer, ForeignKey("record.id")),
+    # a record carries a tag at most once
+    Index("ix_tag_association_tag_record", "tag_id", "record_id", unique=True),
+    Index("ix_tag_association_record_id", "record_id"),
 )
 
 
@@ -65,7 +74,7 @@ class Tag(ModelBase):
 
     id = Column(Integer, primary_key=True)
 
-    _name = Column(String, nullable=False)
+    _name = Column(String, nullable=False, index=True, unique=True)
     _color = Column(String)
 
     records = relationship(
@@ -110,3 +119,27 @@ class Tag(ModelBase):
     @color.setter
     def color(self, value: Optional[str]):
         self._color = validate_color(value)
+
+
+@event.listens_for(Session, "before_flush")
+def _reuse_existing_tags(session, flush_context, instances):
+    """replaces new tags by the existing tags of the same name"""
+    new_tags = [obj for obj in session.new if isinstance(obj, Tag)]
+    if not new_tags:
+        return
+    names = list({tag._name for tag in new_tags})
+    with session.no_autoflush:
+        existing = {
+            tag._name: tag
+            for tag in session.execute(
+                select(Tag).where(Tag._name.in_(names))
+            ).scalars()
+        }
+        for tag in new_tags:
+            canonical = existing.setdefault(tag._name, tag)
+            if canonical is tag:
+                continue
+            for record in list(tag.records):
+                tags = record._tags
+                tags[tags.index(tag)] = canonical
+            session.expunge(tag)
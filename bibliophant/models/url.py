@@ -60,7 +60,7 @@ class Url(ModelBase):
 
     id = Column(Integer, primary_key=True)
 
-    record_id = Column(Integer, ForeignKey("record.id"))
+    record_id = Column(Integer, ForeignKey("record.id"), index=True)
     record = relationship("Record", back_populates="_urls")
 
     _url = Column(String, nullable=False)
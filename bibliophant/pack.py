@@ -0,0 +1,256 @@
+"""This module maintains the pack file of a collection.
+
+Reading the record files one by one costs an open, read and close per
+record. The pack file <root>/bibliophant.pack holds the content of all
+record files in a single file, for tools which need many records quickly
+(eg. completion or a search across collections). A Pack maps the file
+into memory and decodes a record only when it is accessed.
+
+The record files stay the source of truth: update_pack brings the pack
+up to date, reading only the record files whose modification time
+or size changed (cf. sync_collection). The content of unchanged
+records is copied from the old pack.
+
+Layout of the file:
+    b"BIBPACK1"
+    the contents of the record files (as they are on the disk)
+    the index: JSON {"keys": [...], "offsets": [...], "sizes": [...],
+                     "mtimes": [...]} (sorted by key)
+    the offset and size of the index (2 x 8 bytes, little endian)
+    b"BIBPACK1"
+
+example:
+> update_pack(root)
+> with Pack(root) as pack:
+>     record_dict = pack["2020Smith"]
+"""
+
+__all__ = ["PACK_FILE", "Pack", "update_pack"]
+
+
+import json
+import mmap
+import os
+from pathlib import Path
+import struct
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from . import json_codec
+from .misc import atomic_write
+from .record_files import read_record_file, scan_record_folders
+
+
+PACK_FILE = "bibliophant.pack"
+
+_MAGIC = b"BIBPACK1"
+_TRAILER = struct.Struct("<QQ8s")  # offset and size of the index, magic
+
+
+class Pack:
+    """Read-only access to the pack file of a collection (cf. update_pack).
+    Behaves like a mapping from record keys to record dicts;
+    the records are decoded when they are accessed.
+    Raises FileNotFoundError if the pack file does not exist.
+    Raises ValueError if it is not a valid pack file.
+    """
+
+    def __init__(self, root: Union[Path, str]):
+        self.path = Path(root) / PACK_FILE
+        with open(self.path, "rb") as file:
+            try:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f"{self.path} is not a pack file (empty)")
+        try:
+            self._index = self._read_index()
+        except ValueError:
+            self._map.close()
+            raise
+
+    def _read_index(self) -> Dict[str, Tuple[int, int, int]]:
+        """key -> (offset, size, mtime_ns)"""
+        size = len(self._map)
+        if size < len(_MAGIC) + _TRAILER.size or self._map[: len(_MAGIC)] != _MAGIC:
+            raise ValueError(f"{self.path} is not a pack file")
+        index_offset, index_size, magic = _TRAILER.unpack_from(
+            self._map, size - _TRAILER.size
+        )
+        if magic != _MAGIC or index_offset + index_size != size - _TRAILER.size:
+            raise ValueError(f"{self.path} is not a pack file (truncated)")
+        # invalid JSON is a ValueError, too
+        index = json.loads(self._map[index_offset : index_offset + index_size])
+        return {
+            key: (offset, size, mtime_ns)
+            for key, offset, size, mtime_ns in zip(
+                index["keys"], index["offsets"], index["sizes"], index["mtimes"]
+            )
+        }
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        """the keys of the records (sorted)"""
+        return iter(self._index)
+
+    def keys(self) -> Iterable[str]:
+        return self._index.keys()
+
+    def stamp(self, key: str) -> Tuple[int, int]:
+        """Returns the modification time and size of the record file
+        at the time it was packed.
+        Raises KeyError if the record is not in the pack.
+        """
+        _, size, mtime_ns = self._index[key]
+        return mtime_ns, size
+
+    def raw(self, key: str) -> bytes:
+        """Returns the content of the record file.
+        Raises KeyError if the record is not in the pack.
+        """
+        offset, size, _ = self._index[key]
+        return self._map[offset : offset + size]
+
+    def __getitem__(self, key: str) -> Dict:
+        """Returns the record dict (cf. record_from_dict).
+        Raises KeyError if the record is not in the pack.
+        """
+        return json_codec.loads(self.raw(key))
+
+    def get(self, key: str, default: Optional[Dict] = None) -> Optional[Dict]:
+        if key not in self._index:
+            return default
+        return self[key]
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self) -> "Pack":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _open_old_pack(root: Path) -> Optional[Pack]:
+    """the current pack (None if it is missing or damaged)"""
+    try:
+        return Pack(root)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_pack(
+    root: Path, old: Optional[Pack], plan: List[Tuple[str, Optional[str]]]
+) -> List[str]:
+    """Writes a new pack file given the records in it:
+    (key, None) for an unchanged record (copied from the old pack)
+    or (key, path) for a record which is read from its record file.
+    Returns the keys of the record files which vanished in the meantime
+    (they are left out).
+    """
+    vanished = []
+    index: Dict[str, List] = {"keys": [], "offsets": [], "sizes": [], "mtimes": []}
+    with atomic_write(root / PACK_FILE, binary=True) as file:
+        file.write(_MAGIC)
+        position = len(_MAGIC)
+        # unchanged records which follow each other in the old pack
+        # are copied in one go: [start, end) in the old pack
+        run: Optional[List[int]] = None
+        for key, path in plan:
+            if path is None:
+                offset, size, mtime_ns = old._index[key]
+                if run is not None and run[1] == offset:
+                    run[1] += size
+                else:
+                    if run is not None:
+                        file.write(old._map[run[0] : run[1]])
+                    run = [offset, offset + size]
+            else:
+                if run is not None:
+                    file.write(old._map[run[0] : run[1]])
+                    run = None
+                try:
+                    data, stamp = read_record_file(path)
+                except FileNotFoundError:
+                    vanished.append(key)  # removed in the meantime
+                    continue
+                file.write(data)
+                size, mtime_ns = stamp["size"], stamp["mtime_ns"]
+            index["keys"].append(key)
+            index["offsets"].append(position)
+            index["sizes"].append(size)
+            index["mtimes"].append(mtime_ns)
+            position += size
+        if run is not None:
+            file.write(old._map[run[0] : run[1]])
+
+        index_data = json.dumps(index, separators=(",", ":")).encode("utf8")
+        file.write(index_data)
+        file.write(_TRAILER.pack(position, len(index_data), _MAGIC))
+    return vanished
+
+
+def update_pack(
+    root: Union[Path, str], names: Optional[Iterable[str]] = None
+) -> Dict[str, int]:
+    """Creates or updates the pack file of a collection.
+    If names is None, all record folders (and all records of the old pack)
+    are checked.
+    Otherwise only the named record folders (eg. the ones reported
+    by a Watcher) are checked and the other records are kept as they are;
+    a named folder which no longer exists counts as removed.
+    Only the record files whose modification time or size differs
+    from the pack are read. The contents are not validated.
+    The new pack replaces the old one atomically (cf. atomic_write);
+    if nothing changed, the pack file is not touched.
+    Returns the number of added, changed, removed and unchanged records.
+    """
+    root = Path(root)
+    old = _open_old_pack(root)
+    old_keys = set() if old is None else set(old.keys())
+    if names is None:
+        # the records of the old pack whose folder is gone count as removed
+        checked = set(scan_record_folders(root)) | old_keys
+    else:
+        checked = set(names)
+    keys = old_keys | checked
+
+    counts = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+    plan: List[Tuple[str, Optional[str]]] = []
+    try:
+        for key in sorted(keys):
+            path = None
+            if key in checked:
+                path = f"{root}/{key}/{key}.json"
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    if key in old_keys:
+                        counts["removed"] += 1
+                    continue
+                if key in old_keys and old.stamp(key) == (
+                    stat.st_mtime_ns,
+                    stat.st_size,
+                ):
+                    path = None
+            if path is None:
+                counts["unchanged"] += 1
+            else:
+                counts["changed" if key in old_keys else "added"] += 1
+            plan.append((key, path))
+        if old is None or len(plan) != counts["unchanged"] or counts["removed"]:
+            # record files removed between the stat and the read
+            for key in _write_pack(root, old, plan):
+                if key in old_keys:
+                    counts["changed"] -= 1
+                    counts["removed"] += 1
+                else:
+                    counts["added"] -= 1
+    finally:
+        if old is not None:
+            old.close()
+    return counts
@@ -0,0 +1,179 @@
+"""This module maintains the index of the PDF documents in the record folders
+(cf. models/pdf_file.py) and answers questions about them.
+
+update_pdf_index compares the size and modification time of every PDF file
+with the index and hashes (SHA-256) only the files which are new or differ.
+The files are hashed by a pool of threads, which run in parallel
+because hashlib releases the GIL while hashing large blocks.
+
+On top of the index, duplicate_pdfs finds PDF files with the same content
+and records_without_pdf finds the records which have no PDF file,
+each with a single query.
+"""
+
+__all__ = [
+    "scan_pdf_files",
+    "hash_file",
+    "update_pdf_index",
+    "duplicate_pdfs",
+    "records_without_pdf",
+]
+
+
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from itertools import groupby
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import delete, exists, func, select
+
+from .models.pdf_file import pdf_file_table
+from .models.record import Record
+from .record_files import scan_record_folders
+
+
+# size of the blocks read by hash_file
+_BLOCK_SIZE = 1 << 20
+
+# keep the number of bound parameters per statement well below SQLite's limit
+_CHUNK_SIZE = 500
+
+
+def scan_pdf_files(root: Union[Path, str]) -> List[str]:
+    """Returns the paths of the PDF files in the record folders
+    relative to the root folder of a collection ('<key>/<title>.pdf', sorted).
+    """
+    paths = []
+    for name in scan_record_folders(root):
+        with os.scandir(f"{root}/{name}") as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(".pdf") and entry.is_file():
+                    paths.append(f"{name}/{entry.name}")
+    paths.sort()
+    return paths
+
+
+def hash_file(path: Union[Path, str]) -> str:
+    """Returns the SHA-256 hash of the content of a file (hex digest).
+    The file is read in blocks of 1 MiB.
+    """
+    digest = sha256()
+    buffer = bytearray(_BLOCK_SIZE)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as file:
+        while True:
+            size = file.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+    return digest.hexdigest()
+
+
+def _stamp_file(root: str, path: str) -> Dict:
+    """a row of the index for a PDF file (in a worker thread)"""
+    full_path = f"{root}/{path}"
+    stat = os.stat(full_path)
+    return {
+        "path": path,
+        "key": path.split("/", 1)[0],
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": hash_file(full_path),
+    }
+
+
+def update_pdf_index(
+    session: "sqlalchemy.orm.session.Session",
+    root: Union[Path, str],
+    workers: Optional[int] = None,
+) -> Tuple[Dict[str, int], Dict[str, str]]:
+    """Brings the index of the PDF files in the record folders up to date.
+    Only the files whose size or modification time differs from the index
+    are hashed, by workers threads (default: 8).
+    Files which no longer exist are removed from the index.
+    Returns the number of added, changed, removed and unchanged files
+    and the errors (path -> message) of the files which could not be read.
+    """
+    table = pdf_file_table
+    indexed = {
+        path: (size, mtime_ns)
+        for path, size, mtime_ns in session.execute(
+            select(table.c.path, table.c.size, table.c.mtime_ns)
+        )
+    }
+
+    present = set()
+    candidates = []
+    for path in scan_pdf_files(root):
+        try:
+            stat = os.stat(f"{root}/{path}")
+        except FileNotFoundError:
+            continue
+        present.add(path)
+        if indexed.get(path) != (stat.st_size, stat.st_mtime_ns):
+            candidates.append(path)
+
+    stamps, errors = [], {}
+    with ThreadPoolExecutor(max_workers=workers or 8) as executor:
+        futures = [executor.submit(_stamp_file, str(root), path) for path in candidates]
+        for path, future in zip(candidates, futures):
+            try:
+                stamps.append(future.result())
+            except OSError as error:
+                errors[path] = error.strerror or str(error)
+
+    removed = [path for path in indexed if path not in present]
+    replaced = removed + [stamp["path"] for stamp in stamps]
+    for i in range(0, len(replaced), _CHUNK_SIZE):
+        session.execute(
+            delete(table).where(table.c.path.in_(replaced[i : i + _CHUNK_SIZE]))
+        )
+    if stamps:
+        session.execute(table.insert(), stamps)
+
+    added = sum(1 for stamp in stamps if stamp["path"] not in indexed)
+    counts = {
+        "added": added,
+        "changed": len(stamps) - added,
+        "removed": len(removed),
+        "unchanged": len(present) - len(candidates),
+    }
+    return counts, errors
+
+
+def duplicate_pdfs(session: "sqlalchemy.orm.session.Session") -> List[List[str]]:
+    """Returns the groups of PDF files (paths as in the index)
+    which have the same content, according to the index.
+    """
+    table = pdf_file_table
+    duplicated = (
+        select(table.c.sha256)
+        .group_by(table.c.sha256)
+        .having(func.count() > 1)
+        .scalar_subquery()
+    )
+    rows = session.execute(
+        select(table.c.sha256, table.c.path)
+        .where(table.c.sha256.in_(duplicated))
+        .order_by(table.c.sha256, table.c.path)
+    )
+    return [
+        [path for _, path in group] for _, group in groupby(rows, lambda row: row[0])
+    ]
+
+
+def records_without_pdf(session: "sqlalchemy.orm.session.Session") -> List[str]:
+    """Returns the keys of the records (sorted) which have no PDF file
+    in their record folder, according to the index.
+    """
+    record = Record.__table__
+    table = pdf_file_table
+    return list(
+        session.execute(
+            select(record.c._key)
+            .where(~exists().where(table.c.key == record.c._key))
+            .order_by(record.c._key)
+        ).scalars()
+    )
@@ -0,0 +1,100 @@
+"""This module contains functions for reading the record files of a collection.
+
+Every record folder <root>/<key> contains the file <key>.json
+(cf. json_io.store_record). The functions work with plain data only,
+so that they can be used in worker processes (cf. reindex_collection).
+
+Next to the content of a record file, its stamp is returned:
+a row of the manifest record_file_table with the path of the file
+(relative to the root folder), its modification time, size and content hash.
+"""
+
+__all__ = [
+    "scan_record_folders",
+    "scan_record_files",
+    "manifest_path",
+    "record_file_stamp",
+    "read_record_file",
+    "parse_record_file",
+    "load_record_file",
+]
+
+
+from hashlib import blake2b
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+from .bulk import PreparedRecord, prepare_record
+from .json_codec import loads
+
+
+def scan_record_folders(root: Union[Path, str]) -> List[str]:
+    """Returns the names of all record folders (ie. the keys)
+    in the root folder of a collection (sorted).
+    Hidden folders (eg. '.git') are skipped.
+    """
+    names = []
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if not entry.name.startswith(".") and entry.is_dir():
+                names.append(entry.name)
+    names.sort()
+    return names
+
+
+def scan_record_files(root: Union[Path, str]) -> List[str]:
+    """Returns the paths of the JSON files of all record folders
+    in the root folder of a collection (sorted by key).
+    Whether the files exist is not checked.
+    """
+    return [f"{root}/{name}/{name}.json" for name in scan_record_folders(root)]
+
+
+def manifest_path(path: str) -> str:
+    """the path of a record file as stored in the manifest
+    ('/root/key/key.json' -> 'key/key.json')
+    """
+    return os.path.basename(os.path.dirname(path)) + "/" + os.path.basename(path)
+
+
+def record_file_stamp(path: str, data: bytes, stat: os.stat_result) -> Dict:
+    """Returns the stamp of a record file given its content and stat."""
+    return {
+        "path": manifest_path(path),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "hash": blake2b(data, digest_size=16).hexdigest(),
+    }
+
+
+def read_record_file(path: str) -> Tuple[bytes, Dict]:
+    """Returns the content of a record file and its stamp.
+    Raises FileNotFoundError if the file does not exist.
+    """
+    with open(path, "rb") as file:
+        stat = os.fstat(file.fileno())
+        data = file.read()
+    return data, record_file_stamp(path, data, stat)
+
+
+def parse_record_file(path: str, data: bytes) -> PreparedRecord:
+    """Parses and validates the content of a record file.
+    Raises ValueError if it is not a valid record
+    or its key is not the name of the record folder.
+    """
+    record = prepare_record(loads(data))  # invalid JSON is a ValueError, too
+    folder_name = os.path.basename(os.path.dirname(path))
+    if record.key != folder_name:
+        raise ValueError(f"the key {record.key} does not match the record folder")
+    return record
+
+
+def load_record_file(path: str) -> Tuple[PreparedRecord, Dict]:
+    """Reads, parses and validates a record file.
+    Returns the PreparedRecord and the stamp of the file.
+    Raises FileNotFoundError if the file does not exist.
+    Raises ValueError if it is not a valid record (cf. parse_record_file).
+    """
+    data, stamp = read_record_file(path)
+    return parse_record_file(path, data), stamp
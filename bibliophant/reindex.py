@@ -0,0 +1,133 @@
+"""This module rebuilds the database of a collection from its record folders.
+
+Every record folder <root>/<key> contains the file <key>.json
+(cf. json_io.store_record), so the database can always be recreated
+from the files, eg. after it was corrupted or after a git checkout.
+
+The JSON files are parsed and validated (cf. bulk.prepare_record)
+in a pool of worker processes and the results are inserted
+with bulk_add_prepared into a new database file,
+which replaces bibliophant.db only when it is complete.
+The manifest of the record files is rebuilt as well,
+so that a following sync_collection has nothing to do.
+
+example:
+> n_records, errors = reindex_collection(resolve_root("~/my_collection"))
+"""
+
+__all__ = ["reindex_collection"]
+
+
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from .bulk import EntityCache, PreparedRecord, bulk_add_prepared
+from .misc import ordered_map
+from .models.base import init_database
+from .models.record_file import record_file_table
+from .models.search_index import create_search_index, drop_search_index
+from .record_files import load_record_file, scan_record_files
+
+
+# the files which belong to the database file of a collection
+_DATABASE_FILE = "bibliophant.db"
+_DATABASE_SIDE_FILES = ("-journal", "-wal", "-shm")
+
+
+def _prepare_files(
+    paths: List[str],
+) -> Tuple[List[PreparedRecord], List[Dict], Dict[str, str]]:
+    """parses and validates a chunk of record files (in a worker process)"""
+    prepared, stamps, errors = [], [], {}
+    for path in paths:
+        folder_name = os.path.basename(os.path.dirname(path))
+        try:
+            record, stamp = load_record_file(path)
+        except FileNotFoundError:
+            errors[folder_name] = "the record file was not found"
+            continue
+        except ValueError as error:
+            errors[folder_name] = str(error)
+            continue
+        prepared.append(record)
+        stamps.append(stamp)
+    return prepared, stamps, errors
+
+
+def _remove_side_files(database_file: Path):
+    for suffix in _DATABASE_SIDE_FILES:
+        database_file.with_name(database_file.name + suffix).unlink(missing_ok=True)
+
+
+def _remove_database(database_file: Path):
+    """removes a database file and its journal files"""
+    _remove_side_files(database_file)
+    database_file.unlink(missing_ok=True)
+
+
+def reindex_collection(
+    root: Union[Path, str],
+    workers: Optional[int] = None,
+    chunk_size: int = 1000,
+) -> Tuple[int, Dict[str, str]]:
+    """Rebuilds the database of a collection from the JSON files
+    in its record folders (cf. record_files.scan_record_files).
+    The files are parsed and validated in chunks of chunk_size
+    by workers processes (default: the number of CPUs).
+    Record folders whose JSON file is missing or invalid are skipped.
+    The new database replaces bibliophant.db once it is complete;
+    if anything goes wrong, the old database file is left untouched.
+    No other process may use the collection meanwhile and
+    the engine of the collection must be stopped (cf. stop_engine).
+    Returns the number of records and the errors (folder name -> message).
+    Raises ValueError if two records have the same key.
+    """
+    root = Path(root)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    paths = scan_record_files(root)
+    chunks = [paths[i : i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    if workers > 1:
+        results: Iterator = ordered_map(_prepare_files, chunks, workers)
+    else:
+        results = map(_prepare_files, chunks)
+
+    database_file = root / _DATABASE_FILE
+    temporary_file = root / (_DATABASE_FILE + ".reindex")
+    _remove_database(temporary_file)
+    n_records, errors = 0, {}
+    engine = create_engine("sqlite:///" + str(temporary_file))
+    try:
+        init_database(engine)
+        with Session(bind=engine) as session:
+            # the file is thrown away if the process crashes
+            session.execute(text("PRAGMA synchronous = OFF"))
+            # indexing all records at once is a lot faster than
+            # indexing them one by one with the triggers
+            drop_search_index(session.connection())
+            cache = EntityCache()
+            for prepared, stamps, chunk_errors in results:
+                errors.update(chunk_errors)
+                n_records += bulk_add_prepared(session, prepared, chunk_size, cache)
+                if stamps:
+                    session.execute(record_file_table.insert(), stamps)
+            create_search_index(session.connection())
+            session.commit()
+    except BaseException:
+        engine.dispose()
+        _remove_database(temporary_file)
+        raise
+    engine.dispose()
+    # the database was written without syncing, make it durable before the rename
+    with open(temporary_file, "rb") as file:
+        os.fsync(file.fileno())
+
+    # stale journal files of the old database must not be applied to the new one
+    _remove_side_files(database_file)
+    os.replace(temporary_file, database_file)
+    return n_records, errors
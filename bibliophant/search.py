@@ -0,0 +1,175 @@
+"""This module implements the full-text search over the records.
+
+It uses the FTS5 index 'record_search' (cf. models/search_index.py)
+and falls back to a (slow) LIKE scan over the same fields
+if the SQLite library does not provide FTS5.
+"""
+
+__all__ = ["SEARCH_FIELDS", "search_records"]
+
+
+from typing import List, Optional, Sequence
+
+from sqlalchemy import and_, column, exists, or_, select, table, text
+
+from .db_shortcuts import select_records
+from .models import Article, Author, Journal, Record
+from .models.author import author_association_table
+from .models.search_index import (
+    SEARCH_COLUMNS,
+    has_search_index,
+    refresh_search_index,
+)
+
+
+SEARCH_FIELDS = SEARCH_COLUMNS
+
+_search_table = table("record_search", column("rowid"))
+
+# bm25 weights of the SEARCH_FIELDS; a hit in the title counts the most
+_WEIGHTS = {"title": 10.0, "abstract": 1.0, "note": 1.0, "authors": 5.0, "journal": 2.0}
+
+
+def _match_expression(query: str, fields: Sequence[str]) -> Optional[str]:
+    """Turns the words of a user query into an FTS5 query
+    that matches records containing all words.
+    The last word and words ending with '*' are matched as prefixes.
+    Returns None if the query contains no words.
+    """
+    words = [word for word in query.split() if word.strip('"*')]
+    if not words:
+        return None
+    terms = []
+    for i, word in enumerate(words):
+        prefix = word.endswith("*") or i == len(words) - 1
+        word = word.rstrip("*").replace('"', '""')
+        terms.append(f'"{word}"*' if prefix else f'"{word}"')
+    expression = " ".join(terms)
+    if list(fields) != list(SEARCH_FIELDS):
+        expression = "{" + " ".join(fields) + "} : (" + expression + ")"
+    return expression
+
+
+def _exists(subquery, *tables):
+    """EXISTS of the subquery; its tables are not correlated with the
+    (polymorphic) query of the records, which may contain them as well
+    """
+    return exists(subquery.correlate_except(*tables))
+
+
+def _like_condition(field: str, pattern: str):
+    """condition on a record: the field (as in the search index)
+    contains the LIKE pattern
+    """
+    if field == "title":
+        return Record._title.ilike(pattern, escape="\\")
+    if field == "note":
+        return Record._note.ilike(pattern, escape="\\")
+    article = Article.__table__
+    if field == "abstract":
+        return _exists(
+            select(article.c.id).where(
+                article.c.id == Record.id,
+                article.c._abstract.ilike(pattern, escape="\\"),
+            ),
+            article,
+        )
+    if field == "journal":
+        journal = Journal.__table__
+        return _exists(
+            select(article.c.id)
+            .join(journal, journal.c.id == article.c.journal_id)
+            .where(
+                article.c.id == Record.id,
+                journal.c._name.ilike(pattern, escape="\\"),
+            ),
+            article,
+            journal,
+        )
+    # authors
+    author = Author.__table__
+    association = author_association_table
+    return _exists(
+        select(association.c.id)
+        .join(author, author.c.id == association.c.author_id)
+        .where(
+            association.c.record_id == Record.id,
+            or_(
+                author.c._last.ilike(pattern, escape="\\"),
+                author.c._first.ilike(pattern, escape="\\"),
+            ),
+        ),
+        association,
+        author,
+    )
+
+
+def _like_search(
+    session: "sqlalchemy.orm.session.Session",
+    query: str,
+    fields: Sequence[str],
+    limit: Optional[int],
+    profile: str,
+) -> List[Record]:
+    """fallback if there is no full-text search index"""
+    conditions = []
+    for word in query.split():
+        pattern = (
+            "%"
+            + word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            + "%"
+        )
+        conditions.append(or_(*(_like_condition(field, pattern) for field in fields)))
+    if not conditions:
+        return []
+    statement = (
+        select_records(profile).where(and_(*conditions)).order_by(Record.id.desc())
+    )
+    if limit is not None:
+        statement = statement.limit(limit)
+    return list(session.execute(statement).scalars())
+
+
+def search_records(
+    session: "sqlalchemy.orm.session.Session",
+    query: str,
+    fields: Optional[Sequence[str]] = None,
+    limit: Optional[int] = None,
+    profile: str = "summary",
+) -> List[Record]:
+    """Finds the records which contain all words of the query
+    (case- and accent-insensitively; the last word may be incomplete).
+    The search can be restricted to some of the SEARCH_FIELDS.
+    The records are returned with the best matches first
+    and loaded according to the loading profile (cf. select_records).
+    Raises ValueError if a field or the profile is unknown.
+    """
+    if fields is None:
+        fields = SEARCH_FIELDS
+    for field in fields:
+        if field not in SEARCH_FIELDS:
+            raise ValueError(
+                f"cannot search the field '{field}' (choose from {', '.join(SEARCH_FIELDS)})"
+            )
+
+    session.flush()  # make pending changes visible to the index
+
+    if not has_search_index(session.connection()):
+        return _like_search(session, query, fields, limit, profile)
+    # records noted by plain SQL statements (eg. of bulk_add_records)
+    refresh_search_index(session.connection())
+
+    expression = _match_expression(query, fields)
+    if expression is None:
+        return []
+
+    weights = ", ".join(str(_WEIGHTS[name]) for name in SEARCH_COLUMNS)
+    statement = (
+        select_records(profile)
+        .join(_search_table, _search_table.c.rowid == Record.id)
+        .where(text("record_search MATCH :expression"))
+        .order_by(text(f"bm25(record_search, {weights})"))
+    )
+    if limit is not None:
+        statement = statement.limit(limit)
+    return list(session.execute(statement, {"expression": expression}).scalars())
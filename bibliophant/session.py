@@ -11,18 +11,31 @@ example:
 > root = resolve_root("./my_collection")
 > start_engine(root)
 
+start_engine optionally takes a SQLite performance profile,
+which is either the name of one of the profiles in SQLITE_PROFILES
+or a dict such as {"profile": "performance", "cache_size": -131072}.
+The PRAGMAs of the profile are applied to every new database connection.
+
 after having done this you can always use session_scope to talk to the db:
 > with session_scope() as s:
 >     records = s.query(Record).all()
 """
 
-__all__ = ["resolve_root", "start_engine", "session_scope"]
+__all__ = [
+    "resolve_root",
+    "start_engine",
+    "stop_engine",
+    "session_scope",
+    "SQLITE_PROFILES",
+    "resolve_sqlite_profile",
+]
 
 
 from pathlib import Path
 from contextlib import contextmanager
+from typing import Dict, Optional, Union
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 
@@ -42,23 +55,126 @@ def resolve_root(root_folder: str) -> Path:
     return root
 
 
+# PRAGMAs which are applied to every connection of an engine
+# "default" leaves SQLite's own defaults untouched
+# "performance" allows concurrent readers and one writer (WAL journal)
+# and trades a bit of durability on power loss for much faster commits
+SQLITE_PROFILES = {
+    "default": {},
+    "safe": {"journal_mode": "WAL", "synchronous": "FULL", "busy_timeout": 10000},
+    "performance": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,  # negative values are KiB, i.e. 64 MiB
+        "mmap_size": 268435456,  # 256 MiB
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,  # milliseconds
+    },
+}
+
+
+_PRAGMA_CHOICES = {
+    "journal_mode": ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"),
+    "synchronous": ("OFF", "NORMAL", "FULL", "EXTRA"),
+    "temp_store": ("DEFAULT", "FILE", "MEMORY"),
+}
+
+_INTEGER_PRAGMAS = ("cache_size", "mmap_size", "busy_timeout")
+
+
+def resolve_sqlite_profile(profile: Optional[Union[str, Dict]] = None) -> Dict:
+    """Returns the PRAGMAs (name -> value) of a SQLite performance profile.
+    profile can be None (-> "default"), the name of a profile in SQLITE_PROFILES,
+    or a dict with an optional "profile" entry naming the base profile
+    and further entries overriding individual PRAGMAs.
+    Raises ValueError if the profile or one of its PRAGMAs is invalid.
+    """
+    if profile is None:
+        profile = "default"
+
+    if isinstance(profile, str):
+        profile = {"profile": profile}
+
+    if not isinstance(profile, dict):
+        raise ValueError("the SQLite profile must be a str or a dict")
+
+    overrides = profile.copy()
+    name = overrides.pop("profile", "default")
+    try:
+        pragmas = SQLITE_PROFILES[name].copy()
+    except (KeyError, TypeError):
+        raise ValueError(
+            f"the SQLite profile '{name}' is not one of "
+            + ", ".join(SQLITE_PROFILES.keys())
+        )
+
+    for pragma, value in overrides.items():
+        if pragma in _PRAGMA_CHOICES:
+            if not (
+                isinstance(value, str) and value.upper() in _PRAGMA_CHOICES[pragma]
+            ):
+                raise ValueError(
+                    f"the PRAGMA {pragma} must be one of "
+                    + ", ".join(_PRAGMA_CHOICES[pragma])
+                )
+            value = value.upper()
+        elif pragma in _INTEGER_PRAGMAS:
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise ValueError(f"the PRAGMA {pragma} must be an int")
+        else:
+            raise ValueError(f"the PRAGMA {pragma} is not supported")
+        pragmas[pragma] = value
+
+    return pragmas
+
+
+def _create_engine(sqlite_file: Path, pragmas: Dict) -> "sqlalchemy.engine.Engine":
+    """Creates an engine which applies the given PRAGMAs to every new connection."""
+    engine = create_engine("sqlite:///" + str(sqlite_file))
+
+    if pragmas:
+
+        @event.listens_for(engine, "connect")
+        def apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            # busy_timeout goes first so that it already applies to
+            # switching the journal mode while another process holds a lock
+            for pragma in sorted(pragmas, key=lambda p: p != "busy_timeout"):
+                cursor.execute(f"PRAGMA {pragma} = {pragmas[pragma]}")
+            cursor.close()
+
+    return engine
+
+
 _session_factory = sessionmaker()
 
 
-def start_engine(root: Path, create_db: bool = False):
+def start_engine(
+    root: Path,
+    create_db: bool = False,
+    profile: Optional[Union[str, Dict]] = None,
+):
     """Creates an engine for the collection's database.
     The engine is then bound to the session factory,
     which can be used via the context manager 'session_scope'.
     Raises FileNotFoundError if root does not contain a database file.
     If create_db is set, no error is raised and the database file is
     initialized instead.
+    An existing database file is upgraded to the current schema version.
+    The SQLite performance profile is resolved by resolve_sqlite_profile.
+    Raises ValueError if the profile is invalid or the database
+    cannot be migrated.
     """
+    pragmas = resolve_sqlite_profile(profile)
     sqlite_file = root / "bibliophant.db"
     if sqlite_file.is_file():
-        engine = create_engine("sqlite:///" + str(sqlite_file))
+        engine = _create_engine(sqlite_file, pragmas)
+        from .models.base import migrate_database
+
+        migrate_database(engine)
     else:
         if create_db:
-            engine = create_engine("sqlite:///" + str(sqlite_file))
+            engine = _create_engine(sqlite_file, pragmas)
             from .models.base import init_database
 
             init_database(engine)
@@ -69,6 +185,17 @@ def start_engine(root: Path, create_db: bool = False):
     _session_factory.configure(bind=engine)
 
 
+def stop_engine():
+    """Closes all database connections of the engine started by start_engine
+    (eg. before the database file is replaced, cf. reindex_collection).
+    Call start_engine again before using session_scope.
+    """
+    engine = _session_factory.kw.get("bind")
+    if engine is not None:
+        engine.dispose()
+    _session_factory.configure(bind=None)
+
+
 @contextmanager
 def session_scope() -> "Iterator[sqlalchemy.orm.session.Session]":
     """Provide a transactional scope around a series of operations."""
@@ -12,6 +12,7 @@ $ bib ipython
 import sys
 import json
 
+
 if len(sys.argv) == 3:
     sys.path.insert(0, sys.argv[2])
 
@@ -27,14 +28,36 @@ from bibliophant.models import (
     Tag,
     Url,
 )
-from bibliophant.json_io import record_from_dict, store_record, load_record
+from bibliophant.json_io import (
+    record_from_dict,
+    store_record,
+    store_records,
+    load_record,
+)
+from bibliophant.bulk import bulk_add_records
+from bibliophant.fsck import check_collection
+from bibliophant.pack import Pack, update_pack
+from bibliophant.pdf_index import (
+    update_pdf_index,
+    duplicate_pdfs,
+    records_without_pdf,
+)
+from bibliophant.reindex import reindex_collection
+from bibliophant.sync import sync_collection
+from bibliophant.search import search_records
 from bibliophant.importers.crossref import doi_to_record
-from bibliophant.importers.arxiv import arxiv_id_to_record, download_arxiv_eprint
+from bibliophant.importers.arxiv import (
+    arxiv_id_to_record,
+    arxiv_ids_to_records,
+    download_arxiv_eprint,
+)
 from bibliophant.exporters.bibtex import (
     record_to_bibtex,
     records_to_bibfile,
     collection_to_bibfile,
 )
+from bibliophant.exporters.incremental import update_bibfile
+from bibliophant.exporters.pipeline import export_records, collection_to_files
 
 from bibliophant.misc import *
 from bibliophant.db_shortcuts import *
@@ -0,0 +1,175 @@
+"""This module keeps the database in sync with the record folders.
+
+The record files can be changed by other means than bibliophant,
+eg. by a git pull. sync_collection applies such changes to the database.
+It compares the modification time and size of every record file
+with the manifest (cf. models/record_file.py) and reads only the files
+which differ. Files whose content hash is unchanged are not parsed.
+Thus, apart from one stat per record folder, the time spent grows
+with the number of changed files, not with the size of the collection.
+(The first sync of a collection without manifest reads all files;
+reindex_collection creates the manifest, too.)
+The record files written by bibliophant itself (cf. json_io.store_records)
+are stamped when they are written, so a sync skips them.
+
+Changed records are updated in place (cf. bulk_update_prepared),
+so they keep their ids and creation dates.
+"""
+
+__all__ = ["sync_collection", "sync_record_folders", "stamp_record_files"]
+
+
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from sqlalchemy import delete, select
+
+from .bulk import EntityCache, bulk_add_prepared, bulk_update_prepared
+from .db_shortcuts import delete_keys, exists_keys
+from .models.record_file import record_file_table
+from .record_files import (
+    manifest_path,
+    parse_record_file,
+    read_record_file,
+    scan_record_folders,
+)
+
+
+# keep the number of bound parameters per statement well below SQLite's limit
+_CHUNK_SIZE = 500
+
+
+def _delete_stamps(session, paths: List[str]):
+    table = record_file_table
+    for i in range(0, len(paths), _CHUNK_SIZE):
+        session.execute(
+            delete(table).where(table.c.path.in_(paths[i : i + _CHUNK_SIZE]))
+        )
+
+
+def stamp_record_files(session: "sqlalchemy.orm.session.Session", stamps: List[Dict]):
+    """Stores the stamps (cf. read_record_file) of record files in the manifest,
+    ie. marks their current content as applied to the database.
+    """
+    _delete_stamps(session, [stamp["path"] for stamp in stamps])
+    if stamps:
+        session.execute(record_file_table.insert(), stamps)
+
+
+def _key_of(path: str) -> str:
+    """'key/key.json' -> 'key'"""
+    return path.split("/", 1)[0]
+
+
+def _load_manifest(session, paths: Optional[List[str]] = None) -> Dict[str, Tuple]:
+    """the stamps of the given (or all) record files"""
+    table = record_file_table
+    statement = select(table.c.path, table.c.mtime_ns, table.c.size, table.c.hash)
+    if paths is None:
+        chunks = [statement]
+    else:
+        chunks = [
+            statement.where(table.c.path.in_(paths[i : i + _CHUNK_SIZE]))
+            for i in range(0, len(paths), _CHUNK_SIZE)
+        ]
+    manifest = {}
+    for chunk in chunks:
+        for path, mtime_ns, size, hash_ in session.execute(chunk):
+            manifest[path] = (mtime_ns, size, hash_)
+    return manifest
+
+
+def _apply_changes(
+    session, root: Union[Path, str], names: Iterable[str], manifest: Dict[str, Tuple]
+) -> Tuple[Dict[str, int], Dict[str, str]]:
+    """Checks the record files of the named folders against the manifest
+    and applies the changes; the files in the manifest which are not
+    in the named folders count as removed.
+    """
+    # cheap checks first: a file whose stat matches the manifest is unchanged
+    present = set()
+    candidates = []
+    for name in names:
+        path = f"{root}/{name}/{name}.json"
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        relative_path = f"{name}/{name}.json"  # cf. manifest_path
+        present.add(relative_path)
+        old = manifest.get(relative_path)
+        if old is None or old[:2] != (stat.st_mtime_ns, stat.st_size):
+            candidates.append(path)
+
+    prepared, stamps, errors = [], [], {}
+    for path in candidates:
+        folder_name = _key_of(manifest_path(path))
+        try:
+            data, stamp = read_record_file(path)
+            old = manifest.get(stamp["path"])
+            if old is None or old[2] != stamp["hash"]:
+                prepared.append(parse_record_file(path, data))
+        except (FileNotFoundError, ValueError) as error:
+            errors[folder_name] = str(error)
+            continue
+        stamps.append(stamp)
+
+    removed = [path for path in manifest if path not in present]
+    keys = [record.key for record in prepared]
+    existing = exists_keys(session, keys)
+
+    delete_keys(session, [_key_of(path) for path in removed])
+    cache = EntityCache()
+    bulk_update_prepared(
+        session, [record for record in prepared if record.key in existing], cache=cache
+    )
+    bulk_add_prepared(
+        session,
+        [record for record in prepared if record.key not in existing],
+        cache=cache,
+    )
+    _delete_stamps(session, removed)
+    stamp_record_files(session, stamps)
+
+    counts = {
+        "added": len(keys) - len(existing),
+        "changed": len(existing),
+        "removed": len(removed),
+        "unchanged": len(present) - len(keys) - len(errors),
+    }
+    return counts, errors
+
+
+def sync_collection(
+    session: "sqlalchemy.orm.session.Session", root: Union[Path, str]
+) -> Tuple[Dict[str, int], Dict[str, str]]:
+    """Applies the changes of the record files in the root folder
+    of a collection to the database:
+    records whose record folder was removed are deleted,
+    records whose record file was added are inserted
+    and records whose record file changed are updated.
+    Everything happens in the transaction of the session,
+    so either all changes are applied or none (if it is rolled back).
+    Record files which cannot be parsed are skipped
+    (and read again by the next sync).
+    Returns the number of added, changed, removed and unchanged records
+    and the errors (folder name -> message).
+    Raises ValueError if the records cannot be inserted (cf. bulk_add_records).
+    """
+    manifest = _load_manifest(session)
+    return _apply_changes(session, root, scan_record_folders(root), manifest)
+
+
+def sync_record_folders(
+    session: "sqlalchemy.orm.session.Session",
+    root: Union[Path, str],
+    names: Iterable[str],
+) -> Tuple[Dict[str, int], Dict[str, str]]:
+    """Like sync_collection, but only the named record folders
+    (eg. the ones reported by a Watcher) are checked.
+    A named folder which no longer exists counts as removed.
+    """
+    names = sorted(set(names))
+    manifest = _load_manifest(session, [f"{name}/{name}.json" for name in names])
+    return _apply_changes(session, root, names, manifest)
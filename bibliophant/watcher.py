@@ -0,0 +1,313 @@
+"""This module keeps the database live while the record folders
+are changed by other tools (an editor, git, a file synchronizer, ...).
+
+A Watcher runs in a background thread. It learns which record folders
+changed either from inotify (on Linux, through ctypes) or, where inotify
+is not available, by polling the modification times of the record files.
+Changes are debounced: once no further change was seen for a moment,
+the changed folders are applied in one batch with sync_record_folders,
+ie. with the same validation as bulk_add_records and record_from_dict.
+
+While bibliophant writes record files itself (store_records during an
+import, reindexing, ...) the watcher must be paused, otherwise it could
+apply a half written collection. The files written are stamped in the
+manifest, so their events are skipped (after a stat) once resumed.
+
+example:
+> watcher = Watcher(root)
+> watcher.start()
+> ...
+> watcher.apply_pending()  # catch up before a query
+> ...
+> with watcher.paused():  # while bibliophant writes record files itself
+>     store_records(records, root)
+> ...
+> watcher.stop()
+"""
+
+__all__ = ["Watcher"]
+
+
+from contextlib import contextmanager
+import ctypes
+import ctypes.util
+import errno
+import os
+from pathlib import Path
+import select
+import struct
+import threading
+import time
+from typing import Dict, Iterator, Optional, Set, Tuple, Union
+
+from .record_files import scan_record_folders
+from .session import session_scope
+from .sync import sync_collection, sync_record_folders
+
+
+# inotify constants (cf. <sys/inotify.h>)
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_ISDIR = 0x40000000
+_IN_Q_OVERFLOW = 0x00004000
+
+_ROOT_MASK = _IN_CREATE | _IN_DELETE | _IN_MOVED_FROM | _IN_MOVED_TO
+_FOLDER_MASK = _IN_CLOSE_WRITE | _IN_CREATE | _IN_DELETE | _IN_MOVED_FROM | _IN_MOVED_TO
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class _Inotify:
+    """reports the record folders in which something changed (Linux only)"""
+
+    def __init__(self, root: Path):
+        name = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._root = root
+        self._folders = {}  # watch descriptor -> folder name (None for root)
+        try:
+            self._add_watch(None)
+            for name in scan_record_folders(root):
+                self._add_watch(name)
+        except OSError:
+            os.close(self._fd)
+            raise
+
+    def _add_watch(self, name: Optional[str]):
+        path = self._root if name is None else self._root / name
+        mask = _ROOT_MASK if name is None else _FOLDER_MASK
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if name is not None and error == errno.ENOENT:
+                return  # removed again in the meantime
+            # ENOSPC: too many folders for fs.inotify.max_user_watches
+            raise OSError(error, f"cannot watch {path}")
+        self._folders[wd] = name
+
+    def wait(self, timeout: float) -> Optional[Set[str]]:
+        """Returns the names of the changed record folders (after at most
+        timeout seconds) or None if events were lost (a rescan is needed).
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed = set()
+        overflow = False
+        while True:
+            try:
+                buffer = os.read(self._fd, 1 << 16)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+                offset += _EVENT_HEADER.size
+                name = (
+                    buffer[offset : offset + length]
+                    .rstrip(b"\0")
+                    .decode("utf8", "surrogateescape")
+                )
+                offset += length
+                if mask & _IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                folder = self._folders.get(wd, "")
+                if folder is None:
+                    # an event in the root folder: a record folder was added,
+                    # (re)moved or renamed
+                    if not (mask & _IN_ISDIR) or name.startswith("."):
+                        continue
+                    if mask & (_IN_CREATE | _IN_MOVED_TO):
+                        try:
+                            self._add_watch(name)
+                        except OSError:
+                            overflow = True  # changes in the folder might be missed
+                    changed.add(name)
+                elif folder and name == folder + ".json":
+                    changed.add(folder)
+        return None if overflow else changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+class _Poller:
+    """reports the record folders whose record file changed by comparing
+    the modification times and sizes (fallback where inotify is missing)
+    """
+
+    def __init__(self, root: Path, interval: float):
+        self._root = root
+        self._interval = interval
+        self._stamps = self._scan()
+        self._next_scan = time.monotonic() + interval
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        stamps = {}
+        for name in scan_record_folders(self._root):
+            try:
+                stat = os.stat(f"{self._root}/{name}/{name}.json")
+            except FileNotFoundError:
+                continue
+            stamps[name] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def wait(self, timeout: float) -> Optional[Set[str]]:
+        """Returns the names of the changed record folders
+        (after at most timeout seconds).
+        """
+        remaining = self._next_scan - time.monotonic()
+        if remaining > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(remaining, 0))
+        self._next_scan = time.monotonic() + self._interval
+        stamps = self._scan()
+        changed = {
+            name
+            for name in stamps.keys() | self._stamps.keys()
+            if stamps.get(name) != self._stamps.get(name)
+        }
+        self._stamps = stamps
+        return changed
+
+    def close(self):
+        pass
+
+
+class Watcher:
+    """Applies the changes of the record folders in the root folder
+    of a collection to its database, in a background thread.
+    Changes are applied once no further change was seen for debounce seconds.
+    inotify is used if available (and use_inotify is True),
+    otherwise the record files are checked every poll_interval seconds.
+    start_engine must have been called for the collection.
+    """
+
+    def __init__(
+        self,
+        root: Union[Path, str],
+        debounce: float = 0.5,
+        poll_interval: float = 2.0,
+        use_inotify: bool = True,
+    ):
+        self.root = Path(root)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.backend = None  # "inotify" or "polling" once started
+        self.errors = {}  # record files which could not be applied
+        self._pending = set()
+        self._rescan = True  # a full sync is needed (at start and after overflows)
+        self._last_change = 0.0
+        self._pauses = 0  # number of active paused() blocks
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts watching in a background thread.
+        Changes made before the start are picked up by an initial sync.
+        """
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="bibliophant-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stops the background thread (pending changes are not applied)."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def apply_pending(self) -> Optional[Dict[str, int]]:
+        """Applies the changes seen so far right away (without debouncing)
+        in its own transaction.
+        Returns the number of added, changed, removed and unchanged records
+        or None if there was nothing to do (or if the watcher is paused).
+        The record files which could not be applied are kept in errors.
+        """
+        with self._lock:
+            if self._pauses or not (self._pending or self._rescan):
+                return None
+            names, rescan = self._pending, self._rescan
+            self._pending, self._rescan = set(), False
+            try:
+                with session_scope() as session:
+                    if rescan:
+                        counts, errors = sync_collection(session, self.root)
+                        self.errors = errors
+                    else:
+                        counts, errors = sync_record_folders(session, self.root, names)
+                        for name in names:
+                            self.errors.pop(name, None)
+                        self.errors.update(errors)
+            except BaseException:
+                # try again with the next change or apply_pending
+                self._pending |= names
+                self._rescan |= rescan
+                raise
+            return counts
+
+    @contextmanager
+    def paused(self) -> Iterator["Watcher"]:
+        """Context manager which suspends applying changes, eg. while
+        bibliophant writes record files and until the transaction which
+        stamped them in the manifest is committed.
+        Waits for a batch being applied. Changes seen in the meantime
+        are kept and applied after the (outermost) block.
+        """
+        with self._lock:
+            self._pauses += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._pauses -= 1
+
+    def _open_backend(self):
+        if self.use_inotify:
+            try:
+                backend = _Inotify(self.root)
+                self.backend = "inotify"
+                return backend
+            except OSError:
+                pass
+        self.backend = "polling"
+        return _Poller(self.root, self.poll_interval)
+
+    def _run(self):
+        backend = self._open_backend()
+        # changes made before the backend was ready
+        with self._lock:
+            self._rescan = True
+        try:
+            while not self._stopping.is_set():
+                changed = backend.wait(min(self.debounce, 0.5))
+                if changed is None or changed:
+                    with self._lock:
+                        if changed is None:
+                            self._rescan = True
+                        else:
+                            self._pending |= changed
+                    self._last_change = time.monotonic()
+                elif time.monotonic() - self._last_change >= self.debounce:
+                    try:
+                        self.apply_pending()
+                    except Exception:  # pylint: disable=W0703
+                        # eg. the database is locked; apply_pending kept the
+                        # changes, try again a bit later
+                        self._last_change = time.monotonic() + 10 * self.debounce
+        finally:
+            backend.close()
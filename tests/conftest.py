@@ -0,0 +1,91 @@
+"""fixtures shared by the tests"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pytest
+
+from bibliophant.importers.http import set_cache
+from bibliophant.session import start_engine, stop_engine
+
+
+@pytest.fixture
+def collection(tmp_path):
+    """the root folder of a new, empty collection (with a started engine)"""
+    start_engine(tmp_path, create_db=True)
+    yield tmp_path
+    stop_engine()
+
+
+def _not_found(path: str, headers: Dict) -> Tuple[int, Dict, bytes]:
+    return 404, {}, b""
+
+
+class StubServer:
+    """a local HTTP server for testing the importers offline:
+    respond(path, headers) returns the status, the headers and the body
+    of the response; the requests are recorded as (time, path, headers)
+    """
+
+    def __init__(self):
+        self.respond: Callable[[str, Dict], Tuple[int, Dict, bytes]] = _not_found
+        self.requests: List[Tuple[float, str, Dict]] = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                headers = dict(self.headers)
+                stub.requests.append((time.monotonic(), self.path, headers))
+                status, response_headers, body = stub.respond(self.path, headers)
+                self.send_response(status)
+                for name, value in response_headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def paths(self) -> List[str]:
+        return [path for _, path, _ in self.requests]
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    """a StubServer (without a response cache for fetch)"""
+    set_cache(None)
+    server = StubServer()
+    yield server
+    server.close()
+    set_cache(None)
+
+
+def make_record_dict(
+    n: int, last: str = "Smith", tags: Optional[List[str]] = None
+) -> Dict:
+    """a valid article (as a dict) with the key 2020<last><n as letters>"""
+    suffix = "".join(chr(ord("a") + int(digit)) for digit in str(n))
+    record = {
+        "type": "article",
+        "key": f"2020{last}{suffix}",
+        "title": f"A study of fluids, part {n}",
+        "authors": [{"last": last, "first": "John"}],
+        "year": 2020,
+        "journal": {"name": "Journal of Fluids"},
+        "doi": f"10.1000/fluids.{n}",
+    }
+    if tags:
+        record["tags"] = [{"name": name} for name in tags]
+    return record
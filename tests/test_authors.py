@@ -0,0 +1,40 @@
+from sqlalchemy import select
+
+from bibliophant.exporters.bibtex import fill_bibtex_cache
+from bibliophant.json_io import record_from_dict
+from bibliophant.models.record import Record
+from bibliophant.session import session_scope
+
+from .conftest import make_record_dict
+
+
+def _add_record(last_names):
+    record_dict = make_record_dict(1)
+    record_dict["authors"] = [{"last": last} for last in last_names]
+    with session_scope() as session:
+        session.add(record_from_dict(record_dict))
+        fill_bibtex_cache(session)
+
+
+def _last_names(session):
+    record = session.execute(select(Record)).scalar_one()
+    return [author.last for author in record.authors]
+
+
+def test_reordered_authors_are_stored(collection):
+    _add_record(["Abel", "Bohr", "Curie"])
+
+    with session_scope() as session:
+        record = session.execute(select(Record)).scalar_one()
+        record.authors = list(reversed(record.authors))
+    with session_scope() as session:
+        session.expire_all()
+        assert _last_names(session) == ["Curie", "Bohr", "Abel"]
+        record = session.execute(select(Record)).scalar_one()
+        assert record._bibtex is None
+
+        # moved within the loaded list
+        record._authors.append(record._authors.pop(0))
+    with session_scope() as session:
+        session.expire_all()
+        assert _last_names(session) == ["Bohr", "Abel", "Curie"]
@@ -0,0 +1,86 @@
+import pytest
+
+from bibliophant.importers import crossref
+from bibliophant.importers.http import HttpCache, fetch, set_cache
+
+from .test_importers import _crossref, _query
+
+
+@pytest.fixture
+def cache(tmp_path, stub_server):
+    """the response cache used by fetch (the stub server sends ETags)"""
+
+    def respond(path, headers):
+        if headers.get("If-None-Match") == '"v1"':
+            return 304, {}, b""
+        return 200, {"ETag": '"v1"'}, f"body of {path}".encode().ljust(100)
+
+    stub_server.respond = respond
+    cache = HttpCache(tmp_path / ".http_cache.db")
+    set_cache(cache)
+    yield cache
+    cache.close()
+
+
+def test_rerun_batch_requests_only_unfinished_urls(stub_server, cache, monkeypatch):
+    failing = {"10.1000/p1", "10.1000/p3"}
+
+    def respond(path, headers):
+        if _query(path)["id"][0][len("doi:") :] in failing:
+            return 503, {}, b"unavailable"
+        return _crossref(path, headers)
+
+    stub_server.respond = respond
+    monkeypatch.setattr(crossref, "CROSSREF_URL", stub_server.url + "/openurl/")
+    dois = [f"10.1000/p{i}" for i in range(5)]
+
+    records, errors = crossref.dois_to_records(dois, rate=None)
+    assert len(records) == 3 and list(errors) == ["10.1000/p1", "10.1000/p3"]
+
+    failing.clear()
+    stub_server.requests.clear()
+    records, errors = crossref.dois_to_records(dois, rate=None)
+    assert len(records) == 5 and not errors
+    requested = sorted(_query(path)["id"][0] for path in stub_server.paths())
+    assert requested == ["doi:10.1000/p1", "doi:10.1000/p3"]
+
+    stub_server.requests.clear()
+    crossref.dois_to_records(dois, rate=None)
+    assert stub_server.requests == []
+
+
+def test_expired_responses_are_revalidated(stub_server, cache):
+    url = stub_server.url + "/a"
+    body = fetch(url)
+    assert fetch(url) == body
+    assert len(stub_server.requests) == 1  # the second one was fresh
+
+    cache.ttl = 0
+    assert fetch(url) == body
+    assert len(stub_server.requests) == 2
+    assert stub_server.requests[-1][2]["If-None-Match"] == '"v1"'
+
+
+def test_least_recently_used_responses_are_evicted(stub_server, cache):
+    cache.max_size = 250  # two bodies of 100 bytes
+    first, second, third = (stub_server.url + name for name in ("/a", "/b", "/c"))
+    fetch(first)
+    fetch(second)
+    fetch(first)  # served from the cache, now used more recently than second
+    fetch(third)
+
+    assert cache.size() == 200
+    assert cache.get(second) is None
+    assert cache.get(first) is not None and cache.get(third) is not None
+
+
+def test_offline_mode_serves_only_cached_responses(stub_server, cache):
+    cached, missing = stub_server.url + "/a", stub_server.url + "/b"
+    body = fetch(cached)
+    cache.offline = True
+    cache.ttl = 0  # even expired responses are served
+
+    assert fetch(cached) == body
+    with pytest.raises(ConnectionError):
+        fetch(missing)
+    assert len(stub_server.requests) == 1
@@ -0,0 +1,161 @@
+from urllib.parse import parse_qs, urlparse
+
+from sqlalchemy import select
+
+from bibliophant.cli.commands.importers import import_group
+from bibliophant.importers import arxiv, crossref
+from bibliophant.models.record import Record
+from bibliophant.session import session_scope
+
+
+_CROSSREF_RECORD = """<doi_records><doi_record><crossref><journal>
+<journal_metadata><full_title>Journal of Stubs</full_title></journal_metadata>
+<journal_issue><publication_date><year>2020</year></publication_date>
+<journal_volume><volume>3</volume></journal_volume><issue>2</issue></journal_issue>
+<journal_article><titles><title>{title}</title></titles>
+<contributors><person_name><given_name>John</given_name><surname>Smith</surname>
+</person_name></contributors>
+<publication_date><year>2020</year></publication_date>
+<pages><first_page>1</first_page><last_page>9</last_page></pages>
+<doi_data><doi>{doi}</doi></doi_data></journal_article>
+</journal></crossref></doi_record></doi_records>"""
+
+_ARXIV_FEED = """<feed xmlns="http://www.w3.org/2005/Atom"
+xmlns:arxiv="http://arxiv.org/schemas/atom">{entries}</feed>"""
+
+_ARXIV_ENTRY = """<entry><id>http://arxiv.org/abs/{arxiv_id}v1</id>
+<published>2021-01-04T00:00:00Z</published>
+<title>An eprint about fluids</title><summary>We study fluids.</summary>
+<author><name>Anna Zed</name></author>
+<category term="math.NA"/>{doi}</entry>"""
+
+
+def _query(path: str):
+    return parse_qs(urlparse(path).query)
+
+
+def _crossref(path: str, headers):
+    """Crossref's OpenURL endpoint: an error for DOIs with 'broken',
+    a too short title for DOIs with 'short'
+    """
+    doi = _query(path)["id"][0][len("doi:") :]
+    if "broken" in doi:
+        return 500, {}, b"internal error"
+    title = "Short" if "short" in doi else f"A paper on {doi}"
+    return 200, {}, _CROSSREF_RECORD.format(title=title, doi=doi).encode()
+
+
+def _arxiv(path: str, headers):
+    """the arXiv API: a bad request for a list with a malformed ID,
+    no entry for IDs with 'missing'; 2101.00003 has a DOI
+    """
+    arxiv_ids = _query(path)["id_list"][0].split(",")
+    if "malformed" in arxiv_ids:
+        return 400, {}, b"malformed id"
+    entries = "".join(
+        _ARXIV_ENTRY.format(
+            arxiv_id=arxiv_id,
+            doi=(
+                "<arxiv:doi>10.1000/published</arxiv:doi>"
+                if arxiv_id == "2101.00003"
+                else ""
+            ),
+        )
+        for arxiv_id in arxiv_ids
+        if "missing" not in arxiv_id
+    )
+    return 200, {}, _ARXIV_FEED.format(entries=entries).encode()
+
+
+def _serve(stub_server, monkeypatch):
+    def respond(path, headers):
+        if path.startswith("/openurl/"):
+            return _crossref(path, headers)
+        return _arxiv(path, headers)
+
+    stub_server.respond = respond
+    monkeypatch.setattr(crossref, "CROSSREF_URL", stub_server.url + "/openurl/")
+    monkeypatch.setattr(arxiv, "ARXIV_URL", stub_server.url + "/api/query")
+    # no need to spare the stub
+    monkeypatch.setattr(arxiv, "_ARXIV_RATE", 1000.0)
+
+
+def test_dois_to_records_reports_errors_per_doi(stub_server, monkeypatch):
+    _serve(stub_server, monkeypatch)
+    dois = ["10.1000/a", "10.1000/broken", "10.1000/b"]
+
+    records, errors = crossref.dois_to_records(dois, concurrency=2, rate=None)
+
+    assert list(records) == ["10.1000/a", "10.1000/b"]
+    assert records["10.1000/a"]["title"] == "A paper on 10.1000/a"
+    assert list(errors) == ["10.1000/broken"]
+    assert "500" in errors["10.1000/broken"]
+
+
+def test_dois_to_records_keeps_the_rate(stub_server, monkeypatch):
+    _serve(stub_server, monkeypatch)
+    dois = [f"10.1000/p{i}" for i in range(6)]
+
+    records, errors = crossref.dois_to_records(dois, concurrency=4, rate=20)
+
+    assert len(records) == 6 and not errors
+    times = [time for time, _, _ in stub_server.requests]
+    # evenly spaced: 5 intervals of 1/20 s (with some slack for the threads)
+    assert max(times) - min(times) >= 5 / 20 * 0.8
+
+
+def test_arxiv_ids_are_fetched_in_batches(stub_server, monkeypatch):
+    _serve(stub_server, monkeypatch)
+    arxiv_ids = [f"2101.0000{i}" for i in range(1, 6)] + ["2101.00001"]
+
+    records, errors = arxiv.arxiv_ids_to_records(arxiv_ids, batch_size=2)
+
+    assert not errors
+    assert list(records) == [f"2101.0000{i}" for i in range(1, 6)]
+    batches = [
+        _query(path)["id_list"][0].split(",")
+        for path in stub_server.paths()
+        if path.startswith("/api/query")
+    ]
+    assert batches == [
+        ["2101.00001", "2101.00002"],
+        ["2101.00003", "2101.00004"],
+        ["2101.00005"],
+    ]
+    # the data of the published version is taken from Crossref
+    assert records["2101.00003"]["journal"] == {"name": "Journal of Stubs"}
+    assert records["2101.00003"]["eprint"]["eprint"] == "2101.00003"
+    assert records["2101.00001"]["journal"] == {"name": "arXiv e-print"}
+
+
+def test_arxiv_failed_batch_is_retried_one_by_one(stub_server, monkeypatch):
+    _serve(stub_server, monkeypatch)
+    arxiv_ids = ["2101.00001", "malformed", "2101.missing"]
+
+    records, errors = arxiv.arxiv_ids_to_records(arxiv_ids, batch_size=10)
+
+    assert list(records) == ["2101.00001"]
+    assert list(errors) == ["malformed", "2101.missing"]
+    assert "400" in errors["malformed"]
+    assert errors["2101.missing"] == "arXiv returned no record"
+    # one failed batch, then one request per ID
+    assert len(stub_server.requests) == 4
+
+
+def test_import_doi_imports_the_valid_records(stub_server, monkeypatch, collection):
+    _serve(stub_server, monkeypatch)
+    config = {"root": collection, "http_cache": None}
+    command = import_group.sub_commands["doi"]
+    arguments = "10.1000/a https://doi.org/10.1000/SHORT 10.1000/broken doi:10.1000/B"
+
+    with session_scope() as session:
+        command.execute(arguments, session, config)
+    with session_scope() as session:
+        dois = session.execute(select(Record._doi).order_by(Record._doi)).scalars()
+        assert list(dois) == ["10.1000/a", "10.1000/b"]
+
+    # already imported DOIs are not requested again, whatever their form
+    stub_server.requests.clear()
+    with session_scope() as session:
+        command.execute("10.1000/A 10.1000/c", session, config)
+    assert [_query(path)["id"][0] for path in stub_server.paths()] == ["doi:10.1000/c"]
@@ -0,0 +1,54 @@
+import pytest
+
+from bibliophant.bulk import bulk_add_records
+from bibliophant.exporters import incremental
+from bibliophant.exporters.incremental import update_bibfile
+from bibliophant.session import session_scope
+
+from .conftest import make_record_dict
+
+
+def test_interrupted_update_is_rebuilt(collection, monkeypatch):
+    path = collection / "all.bib"
+    with session_scope() as session:
+        bulk_add_records(session, [make_record_dict(i) for i in range(3)])
+        update_bibfile(session, path)
+
+    def crash(*args):
+        raise KeyboardInterrupt
+
+    # the bibfile is replaced, but its manifest is not
+    monkeypatch.setattr(incremental, "_store_manifest", crash)
+    with session_scope() as session:
+        bulk_add_records(session, [make_record_dict(3)])
+        with pytest.raises(KeyboardInterrupt):
+            update_bibfile(session, path)
+    monkeypatch.undo()
+
+    with session_scope() as session:
+        counts = update_bibfile(session, path)
+    assert counts == {"added": 4, "changed": 0, "deleted": 0, "unchanged": 0}
+    assert path.read_text().count("@article") == 4
+    assert incremental._load_manifest(path) is not None
+
+
+def test_other_files_are_left_alone(collection):
+    path = collection / "all.bib"
+    # eg. the output of another writer
+    other = collection / "all.bib.tmp"
+    other.write_text("not ours")
+    with session_scope() as session:
+        bulk_add_records(session, [make_record_dict(0)])
+        update_bibfile(session, path)
+
+    assert other.read_text() == "not ours"
+    assert sorted(file.name for file in collection.glob("all.bib*")) == [
+        "all.bib",
+        "all.bib.manifest",
+        "all.bib.tmp",
+    ]
+
+    foreign = collection / "foreign.bib"
+    foreign.write_text("% written by hand\n")
+    with session_scope() as session, pytest.raises(FileExistsError):
+        update_bibfile(session, foreign)
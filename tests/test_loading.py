@@ -0,0 +1,90 @@
+from sqlalchemy import event, func, select
+
+from bibliophant.bulk import EntityCache, bulk_add_records
+from bibliophant.db_shortcuts import select_records
+from bibliophant.exporters.bibtex import record_to_bibtex
+from bibliophant.models import Author, Journal, Record, Tag
+from bibliophant.session import session_scope
+
+from .conftest import make_record_dict
+
+
+def _count_statements(session, function) -> int:
+    statements = []
+
+    @event.listens_for(session.connection(), "before_cursor_execute")
+    def count(connection, cursor, statement, *args):
+        statements.append(statement)
+
+    function()
+    event.remove(session.connection(), "before_cursor_execute", count)
+    return len(statements)
+
+
+def test_bulk_add_records_statement_count_does_not_grow(collection):
+    counts = []
+    for start, n in ((0, 10), (10, 400)):
+        with session_scope() as session:
+            records = [make_record_dict(i) for i in range(start, start + n)]
+            counts.append(
+                _count_statements(session, lambda: bulk_add_records(session, records))
+            )
+    # the second import does not look up the entities again,
+    # and every table is still inserted with a single statement
+    assert counts[1] <= counts[0]
+    assert counts[0] <= 20
+
+
+def test_export_profile_statement_count_does_not_grow(collection):
+    with session_scope() as session:
+        bulk_add_records(session, [make_record_dict(i) for i in range(400)])
+
+    counts = []
+    for n in (10, 400):
+        with session_scope() as session:
+            statement = select_records("export").limit(n)
+
+            def export():
+                for record in session.execute(statement).scalars():
+                    record_to_bibtex(record)
+
+            counts.append(_count_statements(session, export))
+    assert counts[0] == counts[1]
+
+
+def test_bulk_add_records_shares_entities_case_insensitively(collection):
+    records = [make_record_dict(i) for i in range(4)]
+    records[1]["authors"] = [{"last": "SMITH", "first": "john"}]
+    records[2]["journal"] = {"name": "journal of FLUIDS"}
+    records[0]["tags"] = [{"name": "fluids"}, {"name": "Fluids"}]
+    records[3]["tags"] = [{"name": "fluids"}]
+    with session_scope() as session:
+        bulk_add_records(session, records[:2])
+        bulk_add_records(session, records[2:])
+
+        authors = session.execute(select(Author._last, Author._first)).all()
+        assert authors == [("Smith", "John")]  # the first spelling wins
+        journals = session.execute(select(Journal._name)).scalars().all()
+        assert journals == ["Journal of Fluids"]
+        # like the unique names of the ORM, the tags are case-sensitive
+        tags = session.execute(select(Tag._name).order_by(Tag._name)).scalars()
+        assert list(tags) == ["Fluids", "fluids"]
+        record = session.execute(
+            select(Record).where(Record._key == records[3]["key"])
+        ).scalar_one()
+        assert [tag.name for tag in record.tags] == ["fluids"]
+
+
+def test_entity_cache_does_not_reuse_ids_of_other_writers(collection):
+    cache = EntityCache()
+    with session_scope() as session:
+        bulk_add_records(session, [make_record_dict(0)], cache=cache)
+    # another writer adds records and authors in the meantime
+    with session_scope() as session:
+        bulk_add_records(session, [make_record_dict(1, last="Newton")])
+    with session_scope() as session:
+        bulk_add_records(
+            session, [make_record_dict(2, last="Euler")], chunk_size=1, cache=cache
+        )
+        assert session.execute(select(func.count(Record.id))).scalar() == 3
+        assert session.execute(select(func.count(Author.id))).scalar() == 3
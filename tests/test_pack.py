@@ -0,0 +1,55 @@
+import json
+import shutil
+
+from bibliophant import pack
+from bibliophant.pack import Pack, update_pack
+
+from .conftest import make_record_dict
+
+
+def _write_record_files(root, numbers):
+    for n in numbers:
+        record_dict = make_record_dict(n)
+        folder = root / record_dict["key"]
+        folder.mkdir(exist_ok=True)
+        (folder / f"{record_dict['key']}.json").write_text(json.dumps(record_dict))
+
+
+def test_update_pack_skips_files_removed_during_the_update(tmp_path, monkeypatch):
+    _write_record_files(tmp_path, range(3))
+    assert update_pack(tmp_path) == {
+        "added": 3,
+        "changed": 0,
+        "removed": 0,
+        "unchanged": 0,
+    }
+
+    # two records are edited, then removed between the stat and the read
+    _write_record_files(tmp_path, [1, 3])
+    read_record_file = pack.read_record_file
+
+    def remove_and_read(path):
+        if "Smithb" in path or "Smithd" in path:
+            (tmp_path / path).unlink()
+        return read_record_file(path)
+
+    monkeypatch.setattr(pack, "read_record_file", remove_and_read)
+    counts = update_pack(tmp_path)
+    assert counts == {"added": 0, "changed": 0, "removed": 1, "unchanged": 2}
+    with Pack(tmp_path) as new_pack:
+        assert sorted(new_pack.keys()) == ["2020Smitha", "2020Smithc"]
+
+
+def test_update_pack_removes_deleted_folders(tmp_path):
+    _write_record_files(tmp_path, range(3))
+    update_pack(tmp_path)
+
+    shutil.rmtree(tmp_path / "2020Smithb")
+    assert update_pack(tmp_path) == {
+        "added": 0,
+        "changed": 0,
+        "removed": 1,
+        "unchanged": 2,
+    }
+    with Pack(tmp_path) as new_pack:
+        assert sorted(new_pack.keys()) == ["2020Smitha", "2020Smithc"]
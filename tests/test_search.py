@@ -0,0 +1,50 @@
+from sqlalchemy import select, text
+
+from bibliophant.bulk import bulk_add_records
+from bibliophant.models.author import Author
+from bibliophant.models.record import Record
+from bibliophant.models.search_index import drop_search_index
+from bibliophant.search import search_records
+from bibliophant.session import session_scope
+
+from .conftest import make_record_dict
+
+
+def test_author_change_updates_search_index(collection):
+    with session_scope() as session:
+        bulk_add_records(session, [make_record_dict(i) for i in range(3)])
+        assert [r.key for r in search_records(session, "fluids part 1")] == [
+            "2020Smithb"
+        ]
+
+    with session_scope() as session:
+        record = session.execute(
+            select(Record).where(Record.key == "2020Smithb")
+        ).scalar_one()
+        record.authors = [
+            Author(last="Newton", first=first) for first in ("Ann", "Bob", "Cid")
+        ]
+        session.flush()
+        pending = session.execute(text("SELECT COUNT(*) FROM record_search_pending"))
+        assert pending.scalar() == 0
+
+    with session_scope() as session:
+        assert [r.key for r in search_records(session, "newton")] == ["2020Smithb"]
+        assert search_records(session, "smith fluids part 1") == []
+
+
+def test_like_fallback_searches_the_requested_fields(collection):
+    with session_scope() as session:
+        record = make_record_dict(0)
+        record["note"] = "see Newton"
+        bulk_add_records(session, [record, make_record_dict(1, last="Newton")])
+        drop_search_index(session.connection())
+
+        def keys(query, fields=None):
+            return sorted(r.key for r in search_records(session, query, fields))
+
+        assert keys("newton") == ["2020Newtonb", "2020Smitha"]
+        assert keys("newton", ["authors"]) == ["2020Newtonb"]
+        assert keys("newton", ["note"]) == ["2020Smitha"]
+        assert keys("journal of fluids", ["journal"]) == keys("fluids", ["title"])
+        assert keys("fluids", ["abstract", "note"]) == []
@@ -0,0 +1,36 @@
+import tracemalloc
+
+from bibliophant.bulk import bulk_add_records
+from bibliophant.db_shortcuts import select_records, stream_records
+from bibliophant.exporters.bibtex import record_to_bibtex
+from bibliophant.session import session_scope
+
+from .conftest import make_record_dict
+
+
+def _peak_memory(function) -> int:
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_stream_records_has_bounded_peak_memory(collection):
+    with session_scope() as session:
+        bulk_add_records(session, [make_record_dict(i) for i in range(3000)])
+
+    def export_all():
+        with session_scope() as session:
+            records = session.execute(select_records("export")).scalars().all()
+            for record in records:
+                record_to_bibtex(record)
+
+    def export_streamed():
+        with session_scope() as session:
+            statement = select_records("export")
+            for record in stream_records(session, statement, chunk_size=100):
+                record_to_bibtex(record)
+
+    assert _peak_memory(export_streamed) < _peak_memory(export_all) / 3
@@ -0,0 +1,80 @@
+import json
+
+from sqlalchemy import func, select
+
+from bibliophant.bulk import bulk_add_records
+from bibliophant.db_shortcuts import select_records, stream_records
+from bibliophant.json_io import store_records
+from bibliophant.models.journal import Journal
+from bibliophant.models.record import Record
+from bibliophant.search import search_records
+from bibliophant.session import session_scope
+from bibliophant.sync import sync_collection
+
+from .conftest import make_record_dict
+
+
+def _import(root, n):
+    with session_scope() as session:
+        bulk_add_records(session, [make_record_dict(i) for i in range(n)])
+        records = session.execute(select_records("full")).scalars().all()
+        store_records(records, root)
+
+
+def test_sync_after_import_reports_no_changes(collection):
+    _import(collection, 3)
+    with session_scope() as session:
+        counts, errors = sync_collection(session, collection)
+    assert errors == {}
+    assert counts == {"added": 0, "changed": 0, "removed": 0, "unchanged": 3}
+
+
+def test_sync_after_streamed_store_reports_no_changes(collection):
+    with session_scope() as session:
+        bulk_add_records(session, [make_record_dict(i) for i in range(3)])
+    with session_scope() as session:
+        # stream_records expunges the records of a chunk once it is consumed
+        store_records(stream_records(session, chunk_size=2), collection)
+    with session_scope() as session:
+        counts, errors = sync_collection(session, collection)
+    assert errors == {}
+    assert counts == {"added": 0, "changed": 0, "removed": 0, "unchanged": 3}
+
+
+def test_sync_updates_changed_records_in_place(collection):
+    _import(collection, 3)
+    with session_scope() as session:
+        before = {
+            key: (id_, created)
+            for key, id_, created in session.execute(
+                select(Record.key, Record.id, Record.created_date)
+            )
+        }
+
+    path = collection / "2020Smithb" / "2020Smithb.json"
+    record_dict = json.loads(path.read_text())
+    record_dict["title"] = "A study of viscous fluids"
+    record_dict["journal"] = {"name": "Annals of Viscosity"}
+    path.write_text(json.dumps(record_dict, indent=4))
+
+    with session_scope() as session:
+        counts, errors = sync_collection(session, collection)
+        assert errors == {}
+        assert counts == {"added": 0, "changed": 1, "removed": 0, "unchanged": 2}
+
+    with session_scope() as session:
+        after = {
+            key: (id_, created)
+            for key, id_, created in session.execute(
+                select(Record.key, Record.id, Record.created_date)
+            )
+        }
+        assert after == before
+        record = session.execute(
+            select(Record).where(Record.key == "2020Smithb")
+        ).scalar_one()
+        assert record.title == "A study of viscous fluids"
+        assert record.journal.name == "Annals of Viscosity"
+        assert [r.key for r in search_records(session, "viscous")] == ["2020Smithb"]
+        # the old journal is still used by the other records
+        assert session.execute(select(func.count()).select_from(Journal)).scalar() == 2
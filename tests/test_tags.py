@@ -0,0 +1,25 @@
+from sqlalchemy import func, select
+
+from bibliophant.json_io import record_from_dict
+from bibliophant.models.tag import Tag
+from bibliophant.session import session_scope
+
+from .conftest import make_record_dict
+
+
+def test_records_share_existing_tags(collection):
+    with session_scope() as session:
+        session.add(record_from_dict(make_record_dict(1, tags=["physics"])))
+    with session_scope() as session:
+        session.add(record_from_dict(make_record_dict(2, tags=["physics", "math"])))
+        session.add(record_from_dict(make_record_dict(3, tags=["math"])))
+
+    with session_scope() as session:
+        counts = session.execute(
+            select(Tag._name, func.count())
+            .join(Tag.records)
+            .group_by(Tag._name)
+            .order_by(Tag._name)
+        ).all()
+        assert [tuple(row) for row in counts] == [("math", 2), ("physics", 2)]
+        assert session.execute(select(func.count()).select_from(Tag)).scalar() == 2
@@ -0,0 +1,50 @@
+import sqlite3
+
+from bibliophant import watcher as watcher_module
+from bibliophant.bulk import bulk_add_records
+from bibliophant.cli.repl import repl as repl_module
+from bibliophant.cli.repl.repl import apply_watched_changes
+from bibliophant.db_shortcuts import select_records
+from bibliophant.json_io import store_records
+from bibliophant.session import session_scope
+from bibliophant.watcher import Watcher
+
+from .conftest import make_record_dict
+
+
+def test_paused_watcher_skips_files_written_by_bibliophant(collection):
+    # not started: a new watcher has to sync the whole collection first
+    watcher = Watcher(collection, use_inotify=False)
+
+    with watcher.paused():
+        with session_scope() as session:
+            bulk_add_records(session, [make_record_dict(i) for i in range(3)])
+            store_records(session.execute(select_records("full")).scalars(), collection)
+            # the transaction which stamped the files is not committed yet
+            assert watcher.apply_pending() is None
+
+    # applied after the pause, the written files match their manifest stamps
+    assert watcher.apply_pending() == {
+        "added": 0,
+        "changed": 0,
+        "removed": 0,
+        "unchanged": 3,
+    }
+    assert watcher.apply_pending() is None
+
+
+def test_failed_changes_are_reported_and_kept(collection, monkeypatch):
+    watcher = Watcher(collection, use_inotify=False)
+    reported = []
+
+    def locked(session, root):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(repl_module, "print_error", reported.append)
+    with monkeypatch.context() as patch:
+        patch.setattr(watcher_module, "sync_collection", locked)
+        apply_watched_changes(watcher)
+    assert ["database is locked" in message for message in reported] == [True]
+
+    # the changes were kept
+    assert watcher.apply_pending() is not None